@@ -0,0 +1,324 @@
+"""
+Pre-aggregated survey cube behind the pathogen / host / climate figures.
+
+Pages 05 and 06 slice the surveys by system, pathogen group
+(``Antagonist_type_general``), host order and the sidebar filters
+(latitude band, survey year), then show counts, climate distributions
+and histograms.  Instead of grouping the raw rows on every new filter
+combination, the rows are reduced once to one *cell* per occupied
+combination of :data:`DIMENSIONS` (a few hundred cells for the whole
+dataset) holding
+
+- the survey count,
+- per climate measure: non-missing count, sum, sum of squares, min, max,
+- per measure: counts in ``HIST_BINS`` bins over the full data range
+  (the page-06 histogram bins), and in ``FINE_BINS`` finer bins for the
+  violin KDEs and quartiles,
+- per pair of measures, over the rows where both are present: the count
+  and the sums of each value, its square and their product (the page-03
+  Pearson correlations).
+
+A query is a boolean mask over cells plus a ``bincount`` over the
+requested grouping, so every slice costs microseconds regardless of the
+number of surveys.  Violin densities are Gaussian KDEs over the fine bins
+(Silverman's rule-of-thumb bandwidth, 1.06·σ·n^-1/5, with the exact
+per-group standard deviation), and quartiles interpolate between order
+statistics placed within the occupied fine bins.  Pairwise co-moments are
+accumulated on values shifted by each measure's overall mean, which
+leaves correlations unchanged but keeps the sums well conditioned.
+
+The cube is stored as an uncompressed ``.npz`` of small arrays and rebuilt
+in-process whenever the cleaned dataset is newer or the file was written
+with an older :data:`CUBE_FORMAT`.
+
+Usage:
+    python aggregate_cube.py        # build data/processed/aggregate_cube.npz
+"""
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_store import MERGED_CSV, MERGED_STORE, PROCESSED_DIR, read_table
+
+CUBE_PATH = PROCESSED_DIR / "aggregate_cube.npz"
+CUBE_FORMAT = 2  # bump when the stored arrays change
+PATHOGEN_COLUMN = "Antagonist_type_general"
+# Absolute-latitude bands of the "Region" filter
+REGION_EDGES = [23.5, 35.0, 55.0]
+REGIONS = ["Tropics", "Subtropics", "Temperate", "Boreal"]
+DIMENSIONS = ("system_type", PATHOGEN_COLUMN, "Host_order", "region", "year")
+MEASURES = (
+    "temp_anomaly_C", "rain_anomaly_daily",
+    "annual_mean_temp_C", "monthly_temp_C", "contemp_temp_C",
+    "annual_precip_mm_per_day", "monthly_precip_mm_per_day", "contemp_precip",
+)
+HIST_BINS = 40
+FINE_BINS = 512
+
+
+def region_of(latitude) -> np.ndarray:
+    """Label latitudes with their :data:`REGIONS` band."""
+    idx = np.digitize(np.abs(np.asarray(latitude, dtype=np.float64)), REGION_EDGES)
+    return np.asarray(REGIONS, dtype=object)[idx]
+
+
+def _bins(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """``np.histogram`` bin of each value (last bin right-closed); -1 outside the edges or NaN."""
+    idx = np.searchsorted(edges, values, side="right") - 1
+    idx[values == edges[-1]] = len(edges) - 2
+    idx[~((values >= edges[0]) & (values <= edges[-1]))] = -1
+    return idx
+
+
+class AggregateCube:
+    """Cells of :data:`DIMENSIONS` with their counts, moments and histograms."""
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self.labels = {d: arrays[f"labels_{d}"] for d in DIMENSIONS}
+        self.cells = arrays["cells"]            # (n_cells, n_dims) label codes, -1 = missing
+        self.count = arrays["count"]            # (n_cells,)
+        self.n = arrays["n"]                    # (n_cells, n_measures) non-missing values
+        self.sum, self.sumsq = arrays["sum"], arrays["sumsq"]
+        self.min, self.max = arrays["min"], arrays["max"]
+        self.edges, self.hist = arrays["edges"], arrays["hist"]
+        self.fine_edges, self.fine = arrays["fine_edges"], arrays["fine"]
+        # (n_cells, n_measures, n_measures): [c, i, j] over rows of c where i and j are both present
+        self.pair_n, self.pair_prod = arrays["pair_n"], arrays["pair_prod"]
+        self.pair_sum, self.pair_sumsq = arrays["pair_sum"], arrays["pair_sumsq"]  # of measure i
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> "AggregateCube":
+        keys = {
+            "system_type": df["system_type"], PATHOGEN_COLUMN: df[PATHOGEN_COLUMN], "Host_order": df["Host_order"],
+            "region": pd.Series(region_of(df["Latitude"]), index=df.index),
+            "year": df["start_date"].dt.year.astype("Int64"),
+        }
+        arrays, codes = {}, []
+        for d in DIMENSIONS:
+            c, labels = pd.factorize(keys[d], sort=True)
+            arrays[f"labels_{d}"] = np.asarray(labels, dtype=np.int64 if d == "year" else str)
+            codes.append(c)
+        cells, cell = np.unique(np.column_stack(codes), axis=0, return_inverse=True)
+        cell = cell.ravel()
+        n_cells, n_measures = len(cells), len(MEASURES)
+        arrays["cells"] = cells.astype(np.int32)
+        arrays["count"] = np.bincount(cell, minlength=n_cells).astype(np.int64)
+
+        values = np.column_stack([df[m].to_numpy(dtype=np.float64) for m in MEASURES])
+        known = ~np.isnan(values)
+        arrays["n"] = np.zeros((n_cells, n_measures), dtype=np.int64)
+        for name in ("sum", "sumsq"):
+            arrays[name] = np.zeros((n_cells, n_measures))
+        arrays["min"] = np.full((n_cells, n_measures), np.inf)
+        arrays["max"] = np.full((n_cells, n_measures), -np.inf)
+        for name, bins in (("", HIST_BINS), ("fine_", FINE_BINS)):
+            arrays[f"{name}edges"] = np.empty((n_measures, bins + 1))
+            arrays["hist" if not name else "fine"] = np.zeros((n_cells, n_measures, bins), dtype=np.int32)
+        for m in range(n_measures):
+            k, v = cell[known[:, m]], values[known[:, m], m]
+            arrays["n"][:, m] = np.bincount(k, minlength=n_cells)
+            arrays["sum"][:, m] = np.bincount(k, weights=v, minlength=n_cells)
+            arrays["sumsq"][:, m] = np.bincount(k, weights=v * v, minlength=n_cells)
+            np.minimum.at(arrays["min"][:, m], k, v)
+            np.maximum.at(arrays["max"][:, m], k, v)
+            for name, hist, bins in (("", "hist", HIST_BINS), ("fine_", "fine", FINE_BINS)):
+                # Same edges as np.histogram over the full column, so filtering never shifts the bins
+                edges = np.histogram_bin_edges(v, bins=bins)
+                arrays[f"{name}edges"][m] = edges
+                b = _bins(v, edges)
+                arrays[hist][:, m] = np.bincount(k[b >= 0] * bins + b[b >= 0],
+                                                 minlength=n_cells * bins).reshape(n_cells, bins)
+
+        shape = (n_cells, n_measures, n_measures)
+        arrays["pair_n"] = np.zeros(shape, dtype=np.int64)
+        for name in ("pair_sum", "pair_sumsq", "pair_prod"):
+            arrays[name] = np.zeros(shape)
+        with np.errstate(invalid="ignore"):
+            shifted = np.where(known, values - np.nanmean(values, axis=0), 0.0)
+        for j in range(n_measures):
+            both = known & known[:, [j]]
+            for i in range(n_measures):
+                k, x = cell[both[:, i]], shifted[both[:, i], i]
+                arrays["pair_n"][:, i, j] = np.bincount(k, minlength=n_cells)
+                arrays["pair_sum"][:, i, j] = np.bincount(k, weights=x, minlength=n_cells)
+                arrays["pair_sumsq"][:, i, j] = np.bincount(k, weights=x * x, minlength=n_cells)
+                arrays["pair_prod"][:, i, j] = np.bincount(k, weights=x * shifted[both[:, i], j], minlength=n_cells)
+        return cls(arrays)
+
+    def save(self, path: Path = CUBE_PATH) -> Path:
+        arrays = {f"labels_{d}": labels for d, labels in self.labels.items()}
+        arrays.update(cells=self.cells, count=self.count, n=self.n, sum=self.sum, sumsq=self.sumsq,
+                      min=self.min, max=self.max, edges=self.edges, hist=self.hist,
+                      fine_edges=self.fine_edges, fine=self.fine, pair_n=self.pair_n, pair_sum=self.pair_sum,
+                      pair_sumsq=self.pair_sumsq, pair_prod=self.pair_prod, format=CUBE_FORMAT)
+        tmp = Path(path).with_suffix(".tmp.npz")
+        np.savez(tmp, **arrays)
+        tmp.replace(path)
+        return Path(path)
+
+    @classmethod
+    def load(cls, path: Path = CUBE_PATH) -> "AggregateCube":
+        with np.load(path, allow_pickle=False) as f:
+            return cls({k: f[k] for k in f.files})
+
+    # ───────── Queries ─────────
+    def measure(self, column: str) -> int:
+        return MEASURES.index(column)
+
+    def mask(self, regions=None, years: tuple[int, int] | None = None, host_orders=(),
+             systems=(), pathogens=()) -> np.ndarray:
+        """Cells inside the sidebar filters (``None``/empty = no restriction)."""
+        keep = np.ones(len(self.cells), dtype=bool)
+        if regions is not None:
+            keep &= self._isin("region", regions)
+        if years is not None:
+            year = self.labels["year"]
+            keep &= self._lookup("year", (year >= years[0]) & (year <= years[1]))
+        for dim, values in (("Host_order", host_orders), ("system_type", systems), (PATHOGEN_COLUMN, pathogens)):
+            if values:
+                keep &= self._isin(dim, values)
+        return keep
+
+    def _isin(self, dim: str, values) -> np.ndarray:
+        return self._lookup(dim, np.isin(self.labels[dim], list(values)))
+
+    def _lookup(self, dim: str, wanted: np.ndarray) -> np.ndarray:
+        """Cells whose ``dim`` label is ``wanted`` (a bool per label); missing labels never are."""
+        return np.append(wanted, False)[self.cells[:, DIMENSIONS.index(dim)]]
+
+    def groups(self, by: tuple[str, ...], mask: np.ndarray) -> tuple[list[tuple], np.ndarray, np.ndarray]:
+        """
+        Distinct label tuples of ``by`` among the masked cells.
+
+        Returns ``(labels, cells, group)``: the masked cells with no missing
+        ``by`` label and the group index of each.
+        """
+        codes = self.cells[:, [DIMENSIONS.index(d) for d in by]]
+        cells = np.flatnonzero(mask & (codes >= 0).all(axis=1) & (self.count > 0))
+        # One mixed-radix integer per label tuple, so grouping is a 1-D unique
+        sizes = [len(self.labels[d]) for d in by]
+        found, group = np.unique(np.ravel_multi_index(codes[cells].T, sizes), return_inverse=True)
+        rows = np.unravel_index(found, sizes)
+        labels = [tuple(self.labels[d][c].item() for d, c in zip(by, row)) for row in zip(*rows)]
+        return labels, cells, group
+
+    def _sum(self, values: np.ndarray, cells: np.ndarray, group: np.ndarray, n_groups: int) -> np.ndarray:
+        """Sum ``values`` (first axis = cells) over each group."""
+        out = np.zeros((n_groups,) + values.shape[1:], dtype=values.dtype)
+        np.add.at(out, group, values[cells])
+        return out
+
+    def counts(self, by: tuple[str, ...], mask: np.ndarray) -> pd.Series:
+        """Survey count per ``by`` label tuple."""
+        labels, cells, group = self.groups(by, mask)
+        counts = np.bincount(group, weights=self.count[cells], minlength=len(labels)).astype(np.int64)
+        return pd.Series(counts, index=pd.MultiIndex.from_tuples(labels, names=by) if labels else None, dtype=np.int64)
+
+    def histograms(self, column: str, by: tuple[str, ...], mask: np.ndarray, fine: bool = False) -> dict[tuple, np.ndarray]:
+        """Bin counts of ``column`` per ``by`` label tuple (edges: ``self.edges`` / ``self.fine_edges``)."""
+        labels, cells, group = self.groups(by, mask)
+        hist = (self.fine if fine else self.hist)[:, self.measure(column)]
+        return dict(zip(labels, self._sum(hist, cells, group, len(labels))))
+
+    def moments(self, column: str, by: tuple[str, ...], mask: np.ndarray) -> pd.DataFrame:
+        """``n``, ``mean``, ``std`` (ddof=1), ``min`` and ``max`` of ``column`` per ``by`` label tuple."""
+        labels, cells, group = self.groups(by, mask)
+        m, k = self.measure(column), len(labels)
+        n = np.bincount(group, weights=self.n[cells, m], minlength=k)
+        s = np.bincount(group, weights=self.sum[cells, m], minlength=k)
+        ss = np.bincount(group, weights=self.sumsq[cells, m], minlength=k)
+        lo, hi = np.full(k, np.inf), np.full(k, -np.inf)
+        np.minimum.at(lo, group, self.min[cells, m])
+        np.maximum.at(hi, group, self.max[cells, m])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = s / n
+            std = np.sqrt(np.maximum(ss - n * mean ** 2, 0.0) / (n - 1))
+        index = pd.MultiIndex.from_tuples(labels, names=by) if labels else None
+        return pd.DataFrame({"n": n.astype(np.int64), "mean": mean, "std": std, "min": lo, "max": hi}, index=index)
+
+    def pearson(self, mask: np.ndarray, columns=MEASURES) -> pd.DataFrame:
+        """Pairwise-complete Pearson correlations of ``columns`` over the masked cells (as ``DataFrame.corr``)."""
+        m = [self.measure(c) for c in columns]
+        n, s, ss, sxy = (a[mask].sum(axis=0)[np.ix_(m, m)]
+                         for a in (self.pair_n, self.pair_sum, self.pair_sumsq, self.pair_prod))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = sxy - s * s.T / n
+            r = cov / np.sqrt((ss - s ** 2 / n) * (ss.T - s.T ** 2 / n))
+        r[n < 2] = np.nan
+        return pd.DataFrame(np.clip(r, -1.0, 1.0), index=list(columns), columns=list(columns))
+
+    def quantiles(self, column: str, counts: np.ndarray, q, lo: float, hi: float) -> np.ndarray:
+        """
+        ``np.percentile``-style (linear) quantiles from fine-bin ``counts``.
+
+        The values in each occupied bin are taken as evenly spread across
+        it, the smallest and largest being exactly ``lo`` and ``hi``; each
+        quantile interpolates between the two order statistics around its
+        rank, so it is off by at most one fine bin.  Empty bins carry no rank.
+        """
+        edges = self.fine_edges[self.measure(column)]
+        occupied = np.flatnonzero(counts)
+        sizes = np.asarray(counts, dtype=np.int64)[occupied]
+        n = sizes.sum()
+        if n == 0:
+            return np.full(np.shape(q), np.nan)
+        ends = np.cumsum(sizes)
+
+        def order_statistic(k: np.ndarray) -> np.ndarray:
+            b = np.searchsorted(ends, k, side="right")
+            left, right = edges[occupied[b]], edges[occupied[b] + 1]
+            x = left + (k - (ends[b] - sizes[b]) + 0.5) / sizes[b] * (right - left)
+            return np.where(k == 0, lo, np.where(k == n - 1, hi, x))
+
+        rank = np.asarray(q, dtype=np.float64) / 100 * (n - 1)
+        below = np.floor(rank)
+        low, high = order_statistic(below), order_statistic(np.minimum(below + 1, n - 1))
+        return np.clip(low + (rank - below) * (high - low), lo, hi)
+
+    def kde(self, column: str, counts: np.ndarray, grid: np.ndarray, std: float) -> np.ndarray:
+        """Gaussian KDE with Silverman's rule-of-thumb bandwidth from fine-bin ``counts``, evaluated on ``grid``."""
+        edges = self.fine_edges[self.measure(column)]
+        n = counts.sum()
+        bw = 1.06 * std * n ** -0.2 if n > 1 else 0.0
+        if not bw > 0:
+            return np.where(np.isclose(grid, grid[0]), 1.0, 0.0)
+        occupied = np.flatnonzero(counts)
+        centres = (edges[occupied] + edges[occupied + 1]) / 2
+        z = (grid[:, None] - centres[None, :]) / bw
+        return np.exp(-0.5 * z ** 2) @ counts[occupied] / (n * bw * np.sqrt(2 * np.pi))
+
+
+def _current(path: Path, stamp: tuple) -> bool:
+    if not path.exists() or path.stat().st_mtime_ns < stamp[0]:
+        return False
+    with np.load(path, allow_pickle=False) as f:
+        return "format" in f.files and int(f["format"]) == CUBE_FORMAT
+
+
+@lru_cache(maxsize=2)
+def _cube(path: Path, stamp: tuple) -> AggregateCube:
+    if _current(path, stamp):
+        return AggregateCube.load(path)
+    return AggregateCube.build(read_table(MERGED_STORE, MERGED_CSV, columns=_columns()))
+
+
+def _columns() -> list[str]:
+    return sorted({"system_type", PATHOGEN_COLUMN, "Host_order", "Latitude", "start_date", *MEASURES})
+
+
+def get_cube(path: Path = CUBE_PATH) -> AggregateCube:
+    """The stored cube, or one built in-process when it is missing or older than the dataset."""
+    source = MERGED_STORE if MERGED_STORE.exists() else MERGED_CSV
+    return _cube(Path(path), (source.stat().st_mtime_ns, path.stat().st_mtime_ns if path.exists() else 0))
+
+
+def main() -> None:
+    cube = AggregateCube.build(read_table(MERGED_STORE, MERGED_CSV, columns=_columns()))
+    path = cube.save()
+    print(f"{len(cube.cells)} cells from {int(cube.count.sum())} surveys -> {path} ({path.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
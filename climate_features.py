@@ -0,0 +1,99 @@
+"""
+Vectorised unit-conversion and anomaly kernel shared by the ETL and the app.
+
+All derived climate features are written in one pass into a single
+preallocated ``(n_features, n_rows)`` float64 block, so no per-column
+DataFrame copies are made.  Units follow the definitions on the
+"Weather Mismatch Effect" page:
+
+- ``contemp_temp`` is ERA5 Kelvin; ``monthly_temp`` / ``annual_mean_temp``
+  are WorldClim tenths of °C.
+- ``contemp_precip`` is mm/day; ``monthly_precip`` / ``annual_precip`` are
+  divided by 30 to give mm/day.
+"""
+import numpy as np
+import pandas as pd
+
+KELVIN = 273.15
+DAYS_PER_MONTH = 30.0
+
+RAW_COLUMNS = (
+    "contemp_temp", "monthly_temp", "annual_mean_temp",
+    "contemp_precip", "monthly_precip", "annual_precip",
+)
+FEATURES = (
+    "contemp_temp_C",
+    "monthly_temp_C",
+    "annual_mean_temp_C",
+    "temp_anomaly_C",
+    "monthly_precip_mm_per_day",
+    "annual_precip_mm_per_day",
+    "rain_anomaly_daily",
+    "abs_temp_anom",
+    "abs_precip_anom",
+    # Raw-unit differences as produced by the 01 notebook; the trained
+    # models use these (and the interaction) as inputs.
+    "temp_anomaly",
+    "rain_anomaly",
+    "monthly_temp_x_temp_anomaly",
+)
+
+
+def climate_features(
+    contemp_temp, monthly_temp, annual_mean_temp,
+    contemp_precip, monthly_precip, annual_precip,
+    out: np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Compute every derived climate feature from raw climate columns.
+
+    Inputs may be arrays, Series or scalars (broadcast to a common length).
+    Returns a dict of row views into one ``(len(FEATURES), n)`` block; pass
+    ``out`` to reuse a preallocated block, e.g. when processing in chunks.
+    """
+    ct, mt, at, cp, mp, ap = np.broadcast_arrays(*(
+        np.atleast_1d(np.asarray(x, dtype=np.float64))
+        for x in (contemp_temp, monthly_temp, annual_mean_temp, contemp_precip, monthly_precip, annual_precip)
+    ))
+    shape = (len(FEATURES),) + ct.shape
+    if out is None:
+        out = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError(f"out has shape {out.shape}, expected {shape}")
+
+    f = dict(zip(FEATURES, out))
+    np.subtract(ct, KELVIN, out=f["contemp_temp_C"])
+    np.divide(mt, 10.0, out=f["monthly_temp_C"])
+    np.divide(at, 10.0, out=f["annual_mean_temp_C"])
+    np.subtract(f["contemp_temp_C"], f["monthly_temp_C"], out=f["temp_anomaly_C"])
+    np.divide(mp, DAYS_PER_MONTH, out=f["monthly_precip_mm_per_day"])
+    np.divide(ap, DAYS_PER_MONTH, out=f["annual_precip_mm_per_day"])
+    np.subtract(cp, f["monthly_precip_mm_per_day"], out=f["rain_anomaly_daily"])
+    np.abs(f["temp_anomaly_C"], out=f["abs_temp_anom"])
+    np.abs(f["rain_anomaly_daily"], out=f["abs_precip_anom"])
+    np.subtract(ct, mt, out=f["temp_anomaly"])
+    np.subtract(cp, mp, out=f["rain_anomaly"])
+    np.multiply(mt, f["temp_anomaly"], out=f["monthly_temp_x_temp_anomaly"])
+    return f
+
+
+def scenario_inputs(
+    monthly_temp, monthly_precip, temp_anomaly_C, rain_anomaly_daily,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Invert the anomaly definitions for the live scenario path.
+
+    Given WorldClim monthly normals (raw units) and user-chosen anomalies
+    (°C, mm/day), return the implied ``(contemp_temp, contemp_precip)`` in
+    the raw ERA5 units that :func:`climate_features` expects.
+    """
+    contemp_temp = np.asarray(monthly_temp, dtype=np.float64) / 10.0 + temp_anomaly_C + KELVIN
+    contemp_precip = np.asarray(monthly_precip, dtype=np.float64) / DAYS_PER_MONTH + rain_anomaly_daily
+    return contemp_temp, contemp_precip
+
+
+def feature_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the derived features for ``df`` as a DataFrame sharing one block."""
+    block = np.empty((len(FEATURES), len(df)))
+    climate_features(*(df[c].to_numpy(dtype=np.float64) for c in RAW_COLUMNS), out=block)
+    return pd.DataFrame(block.T, index=df.index, columns=list(FEATURES), copy=False)
@@ -0,0 +1,342 @@
+"""
+Climate-join engine: attach climate to survey records from local grids.
+
+Replaces the external extraction behind
+``complete_plant_study_climate_data.csv`` for new surveys.  Given
+``Latitude``, ``Longitude``, ``Start Date (yyyymm)`` and
+``Span (months)``, each survey gets the same raw columns as that file:
+
+- ``bio01`` / ``bio12``: WorldClim annual mean temperature (tenths °C)
+  and annual precipitation (mm/year) at the survey cell;
+- ``tavg`` / ``prec``: WorldClim monthly normals (tenths °C, mm/month)
+  averaged over the calendar months of the survey window;
+- ``temperature_2m`` / ``total_precipitation``: ERA5 monthly means (K,
+  mm/day) averaged over the actual months of the survey window.
+
+Window aggregates of the ERA5 series are added alongside:
+``<series>_min`` / ``<series>_max`` (coolest/warmest and driest/wettest
+month of the window) and ``degree_days`` (growing degree-days above
+``DEGREE_DAY_BASE_C`` accumulated over the window).  Sums and means
+are two prefix-sum lookups per survey whatever its length; extremes
+take one vectorised pass per month of the longest window in each
+chunk of cells.  Multi-month surveys need no special handling or
+truncation.  A window with any month missing from a grid (e.g. one
+running past the ERA5 range) gets NaN rather than the average of the
+months it has.
+
+Grids live in ``data/raw/climate_grids/`` as ``<variable>.npy`` arrays
+(opened memory-mapped) with a ``<variable>.json`` sidecar written by
+:func:`write_grid`.  Arrays are ``(lat, lon)`` for static layers and
+``(layer, lat, lon)`` otherwise — 12 calendar months for normals, one
+layer per month from ``time0`` for ERA5 — with row 0 at the southern
+edge.  Convert NetCDF/GeoTIFF sources by passing their arrays to
+:func:`write_grid`.
+
+Usage:
+    python climate_join.py   # append climate rows for surveys missing from the climate CSV
+"""
+import argparse
+import json
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from climate_features import DAYS_PER_MONTH, KELVIN
+from data_store import RAW_DIR, SURVEY_CSV
+from etl_pipeline import CLIMATE_CSV
+
+GRIDS_DIR = RAW_DIR / "climate_grids"
+STATIC = ("bio01", "bio12")
+NORMALS = ("tavg", "prec")
+SERIES = ("temperature_2m", "total_precipitation")
+VARIABLES = STATIC + NORMALS + SERIES
+
+# Base temperature (°C) for growing degree-days
+DEGREE_DAY_BASE_C = 10.0
+
+# Grid cells per tile side, and tiles kept in memory per variable
+TILE = 32
+TILE_CACHE_SIZE = 64
+# Cells whose monthly series are held in memory at once by window_stats
+CELL_CHUNK = 4096
+
+
+def _month_index(year, month) -> np.ndarray:
+    """Months since year 0, so consecutive calendar months differ by one."""
+    return np.asarray(year, dtype=np.int64) * 12 + np.asarray(month, dtype=np.int64) - 1
+
+
+def write_grid(
+    name: str,
+    array: np.ndarray,
+    lat0: float,
+    lon0: float,
+    resolution: float,
+    time0: str | None = None,
+    grids_dir: Path = GRIDS_DIR,
+) -> Path:
+    """
+    Save ``array`` as grid ``name`` with its georeference.
+
+    ``lat0``/``lon0`` are the south/west edges of cell ``[0, 0]``;
+    ``time0`` ("YYYY-MM") is the month of layer 0, required for the ERA5
+    :data:`SERIES`.
+    """
+    if name in SERIES:
+        if time0 is None:
+            raise ValueError(f"{name} is a monthly series; pass time0 ('YYYY-MM') for its first layer")
+        pd.Period(time0, freq="M")  # raises on a malformed month
+    grids_dir = Path(grids_dir)
+    grids_dir.mkdir(parents=True, exist_ok=True)
+    path = grids_dir / f"{name}.npy"
+    np.save(path, np.ascontiguousarray(array, dtype=np.float32))
+    path.with_suffix(".json").write_text(json.dumps(
+        {"lat0": lat0, "lon0": lon0, "resolution": resolution, "time0": time0}, indent=2
+    ))
+    return path
+
+
+class ClimateGrid:
+    """A memory-mapped grid read through an LRU cache of ``TILE × TILE`` blocks."""
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        meta = json.loads(path.with_suffix(".json").read_text())
+        self.data = np.load(path, mmap_mode="r")
+        self.lat0, self.lon0 = float(meta["lat0"]), float(meta["lon0"])
+        self.resolution = float(meta["resolution"])
+        self.time0 = None
+        if meta.get("time0"):
+            year, month = map(int, meta["time0"].split("-"))
+            self.time0 = int(_month_index(year, month))
+        self.n_lat, self.n_lon = self.data.shape[-2:]
+        self._tile = lru_cache(maxsize=TILE_CACHE_SIZE)(self._read_tile)
+
+    def _read_tile(self, ti: int, tj: int) -> np.ndarray:
+        rows = slice(ti * TILE, (ti + 1) * TILE)
+        cols = slice(tj * TILE, (tj + 1) * TILE)
+        return np.array(self.data[..., rows, cols])
+
+    def cells(self, lat, lon) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Row/column of each point's cell and whether it lies inside the grid."""
+        i = np.floor((np.asarray(lat, dtype=np.float64) - self.lat0) / self.resolution)
+        j = np.floor((np.asarray(lon, dtype=np.float64) - self.lon0) / self.resolution)
+        ok = (i >= 0) & (i < self.n_lat) & (j >= 0) & (j < self.n_lon)
+        return np.where(ok, i, 0).astype(np.int64), np.where(ok, j, 0).astype(np.int64), ok
+
+    def _tile_groups(self, i: np.ndarray, j: np.ndarray):
+        """Yield ``(positions, tile block)`` so each tile is read from disk once."""
+        tiles = (i // TILE) * ((self.n_lon + TILE - 1) // TILE) + j // TILE
+        order = np.argsort(tiles, kind="stable")
+        for sel in np.split(order, np.flatnonzero(np.diff(tiles[order])) + 1):
+            if len(sel):
+                yield sel, self._tile(int(i[sel[0]] // TILE), int(j[sel[0]] // TILE))
+
+    def sample(self, lat, lon, layer=None) -> np.ndarray:
+        """
+        Cell values at each point (NaN outside the grid).
+
+        ``layer`` gives the first-axis index per point for 3-D grids;
+        out-of-range layers are NaN too.
+        """
+        i, j, ok = self.cells(lat, lon)
+        if layer is not None:
+            layer = np.asarray(layer, dtype=np.int64)
+            ok &= (layer >= 0) & (layer < self.data.shape[0])
+        out = np.full(len(i), np.nan)
+        idx = np.flatnonzero(ok)
+        i, j = i[ok], j[ok]
+        if layer is not None:
+            layer = layer[ok]
+        for sel, block in self._tile_groups(i, j):
+            cell = (i[sel] % TILE, j[sel] % TILE)
+            out[idx[sel]] = block[cell] if layer is None else block[(layer[sel],) + cell]
+        return out
+
+    def series(self, i: np.ndarray, j: np.ndarray, start: int, stop: int, cyclic: bool = False) -> np.ndarray:
+        """
+        Layers ``start:stop`` of cells ``(i, j)`` as a ``(cells, stop - start)`` array.
+
+        Layers outside the grid are NaN, or wrap around when ``cyclic``
+        (calendar-month normals).
+        """
+        layers = np.arange(start, stop)
+        n_layers = self.data.shape[0]
+        if cyclic:
+            layers %= n_layers
+        inside = (layers >= 0) & (layers < n_layers)
+        out = np.full((len(i), len(layers)), np.nan)
+        cols = np.flatnonzero(inside)
+        for sel, block in self._tile_groups(i, j):
+            out[np.ix_(sel, cols)] = block[layers[inside][None, :], (i[sel] % TILE)[:, None], (j[sel] % TILE)[:, None]]
+        return out
+
+
+@lru_cache(maxsize=None)
+def load_grids(grids_dir: Path = GRIDS_DIR) -> dict[str, ClimateGrid]:
+    """Open every climate variable under ``grids_dir`` (process-wide)."""
+    missing = [v for v in VARIABLES if not (Path(grids_dir) / f"{v}.npy").exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing climate grid(s) in {grids_dir}: {', '.join(missing)}")
+    grids = {v: ClimateGrid(Path(grids_dir) / f"{v}.npy") for v in VARIABLES}
+    undated = [v for v in SERIES if grids[v].time0 is None]
+    if undated:
+        raise ValueError(f"Series grid(s) without time0 in {grids_dir}: {', '.join(undated)}; re-save with write_grid")
+    return grids
+
+
+def _window_reduce(
+    values: np.ndarray,
+    owner: np.ndarray,
+    s: np.ndarray,
+    e: np.ndarray,
+    extra: dict[str, Callable[[np.ndarray], np.ndarray]],
+) -> dict[str, np.ndarray]:
+    """Window statistics of ``values[owner, s:e]`` for each survey, plus ``count`` of months present."""
+    out = {}
+    finite = np.isfinite(values)
+    prefix = np.zeros((len(values), values.shape[1] + 1))
+    count = np.zeros_like(prefix)
+    np.cumsum(finite, axis=1, out=count[:, 1:])
+    window_count = count[owner, e] - count[owner, s]
+    has = window_count > 0
+    for name, series in [("sum", values)] + [(k, f(values)) for k, f in extra.items()]:
+        np.cumsum(np.where(finite, series, 0.0), axis=1, out=prefix[:, 1:])
+        out[name] = np.where(has, prefix[owner, e] - prefix[owner, s], np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["mean"] = out["sum"] / np.where(has, window_count, np.nan)
+    out["count"] = window_count
+
+    low, high = np.full(len(s), np.nan), np.full(len(s), np.nan)
+    span = e - s
+    with np.errstate(invalid="ignore"):
+        for k in range(int(span.max())):
+            active = np.flatnonzero(span > k)
+            month = values[owner[active], s[active] + k]
+            low[active] = np.fmin(low[active], month)
+            high[active] = np.fmax(high[active], month)
+    out["min"], out["max"] = low, high
+    return out
+
+
+def window_stats(
+    grid: ClimateGrid,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    first: np.ndarray,
+    span: np.ndarray,
+    cyclic: bool = False,
+    extra: dict[str, Callable[[np.ndarray], np.ndarray]] | None = None,
+    partial: bool = False,
+) -> dict[str, np.ndarray]:
+    """
+    Sum, mean, min and max of ``grid`` over each survey window.
+
+    ``first`` is the layer of each window's first month and ``span`` its
+    length (0 = no window, all NaN).  Each distinct cell's series is
+    read once, over the layers its chunk of windows touches; sums and
+    means are differences of its prefix sums, extremes a rolling
+    ``fmin``/``fmax`` over the longest span.  ``count`` is the number of
+    window months the grid has; windows missing any are NaN unless
+    ``partial``, which aggregates the months present.  ``extra`` maps
+    names to per-month transforms whose window sums are returned too
+    (e.g. degree-days).
+    """
+    extra = extra or {}
+    n = len(span)
+    out = {key: np.full(n, np.nan) for key in ("sum", "mean", "min", "max", *extra)}
+    out["count"] = np.zeros(n, dtype=np.int64)
+    i, j, ok = grid.cells(lat, lon)
+    ok &= span > 0
+    rows = np.flatnonzero(ok)
+    cells, owner = np.unique(i[rows] * grid.n_lon + j[rows], return_inverse=True)
+    order = np.argsort(owner, kind="stable")
+    bounds = np.searchsorted(owner[order], np.arange(0, len(cells) + CELL_CHUNK, CELL_CHUNK))
+    for c0, lo_pos, hi_pos in zip(range(0, len(cells), CELL_CHUNK), bounds[:-1], bounds[1:]):
+        sel = order[lo_pos:hi_pos]
+        start, stop = first[rows[sel]], first[rows[sel]] + span[rows[sel]]
+        lo, hi = int(start.min()), int(stop.max())
+        chunk = cells[c0:c0 + CELL_CHUNK]
+        values = grid.series(chunk // grid.n_lon, chunk % grid.n_lon, lo, hi, cyclic)
+        stats = _window_reduce(values, owner[sel] - c0, start - lo, stop - lo, extra)
+        for key, value in stats.items():
+            out[key][rows[sel]] = value
+    if not partial:
+        incomplete = out["count"] < span
+        for key in out.keys() - {"count"}:
+            out[key][incomplete] = np.nan
+    return out
+
+
+def _degree_days(temperature_k: np.ndarray) -> np.ndarray:
+    """Monthly growing degree-days from mean monthly temperature (K)."""
+    return np.clip(temperature_k - KELVIN - DEGREE_DAY_BASE_C, 0.0, None) * DAYS_PER_MONTH
+
+
+def join_climate(surveys: pd.DataFrame, grids: dict[str, ClimateGrid] | None = None) -> pd.DataFrame:
+    """
+    Climate rows for ``surveys`` in the climate CSV's schema.
+
+    Returns ``obs`` (from ``Obs``), the six raw climate columns, the ERA5
+    window aggregates and the ``start_date``/``end_date`` of each survey
+    window.
+    """
+    grids = grids if grids is not None else load_grids()
+    start = pd.to_datetime(surveys["Start Date (yyyymm)"].astype("Int64").astype(str), format="%Y%m", errors="coerce")
+    span = surveys["Span (months)"].fillna(1).clip(lower=1).astype(int).to_numpy()
+    lat = surveys["Latitude"].to_numpy(dtype=np.float64)
+    lon = surveys["Longitude"].to_numpy(dtype=np.float64)
+
+    has_start = start.notna().to_numpy()
+    span = np.where(has_start, span, 0)
+    first = _month_index(start.dt.year.fillna(0), start.dt.month.fillna(1))
+
+    out = {"obs": surveys["Obs"].to_numpy()}
+    for name in STATIC:
+        out[name] = grids[name].sample(lat, lon)
+    for name in NORMALS:
+        out[name] = window_stats(grids[name], lat, lon, first % 12, span, cyclic=True)["mean"]
+    for name in SERIES:
+        grid = grids[name]
+        extra = {"degree_days": _degree_days} if name == "temperature_2m" else None
+        stats = window_stats(grid, lat, lon, first - grid.time0, span, extra=extra)
+        out[name], out[f"{name}_min"], out[f"{name}_max"] = stats["mean"], stats["min"], stats["max"]
+        if extra:
+            out["degree_days"] = stats["degree_days"]
+
+    last = first + np.maximum(span, 1) - 1
+    end = pd.to_datetime(pd.DataFrame({"year": last // 12, "month": last % 12 + 1, "day": 1}), errors="coerce").where(has_start)
+    out["start_date"] = start.dt.strftime("%Y-%m-%d").to_numpy()
+    out["end_date"] = end.dt.strftime("%Y-%m-%d").to_numpy()
+    return pd.DataFrame(out)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Attach gridded climate to surveys missing from the climate CSV.")
+    parser.add_argument("--surveys", type=Path, default=SURVEY_CSV, help="raw survey CSV")
+    parser.add_argument("--climate", type=Path, default=CLIMATE_CSV, help="climate CSV to append to")
+    parser.add_argument("--grids", type=Path, default=GRIDS_DIR, help="directory of climate grids")
+    args = parser.parse_args(argv)
+
+    surveys = pd.read_csv(args.surveys)
+    climate = pd.read_csv(args.climate) if args.climate.exists() else pd.DataFrame(columns=["obs"])
+    new = surveys[~surveys["Obs"].isin(climate["obs"])]
+    if new.empty:
+        print("Climate CSV already covers every survey")
+        return
+
+    t0 = time.perf_counter()
+    rows = join_climate(new, load_grids(args.grids))
+    elapsed = time.perf_counter() - t0
+    tmp = args.climate.with_suffix(".tmp")
+    pd.concat([climate, rows], ignore_index=True).to_csv(tmp, index=False)
+    tmp.replace(args.climate)
+    print(f"Joined climate for {len(rows)} new survey(s) in {elapsed:.2f}s -> {args.climate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,113 @@
+import base64
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
 import pandas as pd
 import streamlit as st
+import streamlit.components.v1 as components
+
+from data_store import MERGED_CSV, MERGED_STORE, read_table
+
+# Max number of pre-rendered HTML embeds kept in memory (largest is ~730 KB)
+EMBED_CACHE_SIZE = 32
+
+_NEWPLOT = "Plotly.newPlot("
+_DATA_URI = re.compile(r'src="data:image/\w+;base64,([^"]+)"')
+_IMG_TAG = re.compile(r"<img\b[^>]*>", re.S)
+_BODY = re.compile(r"<body[^>]*>(.*)</body>", re.S | re.I)
+_TAG = re.compile(r"<[^>]+>")
 
 @st.cache_data
-def load_data():
-    return pd.read_csv("../data/processed/merged_climate_disease_final.csv")
+def load_data(columns: list[str] | None = None) -> pd.DataFrame:
+    """Load the cleaned dataset, materialising only ``columns`` (default: all)."""
+    return read_table(MERGED_STORE, MERGED_CSV, columns)
+
+@lru_cache(maxsize=EMBED_CACHE_SIZE)
+def _read_embed(path: str, mtime_ns: int) -> str:
+    txt = Path(path).read_text(encoding="utf-8")
+    return txt.replace("RÂ²", "R²").replace("$R^2$", "R²")
+
+def load_embed(path: Path) -> str:
+    """
+    Return the HTML embed at ``path`` with the R² encoding fix applied.
+
+    Cached per process on path + mtime, so reruns skip the disk read and a
+    re-exported file is picked up; least recently used embeds are evicted.
+    """
+    path = Path(path)
+    return _read_embed(str(path), path.stat().st_mtime_ns)
+
+def _parse_plotly(html: str) -> dict | None:
+    """Pull ``{"data", "layout"}`` out of a ``fig.write_html`` export's newPlot call."""
+    start = html.find(_NEWPLOT)
+    if start < 0:
+        return None
+    decoder, pos, args = json.JSONDecoder(), start + len(_NEWPLOT), []
+    for _ in range(3):  # div id, data, layout
+        while html[pos] in " \t\r\n,":
+            pos += 1
+        value, pos = decoder.raw_decode(html, pos)
+        args.append(value)
+    return {"data": args[1], "layout": args[2]}
+
+def _dedent(html: str) -> str:
+    # Indented lines would render as Markdown code blocks
+    return "\n".join(line.strip() for line in html.splitlines() if line.strip())
+
+@lru_cache(maxsize=EMBED_CACHE_SIZE)
+def _read_figure(path: str, mtime_ns: int) -> tuple[str, object]:
+    html = _read_embed(path, mtime_ns)
+    spec = _parse_plotly(html)
+    if spec is not None:
+        return "plotly", spec
+    match = _DATA_URI.search(html)
+    body = _BODY.search(html)
+    if match and body and len(_IMG_TAG.findall(body.group(1))) == 1:
+        image = base64.b64decode(match.group(1))
+        before, after = _IMG_TAG.split(body.group(1))
+        if not _TAG.sub("", before + after).strip():
+            return "image", image
+        # Titles, scores or tables around the image are kept as HTML
+        return "captioned", (_dedent(before), image, _dedent(after))
+    return "html", html
+
+def load_figure(path: Path) -> tuple[str, object]:
+    """
+    Return ``(kind, payload)`` for a pre-rendered embed, cached like :func:`load_embed`.
+
+    Plotly exports become their figure spec (``"plotly"``), bare image
+    wrappers their decoded bytes (``"image"``), and wrappers with a title,
+    score or table around the image ``(html_before, bytes, html_after)``
+    (``"captioned"``); anything else stays ``"html"``.
+    """
+    path = Path(path)
+    return _read_figure(str(path), path.stat().st_mtime_ns)
+
+def show_embed(path: Path, height: int, width: int | None = None, scrolling: bool = True) -> None:
+    """
+    Render a pre-rendered embed natively instead of in an HTML iframe.
+
+    Figure specs go through ``st.plotly_chart`` so the plotly.js bundled with
+    Streamlit is loaded once per session rather than once per iframe, and
+    PNG wrappers are served with ``st.image`` as cacheable media files (any
+    title, score or table around the image rendered as HTML Markdown).
+    """
+    kind, payload = load_figure(path)
+    if kind == "plotly":
+        layout = {"height": height, **payload["layout"]}
+        if width is not None:
+            layout.setdefault("width", width)
+        st.plotly_chart({"data": payload["data"], "layout": layout}, use_container_width=width is None)
+    elif kind == "image":
+        st.image(payload, width=width, use_container_width=width is None)
+    elif kind == "captioned":
+        before, image, after = payload
+        if before:
+            st.markdown(before, unsafe_allow_html=True)
+        st.image(image, width=width, use_container_width=width is None)
+        if after:
+            st.markdown(after, unsafe_allow_html=True)
+    else:
+        components.html(payload, height=height, width=width, scrolling=scrolling)
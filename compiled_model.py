@@ -0,0 +1,522 @@
+"""
+Compiled inference graphs for the fitted incidence pipelines.
+
+A scikit-learn pipeline predicts through a ``ColumnTransformer`` that
+materialises a ~1,000-column one-hot matrix, and the Agricultural
+stacking ensemble then fans out through four estimator calls (the
+random forest via a joblib thread pool).  :func:`compile_pipeline` turns
+a fitted pipeline into a graph of plain NumPy arrays instead:
+
+- the encoder keeps numeric inputs standardised and each categorical
+  input as one category code, never building the one-hot matrix;
+- linear models become an additive table: one weight (or, behind a
+  ``SplineTransformer``, one fused B-spline) per numeric input and one
+  weight per category, so the Ridge-spline is 12 spline evaluations
+  plus 8 lookups;
+- an XGBoost booster becomes one flat node array walked for every
+  (row, tree) pair at once, level by level; a random forest keeps its
+  Cython trees but walks them in one thread on a float32 encoding;
+- an RBF ``SVR`` keeps its support vectors and evaluates the kernel
+  blockwise from the codes;
+- batches of ``SPARSE_ROWS`` rows or more are handed to the forest and
+  the SVR as a CSR matrix built straight from the codes, and the booster
+  runs in XGBoost's own predictor: the walks above win on single rows,
+  the library kernels on large batches;
+- a ``StackingRegressor`` with a linear final estimator sums its
+  members' outputs with the final weights.
+
+Outputs match scikit-learn to float rounding: XGBoost leaves are float32,
+so its members agree to ~1e-7.  NaN numeric inputs raise ``ValueError``
+wherever the scikit-learn estimator would (all but XGBoost).  A compiled
+graph is saved uncompressed next to its registry version and loaded
+memory-mapped, so scoring workers share one copy of its arrays (forest
+trees excepted: scikit-learn copies tree nodes on load).
+
+Usage:
+    python compiled_model.py compile   # compile every registered pipeline
+    python compiled_model.py bench     # parity and latency against scikit-learn
+"""
+import argparse
+import json
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.interpolate import BSpline
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor, StackingRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, SplineTransformer, StandardScaler
+from sklearn.svm import SVR
+from sklearn.tree import DecisionTreeRegressor
+from xgboost import Booster as XGBBooster, XGBModel
+
+from model_registry import ModelVersion, load_pipeline, versions
+
+COMPILED_FILE = "compiled.joblib"
+# Bumped when graph nodes change; graphs of another format are ignored until recompiled
+COMPILED_FORMAT = 2
+# Rows per block of an SVR kernel matrix or dense forest input
+KERNEL_ROWS = 1024
+# (row, tree) pairs walked at once by a booster
+BOOSTER_LANES = 1 << 16
+# Batches from this size on take the CSR / native XGBoost paths
+SPARSE_ROWS = 64
+
+
+# ───────── Encoding ─────────
+class Batch:
+    """Rows in compact encoded form: standardised numerics and category codes (-1 = unknown)."""
+
+    def __init__(self, encoder: "Encoder", z: np.ndarray, codes: np.ndarray):
+        self.encoder, self.z, self.codes = encoder, z, codes
+        self._numeric = self._compact = None
+
+    def __len__(self) -> int:
+        return len(self.z)
+
+    def require_finite(self) -> None:
+        """Raise as scikit-learn does for estimators that reject NaN inputs (everything but XGBoost)."""
+        if np.isnan(self.z).any():
+            raise ValueError("Input X contains NaN.")
+
+    @property
+    def numeric(self) -> np.ndarray:
+        """The encoded numeric columns (standardised values or spline bases), built on first use."""
+        if self._numeric is None:
+            self._numeric = self.encoder.numeric_columns(self.z)
+        return self._numeric
+
+    def dense(self, start: int, stop: int, dtype=np.float32) -> np.ndarray:
+        """Rows ``start:stop`` of the full encoded matrix, C-contiguous (float32 unless ``dtype`` says otherwise)."""
+        enc = self.encoder
+        codes = self.codes[start:stop]
+        out = np.zeros((len(codes), enc.width), dtype=dtype)
+        out[:, enc.numeric_columns_at] = self.numeric[start:stop]
+        rows, f = np.nonzero(codes >= 0)
+        out[rows, enc.category_starts[f] + codes[rows, f]] = 1.0
+        return out
+
+    def sparse(self, start: int, stop: int) -> sparse.csr_matrix:
+        """Rows ``start:stop`` of the full encoded matrix as CSR, zeros left out as in a sparse ``ColumnTransformer``."""
+        enc = self.encoder
+        num, codes = self.numeric[start:stop], self.codes[start:stop]
+        known = codes >= 0
+        columns = np.hstack([np.broadcast_to(enc.numeric_columns_at, num.shape),
+                             enc.category_starts + np.maximum(codes, 0)])
+        values = np.hstack([num, known.astype(np.float64)])
+        keep = np.hstack([num != 0, known])
+        indptr = np.concatenate([[0], np.cumsum(keep.sum(axis=1))])
+        return sparse.csr_matrix((values[keep], columns[keep], indptr), shape=(len(num), enc.width))
+
+    @property
+    def compact(self) -> np.ndarray:
+        """Numeric columns followed by the category codes: what tree nodes index into."""
+        if self._compact is None:
+            self._compact = np.hstack([self.numeric, self.codes])
+        return self._compact
+
+
+class NumericBlock(NamedTuple):
+    inputs: np.ndarray       # positions in Encoder.numeric_inputs
+    spline: SplineTransformer | None
+    start: int               # first encoded column
+    width: int
+
+
+class Encoder:
+    """Compiled ``ColumnTransformer`` of ``StandardScaler`` (+ ``SplineTransformer``) and ``OneHotEncoder`` blocks."""
+
+    def __init__(self, ct: ColumnTransformer):
+        self.numeric_inputs, self.categorical_inputs = [], []
+        mean, scale, self.blocks, categories, starts = [], [], [], [], []
+        for name, trans, cols in ct.transformers_:
+            if isinstance(trans, str) or name not in ct.output_indices_:
+                if trans != "drop":
+                    raise TypeError(f"cannot compile {trans!r} columns")
+                continue
+            out = ct.output_indices_[name]
+            steps = list(trans.named_steps.values()) if isinstance(trans, Pipeline) else [trans]
+            if isinstance(steps[0], StandardScaler) and len(steps) <= 2:
+                spline = steps[1] if len(steps) == 2 else None
+                if spline is not None and (not isinstance(spline, SplineTransformer)
+                                           or spline.extrapolation not in ("constant", "continue")):
+                    raise TypeError(f"cannot compile {trans!r}")
+                first = len(self.numeric_inputs)
+                self.numeric_inputs.extend(cols)
+                mean.append(steps[0].mean_ if steps[0].with_mean else np.zeros(len(cols)))
+                scale.append(steps[0].scale_ if steps[0].with_std else np.ones(len(cols)))
+                self.blocks.append(NumericBlock(np.arange(first, first + len(cols)), spline, out.start,
+                                                out.stop - out.start))
+            elif isinstance(trans, OneHotEncoder) and trans.drop_idx_ is None and \
+                    sum(len(c) for c in trans.categories_) == out.stop - out.start:
+                self.categorical_inputs.extend(cols)
+                categories.extend(trans.categories_)
+                starts.extend(out.start + np.cumsum([0] + [len(c) for c in trans.categories_[:-1]]))
+            else:
+                raise TypeError(f"cannot compile {trans!r}")
+        self.mean, self.scale = np.concatenate(mean), np.concatenate(scale)
+        self.categories = categories
+        self.category_starts = np.asarray(starts, dtype=np.int64)
+        self.width = max([b.start + b.width for b in self.blocks] +
+                         [s + len(c) for s, c in zip(starts, categories)])
+        self.sparse = bool(ct.sparse_output_)
+        self.numeric_columns_at = np.concatenate([np.arange(b.start, b.start + b.width) for b in self.blocks])
+        self.lookups = [{c: i for i, c in enumerate(cats)} for cats in self.categories]
+
+        # Encoded column → (column of Batch.compact, category code or -1 for numeric columns)
+        self.column_source = np.zeros(self.width, dtype=np.int64)
+        self.column_code = np.full(self.width, -1, dtype=np.int64)
+        offset = 0
+        for block in self.blocks:
+            self.column_source[block.start:block.start + block.width] = offset + np.arange(block.width)
+            offset += block.width
+        for f, (start, cats) in enumerate(zip(self.category_starts, self.categories)):
+            self.column_source[start:start + len(cats)] = offset + f
+            self.column_code[start:start + len(cats)] = np.arange(len(cats))
+
+    def encode(self, X: pd.DataFrame) -> Batch:
+        return self.batch(self.numeric_values(X), self.codes(X))
+
+    def numeric_values(self, X: pd.DataFrame) -> np.ndarray:
+        """Raw ``numeric_inputs`` of ``X`` as an ``(n, len(numeric_inputs))`` float array."""
+        return np.column_stack([np.asarray(X[c], dtype=np.float64) for c in self.numeric_inputs])
+
+    def codes(self, X: pd.DataFrame) -> np.ndarray:
+        """Category codes of ``X``'s ``categorical_inputs`` (-1 for unseen categories)."""
+        codes = np.empty((len(X), len(self.categorical_inputs)), dtype=np.int64)
+        for f, (col, lookup) in enumerate(zip(self.categorical_inputs, self.lookups)):
+            # A dict beats Index.get_indexer on one-row requests; NaN keys only match by identity
+            nan = next((i for c, i in lookup.items() if c != c), -1)
+            codes[:, f] = [lookup.get(v, nan if v != v else -1) for v in X[col].tolist()]
+        return codes
+
+    def batch(self, values: np.ndarray, codes: np.ndarray) -> Batch:
+        """A batch from raw numeric values and category codes, e.g. cached codes with new climate inputs."""
+        return Batch(self, (values - self.mean) / self.scale, codes)
+
+    def numeric_columns(self, z: np.ndarray) -> np.ndarray:
+        parts = []
+        for block in self.blocks:
+            values = z[:, block.inputs]
+            parts.append(values if block.spline is None else block.spline.transform(values))
+        return np.hstack(parts)
+
+
+# ───────── Graph nodes ─────────
+class Linear:
+    """``intercept + Σ numeric terms + Σ category weights`` for a linear model on the encoded matrix."""
+
+    def __init__(self, encoder: Encoder, coef: np.ndarray, intercept: float):
+        self.intercept = float(intercept)
+        self.tables = []  # per categorical input: weights by code, unknown (-1) → trailing 0
+        for start, cats in zip(encoder.category_starts, encoder.categories):
+            self.tables.append(np.append(coef[start:start + len(cats)], 0.0))
+        self.weights, self.splines = [], []
+        for block in encoder.blocks:
+            w = coef[block.start:block.start + block.width]
+            if block.spline is None:
+                self.weights.append((block.inputs, w))
+                continue
+            # One B-spline per input whose coefficients are the Ridge weights of its bases
+            n_bases = block.spline.bsplines_[0].c.shape[1]
+            per_input = n_bases - (not block.spline.include_bias)
+            for i, spl in zip(block.inputs, block.spline.bsplines_):
+                c = w[:per_input]
+                w = w[per_input:]
+                c = np.append(c, 0.0) if per_input < n_bases else c
+                lo, hi = spl.t[spl.k], spl.t[-spl.k - 1]
+                clip = block.spline.extrapolation == "constant"
+                self.splines.append((i, BSpline(spl.t, c, spl.k, extrapolate=not clip), lo, hi, clip))
+
+    def predict(self, batch: Batch) -> np.ndarray:
+        batch.require_finite()
+        out = np.full(len(batch), self.intercept)
+        for inputs, w in self.weights:
+            out += batch.z[:, inputs] @ w
+        for i, spline, lo, hi, clip in self.splines:
+            x = batch.z[:, i]
+            out += spline(np.clip(x, lo, hi) if clip else x)
+        for f, table in enumerate(self.tables):
+            out += table[batch.codes[:, f]]
+        return out
+
+
+class Booster:
+    """An XGBoost ``gbtree`` as flat node arrays, walked level by level for all (row, tree) pairs."""
+
+    def __init__(self, encoder: Encoder, est: XGBModel):
+        model = json.loads(est.get_booster().save_raw("json"))["learner"]
+        booster = model["gradient_booster"]
+        if booster["name"] != "gbtree" or model["objective"]["name"] != "reg:squarederror":
+            raise TypeError("only gbtree boosters with squared-error objective can be compiled")
+        parts, roots, offset = [], [], 0
+        for tree in booster["model"]["trees"]:
+            left = np.asarray(tree["left_children"])
+            leaf = left < 0
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32).astype(np.float64)
+            parts.append((np.where(leaf, -1, tree["split_indices"]), cond,
+                          np.where(leaf, -1, left + offset),
+                          np.where(leaf, -1, np.asarray(tree["right_children"]) + offset),
+                          np.asarray(tree["default_left"], dtype=bool)))
+            roots.append(offset)
+            offset += len(left)
+        feature, self.threshold, self.left, self.right, self.default_left = (np.concatenate(p) for p in zip(*parts))
+        # Leaves store their value in split_conditions
+        self.value = self.threshold
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.base = float(np.float32(model["learner_model_param"]["base_score"]))
+        # Nodes read Batch.compact; a one-hot split compares the category code instead
+        split = feature >= 0
+        self.column = np.where(split, encoder.column_source[np.maximum(feature, 0)], -1)
+        self.code = np.where(split, encoder.column_code[np.maximum(feature, 0)], -1).astype(np.float32)
+        # Fitted on sparse input: absent (zero) entries are missing
+        self.missing_zero = encoder.sparse
+        self.raw = np.frombuffer(est.get_booster().save_raw("ubj"), dtype=np.uint8)
+        self._native = None
+
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "_native": None}
+
+    @property
+    def native(self) -> XGBBooster:
+        """The booster itself, for large batches; loaded on first use and single-threaded."""
+        if self._native is None:
+            self._native = XGBBooster(model_file=bytearray(self.raw))
+            self._native.set_param({"nthread": 1})
+        return self._native
+
+    def predict(self, batch: Batch) -> np.ndarray:
+        if len(batch) >= SPARSE_ROWS:
+            enc = batch.encoder
+            X = batch.sparse(0, len(batch)) if enc.sparse else batch.dense(0, len(batch))
+            return self.native.inplace_predict(X.astype(np.float32)).astype(np.float64)
+        # XGBoost compares float32 inputs; category codes are exact in float32
+        X = batch.compact.astype(np.float32)
+        n_trees = len(self.roots)
+        step = max(1, BOOSTER_LANES // n_trees)
+        out = np.empty(len(batch))
+        for start in range(0, len(batch), step):
+            n = min(step, len(batch) - start)
+            node = np.tile(self.roots, n)
+            rows = np.repeat(np.arange(start, start + n), n_trees)
+            lanes = np.arange(n * n_trees)
+            while True:
+                at = node[lanes]
+                column = self.column[at]
+                split = column >= 0
+                if not split.all():
+                    lanes, at, column = lanes[split], at[split], column[split]
+                    if not lanes.size:
+                        break
+                x = X[rows[lanes], column]
+                code = self.code[at]
+                x = np.where(code >= 0, x == code, x).astype(np.float64)
+                go_left = x < self.threshold[at]
+                missing = np.isnan(x)
+                if self.missing_zero:
+                    missing |= x == 0
+                go_left = np.where(missing, self.default_left[at], go_left)
+                node[lanes] = np.where(go_left, self.left[at], self.right[at])
+            out[start:start + n] = self.value[node].reshape(n, n_trees).sum(axis=1)
+        return self.base + out
+
+
+class Forest:
+    """scikit-learn trees walked by their own Cython ``predict`` on a float32 encoding, in one thread."""
+
+    def __init__(self, est):
+        self.trees = [t.tree_ for t in getattr(est, "estimators_", [est])]
+
+    def predict(self, batch: Batch) -> np.ndarray:
+        batch.require_finite()
+        if len(batch) >= SPARSE_ROWS:
+            X = batch.sparse(0, len(batch)).astype(np.float32)
+            return sum(tree.predict(X)[:, 0] for tree in self.trees) / len(self.trees)
+        out = np.empty(len(batch))
+        for start in range(0, len(batch), KERNEL_ROWS):
+            X = batch.dense(start, start + KERNEL_ROWS)
+            total = np.zeros(len(X))
+            for tree in self.trees:
+                total += tree.predict(X)[:, 0]
+            out[start:start + len(X)] = total / len(self.trees)
+        return out
+
+
+class Kernel:
+    """RBF ``SVR`` evaluated from numeric columns and category codes."""
+
+    def __init__(self, encoder: Encoder, est: SVR):
+        sv = est.support_vectors_
+        sv = sv.toarray() if hasattr(sv, "toarray") else np.asarray(sv, dtype=np.float64)
+        coef = est.dual_coef_
+        self.coef = np.ravel(coef.toarray() if hasattr(coef, "toarray") else coef)
+        self.gamma, self.intercept = float(est._gamma), float(est.intercept_[0])
+        self.sv_numeric = np.ascontiguousarray(sv[:, encoder.numeric_columns_at].T)  # (numeric columns, n_sv)
+        # Per categorical input, the support vectors' one-hot columns by code (unknown → zeros)
+        self.sv_codes = [np.vstack([sv[:, s:s + len(c)].T, np.zeros(len(sv))])
+                         for s, c in zip(encoder.category_starts, encoder.categories)]
+        self.sv_sq = (sv ** 2).sum(axis=1)
+        self.sv_t = np.ascontiguousarray(sv.T)  # (encoded columns, n_sv), for CSR blocks
+
+    def predict(self, batch: Batch) -> np.ndarray:
+        batch.require_finite()
+        out = np.empty(len(batch))
+        for start in range(0, len(batch), KERNEL_ROWS):
+            num = batch.numeric[start:start + KERNEL_ROWS]
+            codes = batch.codes[start:start + KERNEL_ROWS]
+            if len(batch) >= SPARSE_ROWS:
+                cross = batch.sparse(start, start + KERNEL_ROWS) @ self.sv_t
+            else:
+                cross = num @ self.sv_numeric
+                for f, table in enumerate(self.sv_codes):
+                    cross += table[codes[:, f]]
+            # exp(-gamma * max(|x|² + |sv|² - 2 x·sv, 0)), in place on the block
+            cross *= -2.0
+            cross += ((num ** 2).sum(axis=1) + (codes >= 0).sum(axis=1))[:, None]
+            cross += self.sv_sq
+            np.maximum(cross, 0.0, out=cross)
+            cross *= -self.gamma
+            out[start:start + KERNEL_ROWS] = np.exp(cross, out=cross) @ self.coef
+        return out + self.intercept
+
+
+class Stack:
+    """Members combined by a linear final estimator."""
+
+    def __init__(self, members: list, weights: np.ndarray, intercept: float):
+        self.members, self.weights, self.intercept = members, np.asarray(weights, dtype=np.float64), float(intercept)
+
+    def predict(self, batch: Batch) -> np.ndarray:
+        out = np.full(len(batch), self.intercept)
+        for member, w in zip(self.members, self.weights):
+            out += w * member.predict(batch)
+        return out
+
+
+def _node(est, encoder: Encoder):
+    if isinstance(est, Pipeline) and len(est.steps) == 1:
+        est = est[-1]
+    if isinstance(est, StackingRegressor) and not est.passthrough and getattr(est.final_estimator_, "coef_", None) is not None:
+        final = est.final_estimator_
+        return Stack([_node(e, encoder) for e in est.estimators_], np.ravel(final.coef_), np.ravel(final.intercept_)[0])
+    if isinstance(est, XGBModel):
+        return Booster(encoder, est)
+    if isinstance(est, (RandomForestRegressor, ExtraTreesRegressor, DecisionTreeRegressor)):
+        return Forest(est)
+    if isinstance(est, SVR) and est.kernel == "rbf":
+        return Kernel(encoder, est)
+    coef = getattr(est, "coef_", None)
+    if coef is not None:
+        coef = np.ravel(coef.toarray() if hasattr(coef, "toarray") else coef)
+        return Linear(encoder, coef, np.ravel(est.intercept_)[0])
+    raise TypeError(f"cannot compile {type(est).__name__}")
+
+
+class CompiledModel:
+    """A compiled pipeline; ``predict`` takes the same DataFrame the pipeline does."""
+
+    def __init__(self, pipeline):
+        steps = getattr(pipeline, "steps", None)
+        if not steps or len(steps) != 2 or not isinstance(steps[0][1], ColumnTransformer):
+            raise TypeError("expected a Pipeline of a ColumnTransformer and one estimator")
+        self.format = COMPILED_FORMAT
+        self.feature_names_in_ = np.asarray(pipeline.feature_names_in_, dtype=object)
+        self.encoder = Encoder(steps[0][1])
+        self.graph = _node(steps[1][1], self.encoder)
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.graph.predict(self.encoder.encode(X))
+
+
+def compile_pipeline(pipeline) -> CompiledModel:
+    """Compile a fitted pipeline; raises ``TypeError`` for layouts it cannot express."""
+    return CompiledModel(pipeline)
+
+
+# ───────── Registry ─────────
+def compile_version(version: ModelVersion) -> Path:
+    """Compile ``version``'s pipeline into its registry directory."""
+    path = version.path / COMPILED_FILE
+    tmp = path.with_suffix(".tmp")
+    joblib.dump(compile_pipeline(load_pipeline(version, mmap=False)), tmp)
+    tmp.replace(path)
+    return path
+
+
+@lru_cache(maxsize=8)
+def _load(path: Path, mtime_ns: int, mmap: bool) -> CompiledModel:
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
+
+def load_compiled(version: ModelVersion, mmap: bool = True) -> CompiledModel | None:
+    """The compiled graph stored with ``version`` (process-wide, memory-mapped), or ``None`` if absent or stale."""
+    path = version.path / COMPILED_FILE
+    if not path.exists():
+        return None
+    compiled = _load(path, path.stat().st_mtime_ns, mmap)
+    return compiled if getattr(compiled, "format", None) == COMPILED_FORMAT else None
+
+
+def benchmark(version: ModelVersion, X: pd.DataFrame, single_rows: int = 200) -> dict:
+    """Parity and latency of the compiled graph against ``version``'s scikit-learn pipeline."""
+    pipeline = load_pipeline(version)
+    compiled = load_compiled(version) or compile_pipeline(pipeline)
+    timings = {}
+    for name, model in (("sklearn", pipeline), ("compiled", compiled)):
+        model.predict(X.iloc[:1])
+        t0 = time.perf_counter()
+        full = model.predict(X)
+        batch = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for i in range(min(single_rows, len(X))):
+            model.predict(X.iloc[i:i + 1])
+        single = (time.perf_counter() - t0) / min(single_rows, len(X))
+        timings[name] = (full, batch, single)
+    return {
+        "rows": len(X),
+        "max_abs_diff": float(np.max(np.abs(timings["sklearn"][0] - timings["compiled"][0]))),
+        **{f"{name}_batch_s": t[1] for name, t in timings.items()},
+        **{f"{name}_row_ms": 1000 * t[2] for name, t in timings.items()},
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compile registered pipelines into NumPy inference graphs.")
+    parser.add_argument("command", choices=["compile", "bench"])
+    args = parser.parse_args(argv)
+
+    found = [v for v in versions() if v.has_pipeline]
+    if args.command == "compile":
+        for v in found:
+            try:
+                path = compile_version(v)
+            except TypeError as exc:
+                print(f"Skipped {v.system}/{v.model} v{v.version}: {exc}")
+                continue
+            print(f"Compiled {v.system}/{v.model} v{v.version} -> {path.name} ({path.stat().st_size / 1e6:.1f} MB)")
+        return
+
+    # Imported here: only the benchmark needs the dataset
+    from data_store import MERGED_CSV, MERGED_STORE, read_table
+    from risk_scoring import SYSTEM_TYPES
+
+    data = read_table(MERGED_STORE, MERGED_CSV)
+    for v in found:
+        X = data.loc[data["system_type"] == SYSTEM_TYPES[v.system], list(load_pipeline(v).feature_names_in_)]
+        r = benchmark(v, X)
+        print(f"{v.system}/{v.model} v{v.version}: {r['rows']} rows, max |Δ| {r['max_abs_diff']:.2e}; "
+              f"batch {r['sklearn_batch_s'] * 1000:.0f} → {r['compiled_batch_s'] * 1000:.0f} ms; "
+              f"single row {r['sklearn_row_ms']:.2f} → {r['compiled_row_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    # Run through the importable module so pickled graphs reference ``compiled_model``, not ``__main__``
+    import compiled_model
+
+    compiled_model.main()
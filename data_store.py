@@ -0,0 +1,107 @@
+"""
+Typed columnar (Parquet) store for the survey and merged climate tables.
+
+The CSVs under ``data/`` stay the source of truth; this module writes a
+Parquet copy with dictionary-encoded categoricals and compact integer
+dtypes, and reads it back with column projection so callers only
+materialise the columns they actually use.
+
+Run ``python data_store.py`` to (re)build the stores from the CSVs.
+"""
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# ───────── Paths ─────────
+ROOT          = Path(__file__).parent
+RAW_DIR       = ROOT / "data" / "raw"
+PROCESSED_DIR = ROOT / "data" / "processed"
+
+SURVEY_CSV   = RAW_DIR / "complete_plant_disease_database.csv"
+SURVEY_STORE = PROCESSED_DIR / "complete_plant_disease_database.parquet"
+MERGED_CSV   = PROCESSED_DIR / "merged_climate_disease_final.csv"
+MERGED_STORE = PROCESSED_DIR / "merged_climate_disease_final.parquet"
+
+# ───────── Schema ─────────
+# Low-cardinality text columns stored as dictionary-encoded categoricals.
+# Both the raw survey names and the renamed ETL names are listed so the
+# same schema applies before and after the 00 notebook's rename step.
+CATEGORICAL_COLUMNS = [
+    "Natural_or_ag", "system_type",
+    "Host_order", "Host_family", "Host_type", "Habitat",
+    "Antagonist_type_general", "Antagonist_type_specific", "Parasite_or_pest",
+    "Transmission_mode", "Vector_type", "Detection_method",
+    "Coarse_spatial_scale", "Sample_type", "Response metric",
+    "Same_plants_tested_multiple", "Coordinates_provided_in_study",
+    "Months", "incidence_zone",
+]
+DATE_COLUMNS = ["start_date", "end_date"]
+
+
+def prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast ``df`` to the store schema (categoricals, dates, small ints)."""
+    out = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("category")
+    for col in DATE_COLUMNS:
+        if col in out.columns:
+            out[col] = pd.to_datetime(out[col], errors="coerce")
+    for col in out.select_dtypes("integer").columns:
+        out[col] = pd.to_numeric(out[col], downcast="integer")
+    return out
+
+
+def write_store(df: pd.DataFrame, path: Path) -> Path:
+    """Write ``df`` to a Parquet store at ``path`` using the store schema."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    prepare(df).to_parquet(path, engine="pyarrow", index=False)
+    return path
+
+
+def read_store(path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """Read ``columns`` (default: all) from the Parquet store at ``path``."""
+    return pd.read_parquet(path, engine="pyarrow", columns=columns)
+
+
+def read_table(store: Path, csv: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Read a table from its Parquet store, falling back to the CSV.
+
+    The store is used only if it is at least as new as the CSV, so a
+    hand-edited or re-exported CSV is never shadowed by a stale store.
+    """
+    store, csv = Path(store), Path(csv)
+    if store.exists() and (not csv.exists() or store.stat().st_mtime >= csv.stat().st_mtime):
+        return read_store(store, columns)
+    if csv.exists():
+        return prepare(pd.read_csv(csv, usecols=columns))
+    raise FileNotFoundError(f"Neither {store} nor {csv} exists")
+
+
+def table_columns(store: Path, csv: Path) -> list[str]:
+    """Column names of the table :func:`read_table` would read, from the Parquet schema or CSV header only."""
+    store, csv = Path(store), Path(csv)
+    if store.exists() and (not csv.exists() or store.stat().st_mtime >= csv.stat().st_mtime):
+        return pq.read_schema(store).names
+    if csv.exists():
+        return list(pd.read_csv(csv, nrows=0).columns)
+    return []
+
+
+def load_survey(columns: list[str] | None = None) -> pd.DataFrame:
+    """Load the raw survey table, rebuilding its store if the CSV is newer."""
+    if not SURVEY_STORE.exists() or SURVEY_STORE.stat().st_mtime < SURVEY_CSV.stat().st_mtime:
+        write_store(pd.read_csv(SURVEY_CSV), SURVEY_STORE)
+    return read_store(SURVEY_STORE, columns)
+
+
+if __name__ == "__main__":
+    for csv, store in [(SURVEY_CSV, SURVEY_STORE), (MERGED_CSV, MERGED_STORE)]:
+        if csv.exists():
+            write_store(pd.read_csv(csv), store)
+            print(f"Wrote {store.relative_to(ROOT)} ({csv.stat().st_size:,} → {store.stat().st_size:,} bytes)")
+        else:
+            print(f"Skipped {csv.relative_to(ROOT)} (not found)")
@@ -0,0 +1,69 @@
+"""
+Bounded-mark downsampling for scatter plots.
+
+``thin_points`` keeps at most ``max_points`` marks by bucketing points
+into a ``grid × grid`` density grid and capping how many survive per
+cell: sparse cells (outliers, tails) keep every point, while dense cells
+are thinned uniformly at random.  The shape of the cloud and its
+extremes are preserved, and render cost stays flat as the data grows.
+``density_grid`` gives the per-cell counts so the thinned mass can be
+drawn underneath as a heatmap.
+"""
+import numpy as np
+
+GRID = 64
+
+
+def _extent(x: np.ndarray, y: np.ndarray, extent) -> tuple[tuple[float, float], tuple[float, float]]:
+    if extent is not None:
+        return extent
+    return (float(x.min()), float(x.max())), (float(y.min()), float(y.max()))
+
+
+def _cell_index(x: np.ndarray, y: np.ndarray, grid: int, extent) -> np.ndarray:
+    cells = []
+    for values, (lo, hi) in zip((x, y), extent):
+        span = (hi - lo) or 1.0
+        cells.append(np.clip(((values - lo) / span * grid).astype(np.int64), 0, grid - 1))
+    return cells[0] * grid + cells[1]
+
+
+def _cell_quota(counts: np.ndarray, max_points: int) -> int:
+    """Largest per-cell cap ``k`` with ``sum(min(counts, k)) <= max_points`` (at least 1)."""
+    lo, hi = 0, int(counts.max())
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if np.minimum(counts, mid).sum() <= max_points:
+            lo = mid
+        else:
+            hi = mid - 1
+    return max(lo, 1)
+
+
+def thin_points(x, y, max_points: int, grid: int = GRID, extent=None, seed: int = 0) -> np.ndarray:
+    """
+    Return sorted indices of at most ~``max_points`` points to draw.
+
+    Every occupied grid cell keeps at least one point, so the budget is
+    only exceeded when more than ``max_points`` cells are occupied.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    cells = _cell_index(x, y, grid, _extent(x, y, extent))
+    # Random order within each cell, so the kept points are a uniform sample of it
+    order = np.lexsort((np.random.default_rng(seed).random(n), cells))
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, counts)
+    return np.sort(order[rank < _cell_quota(counts, max_points)])
+
+
+def density_grid(x, y, grid: int = GRID, extent=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Point counts on the ``grid × grid`` cells used by :func:`thin_points`: ``(counts, xedges, yedges)``."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return np.histogram2d(x, y, bins=grid, range=_extent(x, y, extent))
@@ -0,0 +1,356 @@
+"""
+Scripted ETL pipeline extracted from the 00/01 notebooks.
+
+Stages run in order — merge → filter_duration → trim_quantiles → impute →
+derive_anomalies → bin_zones — and each stage's output is cached under
+``data/processed/.etl_cache`` keyed on a content hash of the raw inputs,
+every upstream stage's parameters and code, and its own.  A stage's code
+covers the helpers and module constants it reads (``STAGES`` declares
+them), so editing e.g. ``CLIMATE_RENAMES`` or the :mod:`climate_features`
+kernel invalidates the caches that depend on it.  Re-running only
+recomputes from the first stage whose key changed.
+
+Usage:
+    python etl_pipeline.py                    # incremental run
+    python etl_pipeline.py --max-duration 6   # re-runs filter_duration onwards
+    python etl_pipeline.py --force            # ignore the cache
+"""
+import argparse
+import hashlib
+import inspect
+import json
+from pathlib import Path
+from typing import Callable, NamedTuple, Sequence
+
+import pandas as pd
+
+import climate_features
+import neighbor_imputer
+from climate_features import feature_frame
+from data_store import MERGED_CSV, MERGED_STORE, PROCESSED_DIR, RAW_DIR, SURVEY_CSV, write_store
+from neighbor_imputer import NeighborImputer
+
+CLIMATE_CSV = RAW_DIR / "complete_plant_study_climate_data.csv"
+CACHE_DIR   = PROCESSED_DIR / ".etl_cache"
+
+SURVEY_RENAMES = {
+    "Obs": "obs",
+    "NUM_ID": "study_id",
+    "Short reference": "study_reference",
+    "Natural_or_ag": "system_type",
+    "Location": "location",
+    "n": "n_plants",
+    "Infected": "n_infected",
+    "Incidence": "incidence",
+}
+CLIMATE_RENAMES = {
+    "bio01": "annual_mean_temp",
+    "bio12": "annual_precip",
+    "tavg": "monthly_temp",
+    "prec": "monthly_precip",
+    "total_precipitation": "contemp_precip",
+    "temperature_2m": "contemp_temp",
+    # Survey-window aggregates written by climate_join.py
+    "temperature_2m_min": "contemp_temp_min",
+    "temperature_2m_max": "contemp_temp_max",
+    "total_precipitation_min": "contemp_precip_min",
+    "total_precipitation_max": "contemp_precip_max",
+    "degree_days": "contemp_degree_days",
+}
+
+# Right-inclusive incidence bins, as passed to ``pd.cut``
+ZONE_BINS   = [-0.01, 0.2, 0.5, 1.0]
+ZONE_LABELS = ["Low", "Moderate", "High"]
+
+
+# ───────── Stages ─────────
+def merge_tables(survey: pd.DataFrame, climate: pd.DataFrame) -> pd.DataFrame:
+    """Rename both tables to the project schema and inner-join on ``obs``."""
+    survey = survey.rename(columns=SURVEY_RENAMES)
+    climate = climate.rename(columns=CLIMATE_RENAMES)
+    if "obs" not in survey.columns or "obs" not in climate.columns:
+        raise KeyError("Merge key 'obs' not found in both datasets")
+    return pd.merge(survey, climate, on="obs", how="inner")
+
+
+def filter_duration(df: pd.DataFrame, max_duration_mo: int | None = None) -> pd.DataFrame:
+    """
+    Add inclusive ``duration_mo`` and drop missing or non-positive windows.
+
+    Contemporaneous climate is aggregated over the whole survey window
+    (see ``climate_join.py``), so multi-month surveys are kept unless
+    ``max_duration_mo`` caps them (the notebooks used 6).
+    """
+    df = df.copy()
+    df["start_date"] = pd.to_datetime(df["start_date"], errors="coerce")
+    df["end_date"] = pd.to_datetime(df["end_date"], errors="coerce")
+    df["duration_mo"] = (
+        (df.end_date.dt.year - df.start_date.dt.year) * 12
+        + (df.end_date.dt.month - df.start_date.dt.month)
+        + 1
+    )
+    keep = df["duration_mo"].notna() & (df["duration_mo"] > 0)
+    if max_duration_mo is not None:
+        keep &= df["duration_mo"] <= max_duration_mo
+    return df[keep].reset_index(drop=True)
+
+
+def trim_quantiles(
+    df: pd.DataFrame,
+    columns: Sequence[str] = ("contemp_temp", "annual_mean_temp", "contemp_precip", "annual_precip"),
+    lower: float = 0.025,
+    upper: float = 0.975,
+) -> pd.DataFrame:
+    """Trim each column to its [lower, upper] quantile range, one column after another."""
+    for col in columns:
+        lo, hi = df[col].quantile([lower, upper])
+        df = df[(df[col] >= lo) & (df[col] <= hi)]
+    return df.reset_index(drop=True)
+
+
+IMPUTE_DROP_COLUMNS = ["Water", "Antagonist_isolate", "Host_age", "Host_strain"]
+MODE_COLUMNS = ["Transmission_mode", "Coarse_spatial_scale"]
+MEDIAN_COLUMNS = ["annual_mean_temp", "annual_precip", "contemp_temp", "contemp_precip"]
+MONTHLY_COLUMNS = ["monthly_temp", "monthly_precip"]
+
+
+class ImputeStats(NamedTuple):
+    """Dataset-wide statistics :func:`apply_impute` fills from."""
+    modes: dict[str, object]
+    medians: dict[str, float]
+    monthly: NeighborImputer  # fitted on ``MONTHLY_COLUMNS``
+    locations_median: float
+
+
+def sampled(df: pd.DataFrame) -> pd.Series:
+    """Rows with a defined incidence (non-missing, non-zero sample)."""
+    return df["incidence"].notna() & (df["n_plants"] != 0)
+
+
+def impute_stats(df: pd.DataFrame, knn_neighbors: int = 5) -> ImputeStats:
+    """Fill values for :func:`apply_impute`, taken from all of ``df``."""
+    return ImputeStats(
+        modes={col: df[col].mode()[0] for col in MODE_COLUMNS},
+        medians={col: df[col].median() for col in MEDIAN_COLUMNS},
+        monthly=NeighborImputer(MONTHLY_COLUMNS, n_neighbors=knn_neighbors).fit(df),
+        locations_median=df.loc[sampled(df), "Number_sampled_locations"].median(),
+    )
+
+
+def apply_impute(df: pd.DataFrame, stats: ImputeStats) -> pd.DataFrame:
+    """
+    Drop sparse columns and impute categoricals/climate as in the 01 notebook.
+
+    Monthly normals come from nearby surveys in the same calendar month
+    (:mod:`neighbor_imputer`) rather than the notebook's KNNImputer; rows
+    with no such donor take their annual normals as a flat profile.
+    """
+    df = df.drop(columns=IMPUTE_DROP_COLUMNS, errors="ignore")
+    for col in ["Vector_species", "Vector_type"]:
+        df[col] = df[col].fillna("Unknown")
+    for col, value in stats.modes.items():
+        df[col] = df[col].fillna(value)
+    for col, value in stats.medians.items():
+        df[col] = df[col].fillna(value)
+    df[MONTHLY_COLUMNS] = stats.monthly.transform(df)
+    # No same-month donor within reach: annual normals (tenths °C, mm/year) as a flat profile
+    df["monthly_temp"] = df["monthly_temp"].fillna(df["annual_mean_temp"])
+    df["monthly_precip"] = df["monthly_precip"].fillna(df["annual_precip"] / 12.0)
+
+    # Incidence is undefined without a sample; drop before the remaining fills
+    df = df[sampled(df)].reset_index(drop=True)
+    for col in ["Host_family", "Host_order", "Host_type", "Antagonist_species"]:
+        df[col] = df[col].fillna("Unknown")
+    df["Number_sampled_locations"] = df["Number_sampled_locations"].fillna(stats.locations_median)
+    return df
+
+
+def impute(df: pd.DataFrame, knn_neighbors: int = 5) -> pd.DataFrame:
+    """:func:`apply_impute` with statistics from ``df`` itself."""
+    return apply_impute(df, impute_stats(df, knn_neighbors))
+
+
+def derive_anomalies(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the unit-converted climate columns and anomalies from :mod:`climate_features`."""
+    features = feature_frame(df)
+    return pd.concat([df.drop(columns=features.columns, errors="ignore"), features], axis=1)
+
+
+def bin_zones(
+    df: pd.DataFrame,
+    bins: Sequence[float] = (-0.01, 0.2, 0.5, 1.0),
+    labels: Sequence[str] = ("Low", "Moderate", "High"),
+) -> pd.DataFrame:
+    """Bin ``incidence`` into the Low/Moderate/High ``incidence_zone``."""
+    df = df.copy()
+    df["incidence_zone"] = pd.cut(df["incidence"], bins=list(bins), labels=list(labels))
+    return df
+
+
+class Stage(NamedTuple):
+    name: str
+    func: Callable[..., pd.DataFrame]
+    params: dict
+    helpers: tuple = ()              # functions, classes or modules the stage delegates to
+    constants: tuple[str, ...] = ()  # names of this module's constants the stage reads
+
+
+STAGES = [
+    Stage("filter_duration", filter_duration, {"max_duration_mo": None}),
+    Stage("trim_quantiles", trim_quantiles, {
+        "columns": ["contemp_temp", "annual_mean_temp", "contemp_precip", "annual_precip"],
+        "lower": 0.025,
+        "upper": 0.975,
+    }),
+    Stage("impute", impute, {"knn_neighbors": 5}, (impute_stats, apply_impute, sampled, neighbor_imputer), (
+        "IMPUTE_DROP_COLUMNS", "MODE_COLUMNS", "MEDIAN_COLUMNS", "MONTHLY_COLUMNS",
+    )),
+    Stage("derive_anomalies", derive_anomalies, {}, (climate_features,)),
+    Stage("bin_zones", bin_zones, {"bins": ZONE_BINS, "labels": ZONE_LABELS}),
+]
+
+
+# ───────── Caching ─────────
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stage_key(
+    upstream: str,
+    name: str,
+    func: Callable,
+    params: dict,
+    helpers: Sequence = (),
+    constants: Sequence[str] = (),
+) -> str:
+    h = hashlib.sha256()
+    h.update(upstream.encode())
+    h.update(name.encode())
+    for code in (func, *helpers):
+        h.update(inspect.getsource(code).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    # Looked up when the key is computed, so the current values are always hashed
+    values = {const: globals()[const] for const in constants}
+    h.update(json.dumps(values, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _cache_path(cache_dir: Path, name: str, key: str) -> Path:
+    return Path(cache_dir) / f"{name}-{key[:16]}.parquet"
+
+
+def stage_keys(
+    survey_path: Path = SURVEY_CSV,
+    climate_path: Path = CLIMATE_CSV,
+    overrides: dict[str, dict] | None = None,
+) -> list[tuple[str, str]]:
+    """Return ``(stage name, cache key)`` for every stage, without running any."""
+    overrides = overrides or {}
+    key = _stage_key(
+        _file_digest(survey_path) + _file_digest(climate_path), "merge", merge_tables, {},
+        constants=("SURVEY_RENAMES", "CLIMATE_RENAMES"),
+    )
+    keys = [("merge", key)]
+    for stage in STAGES:
+        params = {**stage.params, **overrides.get(stage.name, {})}
+        key = _stage_key(key, stage.name, stage.func, params, stage.helpers, stage.constants)
+        keys.append((stage.name, key))
+    return keys
+
+
+# ───────── Runner ─────────
+def run_pipeline(
+    survey_path: Path = SURVEY_CSV,
+    climate_path: Path = CLIMATE_CSV,
+    overrides: dict[str, dict] | None = None,
+    cache_dir: Path = CACHE_DIR,
+    force: bool = False,
+) -> tuple[pd.DataFrame, list[tuple[str, str]]]:
+    """
+    Run the pipeline incrementally and return ``(final df, report)``.
+
+    ``overrides`` maps stage name → parameter overrides.  ``report`` lists
+    ``(stage, status)`` where status is "cached", "computed" or "skipped"
+    (stages upstream of the newest cache hit never need loading).
+    """
+    overrides = overrides or {}
+    unknown = set(overrides) - {s.name for s in STAGES}
+    if unknown:
+        raise KeyError(f"Unknown stage(s) in overrides: {sorted(unknown)}")
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    keys = stage_keys(survey_path, climate_path, overrides)
+
+    # Resume from the newest stage whose output is already cached
+    start = 0
+    if not force:
+        for i in range(len(keys) - 1, -1, -1):
+            if _cache_path(cache_dir, *keys[i]).exists():
+                start = i + 1
+                break
+
+    report = [(name, "skipped") for name, _ in keys[:max(start - 1, 0)]]
+    if start:
+        name, key = keys[start - 1]
+        df = pd.read_parquet(_cache_path(cache_dir, name, key))
+        report.append((name, "cached"))
+    else:
+        df = merge_tables(pd.read_csv(survey_path), pd.read_csv(climate_path))
+        df.to_parquet(_cache_path(cache_dir, *keys[0]), index=False)
+        report.append(("merge", "computed"))
+        start = 1
+
+    for stage, (name, key) in zip(STAGES[start - 1:], keys[start:]):
+        df = stage.func(df, **{**stage.params, **overrides.get(name, {})})
+        df.to_parquet(_cache_path(cache_dir, name, key), index=False)
+        report.append((name, "computed"))
+    return df, report
+
+
+def clear_stale_cache(cache_dir: Path = CACHE_DIR, keep: list[tuple[str, str]] = ()) -> int:
+    """Delete cached stage outputs not listed in ``keep``; return how many were removed."""
+    wanted = {_cache_path(cache_dir, name, key).name for name, key in keep}
+    removed = 0
+    for path in Path(cache_dir).glob("*.parquet"):
+        if path.name not in wanted:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the ClimaCrop ETL pipeline incrementally.")
+    parser.add_argument("--survey", type=Path, default=SURVEY_CSV, help="raw survey CSV")
+    parser.add_argument("--climate", type=Path, default=CLIMATE_CSV, help="raw climate CSV")
+    parser.add_argument("--max-duration", type=int, help="max survey window in months (0 = no limit)")
+    parser.add_argument("--quantiles", type=float, nargs=2, metavar=("LO", "HI"), help="trim quantiles")
+    parser.add_argument("--knn-neighbors", type=int, help="neighbours for monthly climate imputation")
+    parser.add_argument("--force", action="store_true", help="recompute every stage")
+    parser.add_argument("--prune", action="store_true", help="delete cache entries from older runs")
+    args = parser.parse_args(argv)
+
+    overrides: dict[str, dict] = {}
+    if args.max_duration is not None:
+        overrides["filter_duration"] = {"max_duration_mo": args.max_duration or None}
+    if args.quantiles:
+        overrides["trim_quantiles"] = {"lower": args.quantiles[0], "upper": args.quantiles[1]}
+    if args.knn_neighbors:
+        overrides["impute"] = {"knn_neighbors": args.knn_neighbors}
+
+    df, report = run_pipeline(args.survey, args.climate, overrides, force=args.force)
+    for name, status in report:
+        print(f"  {name:<18} {status}")
+
+    df.to_csv(MERGED_CSV, index=False)
+    write_store(df, MERGED_STORE)
+    print(f"Saved cleaned dataset to: {MERGED_CSV} and {MERGED_STORE.name}", df.shape)
+    if args.prune:
+        print(f"Pruned {clear_stale_cache(keep=stage_keys(args.survey, args.climate, overrides))} stale cache file(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Permutation importance for the incidence models, batched and cached.
+
+``sklearn.inspection.permutation_importance`` re-runs the whole pipeline
+once per feature per repeat.  Here the validation set is preprocessed
+once; for pipelines that start with a ``ColumnTransformer`` whose steps
+encode each input column separately (scalers, splines, one-hot), permuting
+an input column is the same as permuting its block of encoded columns, so
+only the final estimator is ever re-run.  Other models fall back to
+permuting the raw columns.  Either way all permuted copies of a chunk of
+features are stacked into a few large ``predict`` calls, and chunks of
+features can be scored on a process pool.
+
+Importances are computed per input column, so all one-hot levels of e.g.
+``Detection_method`` are permuted together, or per named group of columns
+(``FEATURE_GROUPS``), which permutes its columns jointly.  Results for a
+registered model are stored next to it in the registry, keyed by the
+settings and the validation data.
+
+Usage:
+    python feature_importance.py                    # images/perm_importance_{ag,wd}.html
+    python feature_importance.py --grouped --n-repeats 10 --n-jobs 4
+"""
+import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import StackingRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, SplineTransformer
+from sklearn.svm import SVR
+
+from colors import AG_COLOR, WILD_COLOR
+from model_registry import ModelVersion, best_version, load_pipeline
+from risk_scoring import BEST_MODELS, SYSTEM_TYPES, _single_threaded
+
+IMG_DIR = Path(__file__).parent / "images"
+N_REPEATS = 5
+# Rows per stacked predict call, and per block of an SVR kernel matrix
+BATCH_ROWS = 50_000
+KERNEL_ROWS = 4096
+
+FEATURE_GROUPS = {
+    "Temperature": ["monthly_temp", "contemp_temp", "annual_mean_temp", "temp_anomaly",
+                    "monthly_temp_x_temp_anomaly"],
+    "Precipitation": ["monthly_precip", "contemp_precip", "annual_precip", "rain_anomaly"],
+    "Location": ["Longitude", "Latitude", "location"],
+    "Host taxonomy": ["Host.species", "Host_family", "Host_order", "Host_type"],
+    "Pathogen": ["Antagonist_species", "Transmission_mode"],
+    "Survey design": ["Detection_method", "duration_mo"],
+}
+FIGURE_FILES = {"Agricultural": "perm_importance_ag.html", "Wild": "perm_importance_wd.html"}
+FIGURE_COLORS = {"Agricultural": AG_COLOR, "Wild": WILD_COLOR}
+
+
+# ───────── Design matrix ─────────
+def _output_blocks(trans, columns: list[str], width: int) -> list[np.ndarray] | None:
+    """Encoded-column offsets produced by each input column, or ``None`` if they mix."""
+    if isinstance(trans, Pipeline):
+        trans = trans[-1]
+    if trans == "passthrough" or width == len(columns):  # scalers and other 1:1 transformers
+        sizes = [1] * len(columns)
+    elif isinstance(trans, OneHotEncoder):
+        sizes = [len(c) for c in trans.categories_]
+    elif isinstance(trans, SplineTransformer):
+        sizes = [width // len(columns)] * len(columns)  # contiguous per input column
+    else:
+        return None
+    if sum(sizes) != width:  # dropped or infrequent levels
+        return None
+    edges = np.cumsum([0, *sizes])
+    return [np.arange(a, b) for a, b in zip(edges[:-1], edges[1:])]
+
+
+def encoded_blocks(ct: ColumnTransformer) -> dict[str, np.ndarray] | None:
+    """Input column → indices of its encoded columns, or ``None`` if ``ct`` mixes columns."""
+    blocks = {}
+    for name, trans, cols in ct.transformers_:
+        if trans == "drop" or name not in ct.output_indices_:
+            continue
+        out = ct.output_indices_[name]
+        found = _output_blocks(trans, list(cols), out.stop - out.start)
+        if found is None:
+            return None
+        blocks.update({col: out.start + idx for col, idx in zip(cols, found)})
+    return blocks
+
+
+def design(model, X: pd.DataFrame) -> tuple:
+    """
+    ``(estimator, data, blocks, is_sparse)`` to permute.
+
+    For an encodable pipeline ``data`` is the dense encoded matrix and
+    ``blocks`` maps each input column to its encoded columns; otherwise
+    ``data`` is ``X`` itself and ``blocks`` maps each column to itself.
+    """
+    steps = getattr(model, "steps", None)
+    if steps and len(steps) > 1 and isinstance(steps[0][1], ColumnTransformer):
+        ct = steps[0][1]
+        blocks = encoded_blocks(ct)
+        if blocks is not None:
+            Xt = ct.transform(X)
+            # Sparse output must stay sparse: XGBoost reads absent entries as missing
+            is_sparse = sparse.issparse(Xt)
+            Xt = Xt.toarray() if is_sparse else np.asarray(Xt, dtype=np.float64)
+            return model[1:], Xt, blocks, is_sparse
+    X = X[list(model.feature_names_in_)] if hasattr(model, "feature_names_in_") else X
+    return model, X.reset_index(drop=True), {col: [col] for col in X.columns}, False
+
+
+def _permuted(data, columns, perm: np.ndarray):
+    out = data.copy()
+    if isinstance(data, pd.DataFrame):
+        out[columns] = data[columns].iloc[perm].set_axis(data.index)
+    else:
+        out[:, columns] = data[np.ix_(perm, columns)]
+    return out
+
+
+def _r2(y: np.ndarray, pred: np.ndarray) -> np.ndarray:
+    """R² of each row of ``pred`` (copies × samples) against ``y``."""
+    return 1 - ((pred - y) ** 2).sum(axis=1) / ((y - y.mean()) ** 2).sum()
+
+
+def batch_predictor(estimator):
+    """
+    ``predict`` for large stacked batches.
+
+    An RBF ``SVR`` is evaluated as blocked kernel-matrix products instead
+    of libsvm's per-row loop (the bulk of the stacking ensemble's predict
+    time), and a ``StackingRegressor`` is unrolled so its SVR members get
+    the same treatment; everything else uses its own ``predict``.
+    """
+    if isinstance(estimator, Pipeline) and len(estimator.steps) == 1:
+        estimator = estimator[-1]
+    if isinstance(estimator, SVR) and estimator.kernel == "rbf":
+        # Fitted on sparse input these are sparse too; dense makes X @ sv.T a fast sparse-dense product
+        sv, coef = (a.toarray() if sparse.issparse(a) else np.asarray(a) for a in
+                    (estimator.support_vectors_, estimator.dual_coef_))
+        coef, sv_sq = coef.ravel(), (sv ** 2).sum(axis=1)
+
+        def predict(X):
+            out = np.empty(X.shape[0])
+            for start in range(0, X.shape[0], KERNEL_ROWS):
+                part = X[start:start + KERNEL_ROWS]
+                sq = np.asarray(part.multiply(part).sum(axis=1)).ravel() if sparse.issparse(part) else (part ** 2).sum(axis=1)
+                dist = np.maximum(sq[:, None] + sv_sq[None, :] - 2 * (part @ sv.T), 0.0)
+                out[start:start + KERNEL_ROWS] = np.exp(-estimator._gamma * dist) @ coef
+            return out + estimator.intercept_[0]
+        return predict
+    if isinstance(estimator, StackingRegressor) and not estimator.passthrough:
+        members = [batch_predictor(e) for e in estimator.estimators_]
+        final = batch_predictor(estimator.final_estimator_)
+        return lambda X: final(np.column_stack([member(X) for member in members]))
+    return estimator.predict
+
+
+# ───────── Scoring ─────────
+_STATE: tuple | None = None
+
+
+def _init_worker(state: tuple) -> None:
+    global _STATE
+    _single_threaded(state[0])  # parallelism comes from the pool
+    _STATE = state
+
+
+def _score_chunk(state: tuple, groups: list, perms: np.ndarray, batch_rows: int) -> np.ndarray:
+    """R² for every (group, repeat) in a chunk, stacking copies into large predict calls."""
+    estimator, data, y, is_sparse = state
+    predict = batch_predictor(estimator)
+    n_groups, n_repeats, n = perms.shape
+    jobs = [(g, r) for g in range(n_groups) for r in range(n_repeats)]
+    per_batch = max(1, batch_rows // n)
+    scores = np.empty((n_groups, n_repeats))
+    for start in range(0, len(jobs), per_batch):
+        batch = jobs[start:start + per_batch]
+        copies = [_permuted(data, groups[g], perms[g, r]) for g, r in batch]
+        if isinstance(data, pd.DataFrame):
+            stacked = pd.concat(copies, ignore_index=True)
+        elif is_sparse:
+            stacked = sparse.vstack([sparse.csr_matrix(c) for c in copies], format="csr")
+        else:
+            stacked = np.vstack(copies)
+        pred = np.asarray(predict(stacked), dtype=np.float64).reshape(len(batch), n)
+        for (g, r), score in zip(batch, _r2(y, pred)):
+            scores[g, r] = score
+    return scores
+
+
+def _score_in_worker(groups: list, perms: np.ndarray, batch_rows: int) -> np.ndarray:
+    return _score_chunk(_STATE, groups, perms, batch_rows)
+
+
+def permutation_importance(
+    model,
+    X: pd.DataFrame,
+    y,
+    n_repeats: int = N_REPEATS,
+    groups: dict[str, list[str]] | None = None,
+    random_state: int = 0,
+    n_jobs: int = 1,
+    batch_rows: int = BATCH_ROWS,
+) -> pd.DataFrame:
+    """
+    Mean and std drop in R² when each feature (or group) is shuffled.
+
+    ``groups`` maps a name to input columns permuted jointly; by default
+    every input column is its own feature.  Returns a frame indexed by
+    feature with ``importance_mean``/``importance_std``, largest first.
+    """
+    estimator, data, blocks, is_sparse = design(model, X)
+    y = np.asarray(y, dtype=np.float64)
+    groups = groups or {col: [col] for col in blocks}
+    names = list(groups)
+    columns = [[c for col in groups[name] for c in blocks[col]] for name in names]
+    rng = np.random.default_rng(random_state)
+    perms = np.stack([[rng.permutation(len(y)) for _ in range(n_repeats)] for _ in names])
+    state = (estimator, data, y, is_sparse)
+
+    base = _r2(y, np.asarray(estimator.predict(sparse.csr_matrix(data) if is_sparse else data))[None, :])[0]
+    chunks = [c for c in np.array_split(np.arange(len(names)), n_jobs) if len(c)]
+    if n_jobs == 1:
+        scores = _score_chunk(state, columns, perms, batch_rows)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(state,)) as pool:
+            parts = pool.map(_score_in_worker, [[columns[i] for i in c] for c in chunks],
+                             [perms[c] for c in chunks], [batch_rows] * len(chunks))
+            scores = np.concatenate(list(parts))
+    drops = base - scores
+    result = pd.DataFrame({"importance_mean": drops.mean(axis=1), "importance_std": drops.std(axis=1)},
+                          index=pd.Index(names, name="feature"))
+    return result.sort_values("importance_mean", ascending=False)
+
+
+# ───────── Registry cache ─────────
+def _cache_key(X: pd.DataFrame, y, **settings) -> str:
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(np.asarray(y, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def version_importance(
+    version: ModelVersion,
+    X: pd.DataFrame,
+    y,
+    n_repeats: int = N_REPEATS,
+    groups: dict[str, list[str]] | None = None,
+    random_state: int = 0,
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    """:func:`permutation_importance` of a registered model, cached in its version directory."""
+    key = _cache_key(X, y, n_repeats=n_repeats, groups=groups, random_state=random_state)
+    path = version.path / f"importance-{key}.json"
+    if path.exists():
+        return pd.read_json(path, orient="table")
+    result = permutation_importance(load_pipeline(version), X, y, n_repeats, groups,
+                                    random_state, n_jobs)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(result.to_json(orient="table"))
+    tmp.replace(path)
+    return result
+
+
+def system_importance(system: str, **kwargs) -> pd.DataFrame:
+    """Importance of ``system``'s served model on its held-out test split."""
+    # Imported here: train_models pulls in the full training stack
+    from train_models import load_training_data
+
+    _, _, X_test, y_test = load_training_data([system])[system]
+    version = best_version(system)
+    if version is not None and version.has_pipeline:
+        return version_importance(version, X_test, y_test, **kwargs)
+    return permutation_importance(joblib.load(BEST_MODELS[system]), X_test, y_test, **kwargs)
+
+
+def importance_figure(result: pd.DataFrame, system: str) -> go.Figure:
+    result = result.iloc[::-1]  # largest at the top
+    fig = go.Figure(go.Bar(
+        x=result["importance_mean"], y=result.index, orientation="h",
+        error_x=dict(type="data", array=result["importance_std"]),
+        marker_color=FIGURE_COLORS[system],
+    ))
+    fig.update_layout(
+        title=f"Permutation Importance — {system} (test set)",
+        xaxis_title="Mean decrease in R²", yaxis_title=None,
+        height=max(400, 28 * len(result)), margin=dict(l=10, r=10, t=60, b=40),
+    )
+    return fig
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Permutation importance of the served models.")
+    parser.add_argument("--systems", nargs="+", default=list(SYSTEM_TYPES), choices=list(SYSTEM_TYPES))
+    parser.add_argument("--n-repeats", type=int, default=N_REPEATS)
+    parser.add_argument("--n-jobs", type=int, default=1, help="worker processes")
+    parser.add_argument("--grouped", action="store_true", help="score FEATURE_GROUPS instead of single columns")
+    parser.add_argument("--out", type=Path, default=IMG_DIR, help="directory for the HTML figures")
+    args = parser.parse_args(argv)
+
+    for system in args.systems:
+        t0 = time.perf_counter()
+        result = system_importance(system, n_repeats=args.n_repeats, n_jobs=args.n_jobs,
+                                   groups=FEATURE_GROUPS if args.grouped else None)
+        dest = args.out / FIGURE_FILES[system]
+        importance_figure(result, system).write_html(dest, include_plotlyjs="cdn")
+        print(f"{system}: {len(result)} features in {time.perf_counter() - t0:.1f}s -> {dest}")
+        print(result.head(5).round(4).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""
+Live, filterable versions of the exported figures on pages 01 and 03–06.
+
+Each figure is split into a cached aggregation step and a cheap Plotly
+build step.  The aggregation reduces the filtered dataset to a few
+hundred numbers (fit curves and density-thinned scatter marks, violin KDE
+grids, pre-binned histogram counts, category counts) and is memoised
+per filter combination with ``st.cache_data``; the least recently used
+entries are evicted beyond ``AGGREGATE_CACHE_SIZE``.  Reruns therefore
+only rebuild traces from those arrays instead of recomputing KDEs over
+the full table.  Pages 05 and 06 and the page-03 Pearson matrix skip the
+raw rows altogether: their slices are answered from the pre-aggregated
+:mod:`aggregate_cube`.  Spearman correlations need the filtered rows'
+ranks, so they are computed on demand and cached like the other
+aggregations.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from plotly.colors import qualitative
+from plotly.subplots import make_subplots
+
+from aggregate_cube import PATHOGEN_COLUMN, REGIONS, get_cube, region_of
+from common_utils import load_data
+from data_store import MERGED_CSV, MERGED_STORE, table_columns
+from downsample import density_grid, thin_points
+from spatial_index import SpatialIndex
+
+# Distinct filter combinations kept per aggregate
+AGGREGATE_CACHE_SIZE = 64
+MAX_SCATTER_POINTS = 5000
+MAX_MAP_MARKS = 3000
+FIT_POINTS = 200
+KDE_POINTS = 100
+
+SYSTEMS = {"Agricultural": "Ag", "Wild": "Natural"}
+SYSTEM_COLORS = {"Ag": "#3288bd", "Natural": "#66c2a5"}
+
+INCIDENCE_METRICS = {
+    "Temperature vs. Incidence": ("temp_anomaly_C", "Temperature Anomaly (°C)"),
+    "Rainfall vs. Incidence":    ("rain_anomaly_daily", "Rainfall Anomaly (mm/day)"),
+}
+VIOLIN_METRICS = {
+    "Temperature": ("temp_anomaly_C", "Temperature anomaly (°C)"),
+    "Rainfall":    ("rain_anomaly_daily", "Rainfall anomaly (mm/day)"),
+}
+# Heatmap label -> column, in the order of the exported corr.html
+CORRELATION_METRICS = {
+    "annual_mean_temp":      "annual_mean_temp_C",
+    "monthly_temp":          "monthly_temp_C",
+    "contemp_temp":          "contemp_temp_C",
+    "temp_anomaly":          "temp_anomaly_C",
+    "annual_precip_mm_day":  "annual_precip_mm_per_day",
+    "monthly_precip_mm_day": "monthly_precip_mm_per_day",
+    "contemp_precip_mm_day": "contemp_precip",
+    "rain_anomaly_mm_day":   "rain_anomaly_daily",
+}
+CORRELATION_METHODS = {"Pearson": "Pearson r", "Spearman": "Spearman ρ"}
+DISTRIBUTION_METRICS = {
+    "Temperature Distributions": ("Temperature (°C)", {
+        "Annual mean":    "annual_mean_temp_C",
+        "Monthly normal": "monthly_temp_C",
+        "Survey month":   "contemp_temp_C",
+        "Anomaly":        "temp_anomaly_C",
+    }),
+    "Rainfall Distributions": ("Precipitation (mm/day)", {
+        "Annual mean":    "annual_precip_mm_per_day",
+        "Monthly normal": "monthly_precip_mm_per_day",
+        "Survey month":   "contemp_precip",
+        "Anomaly":        "rain_anomaly_daily",
+    }),
+}
+
+# (west, south, east, north) map viewports
+VIEWPORTS = {
+    "World":         (-180.0, -90.0, 180.0, 90.0),
+    "Africa":        (-20.0, -36.0, 55.0, 38.0),
+    "Europe":        (-25.0, 34.0, 45.0, 72.0),
+    "Asia":          (45.0, -11.0, 150.0, 60.0),
+    "North America": (-170.0, 10.0, -50.0, 75.0),
+    "South America": (-85.0, -57.0, -32.0, 13.0),
+    "Oceania":       (110.0, -50.0, 180.0, 0.0),
+}
+
+COLUMNS = sorted(
+    {"system_type", PATHOGEN_COLUMN, "Host_order", "Latitude", "start_date", "incidence"}
+    | {"Longitude", "location", "Parasite_or_pest"}
+    | {col for col, _ in INCIDENCE_METRICS.values()}
+    | {col for _, cols in DISTRIBUTION_METRICS.values() for col in cols.values()}
+    | set(CORRELATION_METRICS.values())
+)
+
+
+class Filters(NamedTuple):
+    regions: tuple[str, ...]
+    years: tuple[int, int]
+    host_orders: tuple[str, ...]  # empty = all
+    systems: tuple[str, ...] = ()    # "Ag" / "Natural"; empty = all
+    pathogens: tuple[str, ...] = ()  # empty = all
+
+
+def dataset_available() -> bool:
+    """
+    True when the cleaned dataset exists with every column the live figures
+    read (including the ETL's unit-converted climate columns); otherwise
+    pages fall back to the static exports.
+    """
+    return set(COLUMNS) <= set(table_columns(MERGED_STORE, MERGED_CSV))
+
+
+def _dataset() -> pd.DataFrame:
+    return load_data(COLUMNS)
+
+
+def _mask(df: pd.DataFrame, filters: Filters) -> np.ndarray:
+    years = df["start_date"].dt.year
+    keep = (
+        np.isin(region_of(df["Latitude"]), filters.regions)
+        & years.between(*filters.years).to_numpy()
+    )
+    for column, values in (("Host_order", filters.host_orders), ("system_type", filters.systems),
+                           (PATHOGEN_COLUMN, filters.pathogens)):
+        if values:
+            keep &= df[column].isin(values).to_numpy()
+    return keep
+
+
+def _select(filters: Filters) -> pd.DataFrame:
+    df = _dataset()
+    return df[_mask(df, filters)]
+
+
+def _cube_mask(filters: Filters) -> np.ndarray:
+    return get_cube().mask(filters.regions, filters.years, filters.host_orders, filters.systems, filters.pathogens)
+
+
+def filter_controls(groups: bool = False) -> Filters:
+    """
+    Sidebar region / survey-year / host-order filters shared by the live figures.
+
+    With ``groups`` the system and pathogen group can be filtered as well
+    (figures that do not split by them).
+    """
+    df = _dataset()
+    years = df["start_date"].dt.year
+    lo, hi = int(years.min()), int(years.max())
+    st.sidebar.markdown("### Filters")
+    systems = pathogens = ()
+    if groups:
+        systems = st.sidebar.multiselect("System", list(SYSTEMS), placeholder="All systems")
+        systems = tuple(SYSTEMS[s] for s in systems)
+        pathogens = st.sidebar.multiselect(
+            "Pathogen group", sorted(df[PATHOGEN_COLUMN].dropna().unique()), placeholder="All pathogen groups"
+        )
+    regions = st.sidebar.multiselect("Region (latitude band)", REGIONS, default=REGIONS)
+    year_range = st.sidebar.slider("Survey years", lo, hi, (lo, hi)) if lo < hi else (lo, hi)
+    host_orders = st.sidebar.multiselect(
+        "Host order", sorted(df["Host_order"].dropna().unique()), placeholder="All host orders"
+    )
+    return Filters(tuple(regions), tuple(year_range), tuple(host_orders), systems, tuple(pathogens))
+
+
+def _empty_figure(height: int) -> go.Figure:
+    fig = go.Figure()
+    fig.add_annotation(text="No surveys match the selected filters", showarrow=False,
+                       xref="paper", yref="paper", x=0.5, y=0.5, font=dict(size=16))
+    fig.update_layout(height=height, xaxis_visible=False, yaxis_visible=False)
+    return fig
+
+
+# ───────── Page 04: incidence vs. anomaly ─────────
+Window = tuple[tuple[float, float], tuple[float, float]]
+
+
+def _quadratic_fit(x: np.ndarray, y: np.ndarray, x_range: tuple[float, float]):
+    """OLS ``y ~ 1 + x + x²`` over all points, evaluated with its 95% CI across ``x_range``."""
+    X = np.column_stack([np.ones_like(x), x, x ** 2])
+    beta, *_ = np.linalg.lstsq(X, y, rcond=None)
+    sigma2 = np.sum((y - X @ beta) ** 2) / (len(x) - 3)
+    xg = np.linspace(*x_range, FIT_POINTS)
+    Xg = np.column_stack([np.ones_like(xg), xg, xg ** 2])
+    se = np.sqrt(sigma2 * np.einsum("ij,jk,ik->i", Xg, np.linalg.pinv(X.T @ X), Xg))
+    fit = Xg @ beta
+    return xg, fit, fit - 1.96 * se, fit + 1.96 * se
+
+
+@st.cache_data(max_entries=AGGREGATE_CACHE_SIZE)
+def incidence_summary(system: str, column: str, filters: Filters, window: Window | None = None) -> dict | None:
+    """
+    Bounded scatter marks plus a quadratic fit with its 95% confidence band.
+
+    At most ~``MAX_SCATTER_POINTS`` points are returned, thinned on a
+    density grid (:func:`downsample.thin_points`) so outliers survive;
+    when thinning happens the grid counts are returned too.  ``window``
+    restricts the marks to a zoomed ``((x0, x1), (y0, y1))`` box, which
+    is re-thinned at full resolution; the fit always uses every point.
+    """
+    df = _select(filters)
+    df = df[df["system_type"] == system][[column, "incidence"]].dropna()
+    if df.empty:
+        return None
+    x, y = df[column].to_numpy(), df["incidence"].to_numpy()
+    fit = None
+    if len(x) > 3 and np.ptp(x) > 0:
+        fit = _quadratic_fit(x, y, window[0] if window else (x.min(), x.max()))
+
+    if window is not None:
+        (x0, x1), (y0, y1) = window
+        inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+        x, y = x[inside], y[inside]
+    summary = {"n": len(df), "n_window": len(x), "x": x, "y": y, "fit": fit, "density": None}
+    if len(x) > MAX_SCATTER_POINTS:
+        idx = thin_points(x, y, MAX_SCATTER_POINTS, extent=window)
+        summary["x"], summary["y"] = x[idx], y[idx]
+        summary["density"] = density_grid(x, y, extent=window)
+    return summary
+
+
+def incidence_figure(system_label: str, metric: str, filters: Filters, window: Window | None = None) -> go.Figure:
+    system = SYSTEMS[system_label]
+    column, x_title = INCIDENCE_METRICS[metric]
+    summary = incidence_summary(system, column, filters, window)
+    if summary is None:
+        return _empty_figure(500)
+
+    color = SYSTEM_COLORS[system]
+    fig = go.Figure()
+    if summary["density"] is not None:
+        counts, xedges, yedges = summary["density"]
+        fig.add_heatmap(
+            z=np.where(counts.T > 0, np.log1p(counts.T), np.nan),
+            x=(xedges[:-1] + xedges[1:]) / 2, y=(yedges[:-1] + yedges[1:]) / 2,
+            colorscale=[[0, "rgba(255,255,255,0)"], [1, color]], showscale=False,
+            customdata=counts.T, hovertemplate="%{customdata:.0f} surveys<extra></extra>",
+            name="Density",
+        )
+    fig.add_scatter(x=summary["x"], y=summary["y"], mode="markers", name=f"{system_label} data",
+                    marker=dict(color=color, opacity=0.3, size=6))
+    if summary["fit"] is not None:
+        xg, fit, lo, hi = summary["fit"]
+        fig.add_scatter(x=xg, y=hi, mode="lines", line=dict(width=0), showlegend=False)
+        fig.add_scatter(x=xg, y=lo, mode="lines", line=dict(width=0), name="95% CI",
+                        fill="tonexty", fillcolor="rgba(200,200,200,0.5)")
+        fig.add_scatter(x=xg, y=fit, mode="lines", name="Quadratic fit", line=dict(color="black", width=2))
+    fig.add_vline(x=0, line=dict(color="gray", dash="dash"))
+
+    shown = len(summary["x"])
+    if shown == summary["n"]:
+        n = f"n = {shown:,}"
+    elif shown == summary["n_window"]:
+        n = f"n = {shown:,} in window"
+    else:
+        n = f"showing {shown:,} of {summary['n_window']:,}"
+    fig.update_layout(
+        title=f"{system_label}: Incidence vs {x_title.split(' (')[0]} ({n})",
+        xaxis_title=x_title, yaxis_title="Incidence",
+        height=500, margin=dict(l=60, r=20, t=50, b=50), dragmode="select",
+    )
+    if window is not None:
+        fig.update_xaxes(range=window[0])
+        fig.update_yaxes(range=window[1])
+    return fig
+
+
+def incidence_chart(system_label: str, metric: str, filters: Filters) -> None:
+    """
+    Render :func:`incidence_figure` with box-select zoom.
+
+    Selecting a box reruns the page and re-aggregates that window at full
+    resolution; double-clicking the plot clears the selection and resets.
+    """
+    key = f"incidence-{system_label}-{metric}"
+    window = None
+    state = st.session_state.get(key)
+    boxes = state.selection.box if state else []
+    if boxes:
+        box = boxes[-1]
+        window = (tuple(sorted(map(float, box["x"]))), tuple(sorted(map(float, box["y"]))))
+    st.plotly_chart(
+        incidence_figure(system_label, metric, filters, window),
+        use_container_width=True, key=key, on_select="rerun", selection_mode="box",
+    )
+    st.caption("Drag a box to zoom in at full resolution; double-click the plot to reset.")
+
+
+# ───────── Page 03: climate variable correlations ─────────
+@st.cache_data(max_entries=AGGREGATE_CACHE_SIZE)
+def _spearman(filters: Filters) -> pd.DataFrame:
+    return _select(filters)[list(CORRELATION_METRICS.values())].corr(method="spearman")
+
+
+def correlation_matrix(method: str, filters: Filters) -> pd.DataFrame | None:
+    """
+    Pairwise-complete correlations of the :data:`CORRELATION_METRICS` columns.
+
+    Pearson is merged from the aggregate cube's per-cell co-moments;
+    Spearman ranks the filtered rows and is cached per filter combination.
+    """
+    cube, mask = get_cube(), _cube_mask(filters)
+    if not cube.count[mask].any():
+        return None
+    columns = list(CORRELATION_METRICS.values())
+    corr = cube.pearson(mask, columns) if method == "Pearson" else _spearman(filters)
+    return corr.set_axis(list(CORRELATION_METRICS), axis=0).set_axis(list(CORRELATION_METRICS), axis=1)
+
+
+def correlation_figure(method: str, filters: Filters) -> go.Figure:
+    corr = correlation_matrix(method, filters)
+    if corr is None:
+        return _empty_figure(700)
+    fig = go.Figure(go.Heatmap(
+        z=corr.to_numpy(), x=list(corr.columns), y=list(corr.index), texttemplate="%{z:.2f}",
+        colorscale="RdBu", zmin=-1, zmax=1, colorbar_title=CORRELATION_METHODS[method],
+    ))
+    fig.update_layout(
+        title="Correlation Matrix of Climate Variables", height=700, margin=dict(t=60),
+        xaxis_title="Climate Metric", yaxis=dict(title="Climate Metric", autorange="reversed"),
+    )
+    return fig
+
+
+# ───────── Page 05: climate niches by pathogen ─────────
+def violin_summary(column: str, filters: Filters) -> dict | None:
+    """Per (system, pathogen) Silverman-bandwidth KDE grid and quartiles for ``column``, from the aggregate cube."""
+    cube, by = get_cube(), ("system_type", PATHOGEN_COLUMN)
+    mask = _cube_mask(filters)
+    moments = cube.moments(column, by, mask)
+    moments = moments[moments["n"] > 0]
+    if moments.empty:
+        return None
+    fine = cube.histograms(column, by, mask, fine=True)
+    groups = {}
+    for key, m in moments.iterrows():
+        grid = np.linspace(m["min"], m["max"], KDE_POINTS)
+        groups[key] = {
+            "grid": grid,
+            "density": cube.kde(column, fine[key], grid, m["std"]),
+            "quartiles": cube.quantiles(column, fine[key], [25, 50, 75], m["min"], m["max"]),
+        }
+    return {"categories": sorted({p for _, p in groups}), "groups": groups}
+
+
+def violin_figure(metric: str, filters: Filters, half_width: float = 0.18) -> go.Figure:
+    column, y_title = VIOLIN_METRICS[metric]
+    summary = violin_summary(column, filters)
+    if summary is None:
+        return _empty_figure(500)
+
+    categories = summary["categories"]
+    fig = go.Figure()
+    for offset, system in zip((-0.2, 0.2), ("Natural", "Ag")):
+        xs, ys, bx, by, mx, my = [], [], [], [], [], []
+        for i, pathogen in enumerate(categories):
+            g = summary["groups"].get((system, pathogen))
+            if g is None:
+                continue
+            centre = i + offset
+            width = g["density"] / g["density"].max() * half_width
+            xs += [*(centre - width), *(centre + width)[::-1], None]
+            ys += [*g["grid"], *g["grid"][::-1], None]
+            q1, med, q3 = g["quartiles"]
+            bx += [centre, centre, None]
+            by += [q1, q3, None]
+            mx.append(centre)
+            my.append(med)
+        color = SYSTEM_COLORS[system]
+        fig.add_scatter(x=xs, y=ys, mode="lines", fill="toself", name=system, legendgroup=system,
+                        line=dict(color=color, width=1), opacity=0.6, hoverinfo="skip")
+        fig.add_scatter(x=bx, y=by, mode="lines", legendgroup=system, showlegend=False,
+                        line=dict(color="black", width=4), hoverinfo="skip")
+        fig.add_scatter(x=mx, y=my, mode="markers", legendgroup=system, showlegend=False,
+                        marker=dict(color="white", size=6, line=dict(color="black", width=1)),
+                        hovertemplate=f"{system}<br>median=%{{y:.2f}}<extra></extra>")
+    fig.update_layout(
+        title=f"Climate ({metric}) Distributions by Pathogen Type & System",
+        xaxis=dict(title="Pathogen Type", tickvals=list(range(len(categories))), ticktext=categories),
+        yaxis_title=y_title, legend_title="system_type", height=500,
+    )
+    return fig
+
+
+# ───────── Page 06: pathogen & host counts, climate histograms ─────────
+def category_counts(filters: Filters) -> pd.DataFrame | None:
+    """Survey counts per system for each pathogen type and host order, from the aggregate cube."""
+    cube, mask = get_cube(), _cube_mask(filters)
+    if not cube.count[mask].any():
+        return None
+    return pd.concat({
+        col: cube.counts((col, "system_type"), mask).unstack(fill_value=0).rename_axis(index=col)
+        for col in (PATHOGEN_COLUMN, "Host_order")
+    })
+
+
+def category_figure(filters: Filters) -> go.Figure:
+    counts = category_counts(filters)
+    if counts is None:
+        return _empty_figure(600)
+
+    fig = make_subplots(rows=1, cols=2, column_widths=[0.3, 0.7], horizontal_spacing=0.1,
+                        subplot_titles=("a) Disease‐causing Agents by System", "b) Host Plant Orders by System"))
+    for col_idx, col in enumerate((PATHOGEN_COLUMN, "Host_order"), start=1):
+        table = counts.loc[col]
+        for system in ("Natural", "Ag"):
+            if system in table:
+                fig.add_bar(x=table.index.astype(str), y=table[system], name=system,
+                            marker_color=SYSTEM_COLORS[system], showlegend=col_idx == 1,
+                            row=1, col=col_idx)
+    fig.update_xaxes(title_text="Disease‐causing Agent", row=1, col=1)
+    fig.update_xaxes(title_text="Host plant order", tickangle=45, row=1, col=2)
+    fig.update_yaxes(title_text="Observations")
+    fig.update_layout(barmode="stack", height=600, legend=dict(x=0.75, y=0.95))
+    return fig
+
+
+def histogram_counts(columns: tuple[str, ...], filters: Filters) -> dict | None:
+    """Pre-binned counts keyed by (column, system, pathogen), plus each column's edges, from the aggregate cube."""
+    cube, mask = get_cube(), _cube_mask(filters)
+    if not cube.count[mask].any():
+        return None
+    by = ("system_type", PATHOGEN_COLUMN)
+    return {
+        "edges": {col: cube.edges[cube.measure(col)] for col in columns},
+        "counts": {(col, *key): counts for col in columns for key, counts in cube.histograms(col, by, mask).items()},
+    }
+
+
+def distribution_figure(choice: str, filters: Filters) -> go.Figure:
+    x_title, metrics = DISTRIBUTION_METRICS[choice]
+    columns = tuple(metrics.values())
+    summary = histogram_counts(columns, filters)
+    if summary is None:
+        return _empty_figure(600)
+
+    rows = [("Wild", "Natural"), ("Agricultural", "Ag")]
+    fig = make_subplots(rows=2, cols=len(columns), shared_yaxes="rows", vertical_spacing=0.08,
+                        horizontal_spacing=0.02, column_titles=list(metrics), row_titles=[r for r, _ in rows])
+    pathogens = sorted({p for _, _, p in summary["counts"]})
+    colors = dict(zip(pathogens, qualitative.Plotly))
+    shown = set()
+    for row, (_, system) in enumerate(rows, start=1):
+        for col_idx, col in enumerate(columns, start=1):
+            edges = summary["edges"][col]
+            centres, widths = (edges[:-1] + edges[1:]) / 2, np.diff(edges)
+            for pathogen in pathogens:
+                counts = summary["counts"].get((col, system, pathogen))
+                if counts is None:
+                    continue
+                fig.add_bar(x=centres, y=counts, width=widths, name=pathogen, legendgroup=pathogen,
+                            marker=dict(color=colors[pathogen], opacity=0.7),
+                            showlegend=pathogen not in shown, row=row, col=col_idx)
+                shown.add(pathogen)
+    fig.update_xaxes(title_text=x_title, row=2)
+    fig.update_yaxes(title_text="count", col=1)
+    fig.update_layout(barmode="stack", bargap=0, height=600, margin=dict(t=80),
+                      title=dict(text=f"{x_title.split(' (')[0]} Distributions by Pathogen & System", x=0.5))
+    return fig
+
+
+# ───────── Page 01: survey map ─────────
+@st.cache_resource
+def survey_index() -> SpatialIndex:
+    """Quadtree index over every survey location, built once per process."""
+    df = _dataset()
+    return SpatialIndex(df["Latitude"], df["Longitude"])
+
+
+@st.cache_data(max_entries=AGGREGATE_CACHE_SIZE)
+def map_summary(viewport: str, filters: Filters) -> tuple[str, pd.DataFrame] | None:
+    """
+    Marks for the survey map inside ``viewport``.
+
+    Returns ``("points", surveys)`` when the filtered surveys in view fit
+    within ``MAX_MAP_MARKS``; otherwise ``("clusters", tiles)`` with one
+    row per occupied quadtree tile at the finest zoom that fits.
+    """
+    df, index = _dataset(), survey_index()
+    pos = index.query(VIEWPORTS[viewport])
+    pos = pos[_mask(df, filters)[index.order[pos]]]
+    if not len(pos):
+        return None
+    rows = df.iloc[index.order[pos]]
+    if len(pos) <= MAX_MAP_MARKS:
+        points = rows[["Latitude", "Longitude", "system_type", "location", "contemp_temp_C", "incidence",
+                       "Parasite_or_pest", "Host_order"]].reset_index(drop=True)
+        points["year"] = rows["start_date"].dt.year.to_numpy()
+        return "points", points
+
+    starts, counts = index.clusters(pos, index.zoom_for(pos, MAX_MAP_MARKS))
+
+    def mean(values) -> np.ndarray:
+        return np.add.reduceat(np.asarray(values, dtype=np.float64), starts) / counts
+
+    return "clusters", pd.DataFrame({
+        "Latitude": mean(index.lat[pos]),
+        "Longitude": mean(index.lon[pos]),
+        "surveys": counts,
+        "contemp_temp_C": mean(rows["contemp_temp_C"]),
+        "incidence": mean(rows["incidence"]),
+        "ag_share": mean(rows["system_type"] == "Ag"),
+    })
+
+
+def map_figure(viewport: str, filters: Filters) -> go.Figure:
+    summary = map_summary(viewport, filters)
+    if summary is None:
+        return _empty_figure(600)
+
+    kind, marks = summary
+    fig = go.Figure()
+    if kind == "points":
+        for label, system, symbol in (("Agricultural", "Ag", "circle"), ("Wild", "Natural", "diamond")):
+            pts = marks[marks["system_type"] == system]
+            fig.add_scattergeo(
+                lat=pts["Latitude"], lon=pts["Longitude"], name=label, text=pts["location"],
+                marker=dict(symbol=symbol, size=7, color=pts["contemp_temp_C"], coloraxis="coloraxis",
+                            line=dict(width=0.5, color="black")),
+                customdata=pts[["incidence", "year", "Parasite_or_pest", "Host_order"]],
+                hovertemplate="<b>%{text}</b><br><br>Temp: %{marker.color:.1f} °C<br>"
+                              "Incidence: %{customdata[0]:.2f}<br>Year: %{customdata[1]}<br>"
+                              "Agent: %{customdata[2]}<br>Host order: %{customdata[3]}<extra></extra>",
+            )
+        n = len(marks)
+    else:
+        fig.add_scattergeo(
+            lat=marks["Latitude"], lon=marks["Longitude"], name="Survey clusters",
+            marker=dict(size=np.clip(4 + 3 * np.sqrt(marks["surveys"]), 6, 40), color=marks["contemp_temp_C"],
+                        coloraxis="coloraxis", opacity=0.8, line=dict(width=0.5, color="black")),
+            customdata=marks[["surveys", "incidence", "ag_share"]],
+            hovertemplate="<b>%{customdata[0]} surveys</b><br><br>Mean temp: %{marker.color:.1f} °C<br>"
+                          "Mean incidence: %{customdata[1]:.2f}<br>Agricultural: %{customdata[2]:.0%}<extra></extra>",
+        )
+        n = int(marks["surveys"].sum())
+
+    west, south, east, north = VIEWPORTS[viewport]
+    fig.update_geos(
+        showcountries=True, countrycolor="lightgray", showland=True, landcolor="whitesmoke",
+        projection_type="natural earth" if viewport == "World" else "equirectangular",
+        lonaxis_range=[west, east], lataxis_range=[south, north],
+    )
+    fig.update_layout(
+        coloraxis=dict(colorscale="Inferno", colorbar=dict(title="Temp (°C)", tickformat=".0f", x=0.02, len=0.6, thickness=15)),
+        legend=dict(title="System", x=0.02, y=0.98, bgcolor="rgba(0,0,0,0)"),
+        title=dict(text=f"Plant disease surveys — {viewport} (N={n:,}"
+                        + (", clustered by location)" if kind == "clusters" else ")"), x=0.5, font=dict(size=14)),
+        height=600, margin=dict(l=20, r=20, t=60, b=20),
+    )
+    return fig
@@ -0,0 +1,364 @@
+"""
+The page-02 hypothesis tests, recomputed from the cleaned dataset.
+
+Every hypothesis is a handful of small OLS fits of ``incidence``:
+
+- H1/H2: linear and quadratic fits of each climate metric, per system;
+- H3: ``anomaly * historical`` interactions, per system;
+- H4: ``|anomaly| * pathogen group`` and ``|anomaly| * tolerance class``;
+- H5: ``|rain anomaly| * transmission mode`` (Direct vs. Vector-borne).
+
+Fits that share a design family are solved together: their design
+matrices are zero-padded to a common shape (padding rows and columns
+contribute nothing) and one stacked SVD gives every fit's coefficients,
+standard errors, t-tests and R² at once, matching ``statsmodels`` OLS.
+Results are stored as one long table (a row per fit and term) under
+``data/processed/``, keyed by a content hash of the columns used, so the
+page only recomputes after a data refresh.  The page shows them beside
+the published tables, with conclusions read off the recomputed fits
+(:func:`page_conclusions`) rather than the published ones.
+
+Usage:
+    python hypothesis_tests.py          # recompute if the dataset changed, print the tables
+    python hypothesis_tests.py --force
+"""
+import argparse
+import hashlib
+import time
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from data_store import MERGED_CSV, MERGED_STORE, PROCESSED_DIR, read_table, table_columns
+
+RESULTS_FORMAT = 1  # bump when the fits or the table layout change
+SYSTEMS = {"Wild": "Natural", "Ag": "Ag"}
+PATHOGEN_COLUMN = "Antagonist_type_general"
+
+# Page label -> column, temperature then precipitation
+H1_METRICS = {
+    "Temperature Anomaly":              "temp_anomaly_C",
+    "Contemporary Temperature":         "contemp_temp_C",
+    "Historical Annual Temperature":    "annual_mean_temp_C",
+    "Rainfall Anomaly":                 "rain_anomaly_daily",
+    "Contemporary Precipitation":       "contemp_precip",
+    "Historical Monthly Precipitation": "monthly_precip_mm_per_day",
+    "Annual Precipitation":             "annual_precip_mm_per_day",
+}
+# Effect -> (anomaly, historical normal)
+H3_INTERACTIONS = {
+    "Temp × Historical": ("temp_anomaly_C", "monthly_temp_C"),
+    "Rain × Historical": ("rain_anomaly_daily", "monthly_precip_mm_per_day"),
+}
+# Mismatch magnitude per climate variable, and the anomaly whose spread sets the tolerance class
+ABS_ANOMALIES = {"Temp": ("abs_temp_anom", "temp_anomaly_C"), "Rain": ("abs_precip_anom", "rain_anomaly_daily")}
+PATHOGEN_REFERENCE = "Bacteria"
+TOLERANCE_CLASSES = ["Narrow", "Intermediate", "Broad"]  # tertiles of each species' 5–95% anomaly range
+TOLERANCE_MIN_SURVEYS = 5
+TRANSMISSION_GROUPS = ["Direct", "Vector-borne"]
+ALPHA = 0.05  # significance level of the recomputed conclusions
+
+COLUMNS = sorted(
+    {"incidence", "system_type", PATHOGEN_COLUMN, "Antagonist_species", "Transmission_mode"}
+    | set(H1_METRICS.values())
+    | {c for pair in H3_INTERACTIONS.values() for c in pair}
+    | {c for pair in ABS_ANOMALIES.values() for c in pair}
+)
+
+
+class Design(NamedTuple):
+    key: tuple             # (hypothesis, model, system, metric)
+    terms: list[str]
+    X: np.ndarray          # (n, len(terms)), intercept first
+    y: np.ndarray          # (n,)
+
+
+# ───────── Stacked least squares ─────────
+def stacked_lstsq(designs: list[Design]) -> pd.DataFrame:
+    """
+    OLS fits of all ``designs`` in one stacked SVD.
+
+    Returns one row per (design, term) with ``coef``, ``se``, ``t`` and the
+    two-sided ``p``, plus the fit's ``n``, ``r2`` and ``adj_r2``.
+    Rank-deficient designs are solved by minimum norm, like ``np.linalg.lstsq``.
+    """
+    n_rows = max(len(d.y) for d in designs)
+    n_cols = max(len(d.terms) for d in designs)
+    X = np.zeros((len(designs), n_rows, n_cols))
+    y = np.zeros((len(designs), n_rows))
+    for g, d in enumerate(designs):
+        X[g, :len(d.y), :len(d.terms)] = d.X
+        y[g, :len(d.y)] = d.y
+    n = np.array([len(d.y) for d in designs], dtype=np.float64)
+
+    U, S, Vt = np.linalg.svd(X, full_matrices=False)
+    keep = S > S.max(axis=1, keepdims=True) * max(n_rows, n_cols) * np.finfo(np.float64).eps
+    inv = np.divide(1.0, S, out=np.zeros_like(S), where=keep)
+    rank = keep.sum(axis=1)
+    coef = (Vt.transpose(0, 2, 1) @ (inv * (U.transpose(0, 2, 1) @ y[..., None])[..., 0])[..., None])[..., 0]
+    rss = ((y - (X @ coef[..., None])[..., 0]) ** 2).sum(axis=1)
+    tss = (y ** 2).sum(axis=1) - y.sum(axis=1) ** 2 / n
+    dof = n - rank
+    with np.errstate(invalid="ignore", divide="ignore"):
+        se = np.sqrt(((Vt * inv[..., None]) ** 2).sum(axis=1) * (rss / dof)[:, None])
+        t = coef / se
+        r2 = 1 - rss / tss
+        adj_r2 = 1 - (1 - r2) * (n - 1) / dof
+    p = 2 * stats.t.sf(np.abs(t), dof[:, None])
+
+    records = []
+    for g, d in enumerate(designs):
+        for j, term in enumerate(d.terms):
+            records.append((*d.key, term, coef[g, j], se[g, j], t[g, j], p[g, j], int(n[g]), r2[g], adj_r2[g]))
+    return pd.DataFrame(records, columns=["hypothesis", "model", "system", "metric", "term",
+                                          "coef", "se", "t", "p", "n", "r2", "adj_r2"])
+
+
+# ───────── Design families ─────────
+def tolerance_class(df: pd.DataFrame, anomaly: str) -> pd.Series:
+    """Narrow/Intermediate/Broad by tertile of each species' 5–95% ``anomaly`` range (NaN for rare species)."""
+    by_species = df.groupby("Antagonist_species", observed=True)[anomaly]
+    width = by_species.quantile(0.95) - by_species.quantile(0.05)
+    width = width[by_species.count() >= TOLERANCE_MIN_SURVEYS]
+    classes = pd.qcut(width.rank(method="first"), len(TOLERANCE_CLASSES), labels=TOLERANCE_CLASSES)
+    return df["Antagonist_species"].map(classes.astype(str))
+
+
+def transmission_group(modes: pd.Series) -> pd.Series:
+    """Collapse free-text ``Transmission_mode`` into Direct vs. Vector-borne."""
+    vector = modes.astype(str).str.lower().str.contains("vector")
+    direct, vectored = TRANSMISSION_GROUPS
+    return pd.Series(np.where(vector, vectored, direct), index=modes.index).where(modes.notna())
+
+
+def _rows(df: pd.DataFrame, *columns: str) -> pd.DataFrame:
+    return df[["incidence", *columns]].dropna()
+
+
+def _poly(df: pd.DataFrame, key: tuple, column: str, degree: int) -> Design:
+    rows = _rows(df, column)
+    x = rows[column].to_numpy(dtype=np.float64)
+    terms = ["Intercept", column, f"{column}^2"][:degree + 1]
+    return Design(key, terms, np.vander(x, degree + 1, increasing=True), rows["incidence"].to_numpy(np.float64))
+
+
+def _interaction(df: pd.DataFrame, key: tuple, a: str, b: str) -> Design:
+    rows = _rows(df, a, b)
+    x, h = rows[a].to_numpy(dtype=np.float64), rows[b].to_numpy(dtype=np.float64)
+    X = np.column_stack([np.ones_like(x), x, h, x * h])
+    return Design(key, ["Intercept", a, b, f"{a}:{b}"], X, rows["incidence"].to_numpy(np.float64))
+
+
+def _by_group(df: pd.DataFrame, key: tuple, x: str, group: pd.Series, reference: str) -> Design:
+    """``incidence ~ x * C(group, Treatment(reference))``."""
+    rows = _rows(df.assign(_group=group), x, "_group")
+    levels = [g for g in sorted(rows["_group"].unique()) if g != reference]
+    v = rows[x].to_numpy(dtype=np.float64)
+    dummies = (rows["_group"].to_numpy()[:, None] == np.array(levels, dtype=object)).astype(np.float64)
+    X = np.column_stack([np.ones_like(v), dummies, v, dummies * v[:, None]])
+    terms = ["Intercept", *(f"[{g}]" for g in levels), x, *(f"{x}:[{g}]" for g in levels)]
+    return Design(key, terms, X, rows["incidence"].to_numpy(np.float64))
+
+
+def design_families(df: pd.DataFrame) -> dict[str, list[Design]]:
+    """Every fit behind page 02, grouped into families solved by one stacked least squares each."""
+    systems = {label: df[df["system_type"] == value] for label, value in SYSTEMS.items()}
+    families = {
+        family: [_poly(rows, ("H1", family, system, metric), column, degree)
+                 for metric, column in H1_METRICS.items() for system, rows in systems.items()]
+        for family, degree in (("linear", 1), ("quadratic", 2))
+    }
+    families["interaction"] = [
+        _interaction(rows, ("H3", "interaction", system, effect), a, b)
+        for effect, (a, b) in H3_INTERACTIONS.items() for system, rows in systems.items()
+    ]
+    families["modulation"] = [
+        d for label, (x, anomaly) in ABS_ANOMALIES.items() for d in (
+            _by_group(df, ("H4", "pathogen", "All", label), x, df[PATHOGEN_COLUMN].astype(object), PATHOGEN_REFERENCE),
+            _by_group(df, ("H4", "tolerance", "All", label), x, tolerance_class(df, anomaly), TOLERANCE_CLASSES[-1]),
+        )
+    ] + [_by_group(df, ("H5", "transmission", "All", "Rain"), "abs_precip_anom",
+                   transmission_group(df["Transmission_mode"]), TRANSMISSION_GROUPS[0])]
+    return families
+
+
+def run_tests(df: pd.DataFrame) -> pd.DataFrame:
+    """All page-02 fits as one long table (one row per fit and term)."""
+    return pd.concat([stacked_lstsq(designs) for designs in design_families(df).values()], ignore_index=True)
+
+
+# ───────── Cached results ─────────
+def _results_key(df: pd.DataFrame) -> str:
+    digest = hashlib.sha256(f"{RESULTS_FORMAT}:{','.join(df.columns)}".encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def hypothesis_results(df: pd.DataFrame | None = None, force: bool = False) -> pd.DataFrame:
+    """:func:`run_tests` of ``df`` (default: the cleaned dataset), cached per dataset content."""
+    df = read_table(MERGED_STORE, MERGED_CSV, columns=COLUMNS) if df is None else df[COLUMNS]
+    path = PROCESSED_DIR / f"hypotheses-{_results_key(df)}.json"
+    if path.exists() and not force:
+        return pd.read_json(path, orient="table")
+    result = run_tests(df)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(result.to_json(orient="table", index=False))
+    tmp.replace(path)
+    return result
+
+
+@lru_cache(maxsize=2)
+def _results(stamp: int) -> pd.DataFrame:
+    return hypothesis_results()
+
+
+def data_available() -> bool:
+    """Whether the cleaned dataset has every column the hypothesis tests read."""
+    return set(COLUMNS) <= set(table_columns(MERGED_STORE, MERGED_CSV))
+
+
+def get_results() -> pd.DataFrame:
+    """Process-wide :func:`hypothesis_results`, re-checked only when the dataset file changes."""
+    source = MERGED_STORE if MERGED_STORE.exists() else MERGED_CSV
+    return _results(source.stat().st_mtime_ns)
+
+
+# ───────── Page-02 tables ─────────
+def _p(p: float, exponent: bool = False) -> str:
+    if np.isnan(p):
+        return "n/a"
+    if exponent:
+        return f"{p:.1e}"
+    return "< 0.001" if p < 0.001 else f"{p:.3f}"
+
+
+def _term(results: pd.DataFrame, hypothesis: str, model: str, system: str, metric: str, term: str) -> pd.Series:
+    rows = results[(results["hypothesis"] == hypothesis) & (results["model"] == model) & (results["system"] == system)
+                   & (results["metric"] == metric) & (results["term"] == term)]
+    if rows.empty:
+        return pd.Series({"coef": np.nan, "p": np.nan, "r2": np.nan})
+    return rows.iloc[0]
+
+
+def page_tables(results: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """The page-02 tables (same layout as the published ones) from :func:`hypothesis_results`."""
+    def fit(model, system, metric, term):
+        return _term(results, "H1", model, system, metric, term)
+
+    h1 = []
+    for metric, column in H1_METRICS.items():
+        row = {"Metric": metric}
+        for system in SYSTEMS:
+            row[f"{system} R²"] = round(fit("linear", system, metric, column)["r2"], 4)
+            row[f"{system} R² (quadratic)"] = round(fit("quadratic", system, metric, column)["r2"], 4)
+        for system in SYSTEMS:
+            row[f"{system} p-linear"] = _p(fit("linear", system, metric, column)["p"], exponent=True)
+            row[f"{system} p-quadratic"] = _p(fit("quadratic", system, metric, f"{column}^2")["p"], exponent=True)
+        h1.append(row)
+    h1 = pd.DataFrame(h1)
+    temperature = h1["Metric"].isin(list(H1_METRICS)[:3])
+
+    h2 = h1[["Metric", "Wild R²", "Ag R²"]].copy()
+    ratio = h2["Wild R²"] / h2["Ag R²"]
+    h2["Wild > Ag?"] = np.select([ratio > 1.1, ratio > 1], ["yes", "slightly"], "no")
+
+    h3 = pd.DataFrame([
+        {"Effect": effect,
+         **{f"{system} Coef.": round(_term(results, "H3", "interaction", system, effect, f"{a}:{b}")["coef"], 4)
+            for system in SYSTEMS},
+         **{f"{system} p": _p(_term(results, "H3", "interaction", system, effect, f"{a}:{b}")["p"]) for system in SYSTEMS}}
+        for effect, (a, b) in H3_INTERACTIONS.items()
+    ])
+
+    def modulation(model, name):
+        x = ABS_ANOMALIES["Temp"][0]
+        terms = results.loc[(results["hypothesis"] == "H4") & (results["model"] == model), "term"]
+        rows = []
+        for level in sorted({t[len(x) + 2:-1] for t in terms if t.startswith(f"{x}:[")}):
+            row = {name: level}
+            for label, (x, _) in ABS_ANOMALIES.items():
+                term = _term(results, "H4", model, "All", label, f"{x}:[{level}]")
+                row[f"{label} Interaction Coef."] = round(term["coef"], 4)
+                row[f"{label} p-value"] = _p(term["p"])
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    h5_terms = {
+        "Intercept (Direct)": "Intercept",
+        "Vector-borne main effect": "[Vector-borne]",
+        "Direct slope": "abs_precip_anom",
+        "Slope difference (Vector vs Direct)": "abs_precip_anom:[Vector-borne]",
+    }
+    h5 = pd.DataFrame([
+        {"Term": label, "Coefficient": round(term["coef"], 4), "p-value": _p(term["p"])}
+        for label, term in ((label, _term(results, "H5", "transmission", "All", "Rain", t)) for label, t in h5_terms.items())
+    ])
+    return {
+        "h1_temperature": h1[temperature].reset_index(drop=True),
+        "h1_precipitation": h1[~temperature].reset_index(drop=True),
+        "h2": h2,
+        "h3": h3,
+        "h4_pathogen": modulation("pathogen", "Pathogen Group"),
+        "h4_tolerance": modulation("tolerance", "Tolerance Class"),
+        "h5": h5,
+    }
+
+
+def _significant(p: float, alpha: float) -> str:
+    return f"significant (p = {_p(p)})" if p < alpha else f"not significant (p = {_p(p)})"
+
+
+def page_conclusions(results: pd.DataFrame, alpha: float = ALPHA) -> dict[str, str]:
+    """One conclusion per hypothesis ("H1".."H5"), read off :func:`hypothesis_results` at level ``alpha``."""
+    def linear(system, metric):
+        return _term(results, "H1", "linear", system, metric, H1_METRICS[metric])
+
+    n_metrics = len(H1_METRICS)
+    significant = {system: sum(linear(system, m)["p"] < alpha for m in H1_METRICS) for system in SYSTEMS}
+    wild_higher = [m for m in H1_METRICS if linear("Wild", m)["r2"] > linear("Ag", m)["r2"]]
+    temperature = list(H1_METRICS)[:3]
+    h1 = (f"{significant['Wild']} of {n_metrics} climate metrics have a significant linear effect "
+          f"(p < {alpha}) in Wild systems and {significant['Ag']} of {n_metrics} in Ag systems.")
+    h2 = (f"Wild R² exceeds Ag R² for {sum(m in wild_higher for m in temperature)} of {len(temperature)} "
+          f"temperature metrics and {sum(m not in temperature for m in wild_higher)} of "
+          f"{n_metrics - len(temperature)} precipitation metrics.")
+    h3 = " ".join(
+        f"{effect}: Wild {_significant(_term(results, 'H3', 'interaction', 'Wild', effect, f'{a}:{b}')['p'], alpha)}, "
+        f"Ag {_significant(_term(results, 'H3', 'interaction', 'Ag', effect, f'{a}:{b}')['p'], alpha)}."
+        for effect, (a, b) in H3_INTERACTIONS.items()
+    )
+
+    def modulated(model):
+        rows = results[(results["hypothesis"] == "H4") & (results["model"] == model)
+                       & results["term"].str.contains(":[", regex=False) & (results["p"] < alpha)]
+        return ", ".join(f"{term.split(':[')[1][:-1]} ({metric})" for metric, term in zip(rows["metric"], rows["term"])) or "none"
+
+    h4 = (f"Anomaly × pathogen-group interactions significant at {alpha}: {modulated('pathogen')}. "
+          f"Anomaly × tolerance-class interactions: {modulated('tolerance')}.")
+    slope = _term(results, "H5", "transmission", "All", "Rain", "abs_precip_anom:[Vector-borne]")
+    h5 = (f"The vector-borne precipitation slope is {'lower' if slope['coef'] < 0 else 'higher'} than the direct one "
+          f"by {abs(slope['coef']):.4f}, {_significant(slope['p'], alpha)}.")
+    return {"H1": h1, "H2": h2, "H3": h3, "H4": h4, "H5": h5}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Recompute the page-02 hypothesis tests from the cleaned dataset.")
+    parser.add_argument("--force", action="store_true", help="ignore cached results")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    results = hypothesis_results(force=args.force)
+    elapsed = time.perf_counter() - t0
+    for name, table in page_tables(results).items():
+        print(f"\n{name}\n{table.to_string(index=False)}")
+    print()
+    for hypothesis, conclusion in page_conclusions(results).items():
+        print(f"{hypothesis}: {conclusion}")
+    print(f"\n{results.groupby(['hypothesis', 'model', 'system', 'metric']).ngroups} fits in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
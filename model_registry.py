@@ -0,0 +1,311 @@
+"""
+Local registry of fitted models, their metrics and feature schemas.
+
+Each registered version lives in its own directory::
+
+    models/registry/<system>/<model>/<version>/
+        manifest.json    # CV/test metrics, feature schema, scoring baseline
+        pipeline.joblib  # uncompressed, so numpy arrays load memory-mapped
+        xgb-<i>.ubj      # XGBoost boosters inside the pipeline, native format
+    models/registry/<system>/best.json   # version served by risk_scoring
+
+Pipelines are loaded with ``mmap_mode="r"``: their arrays stay in the
+page cache and are shared by every worker process that opens the same
+version, so a scoring worker starts without unpickling or copying them.
+Versions may also carry metrics only (models compared in the notebooks
+but not persisted).
+
+Until anything is registered, :func:`cv_scores` and :func:`test_scores`
+return the results published by the modelling notebooks.
+
+Usage:
+    python model_registry.py import   # register the persisted best models + notebook metrics
+    python model_registry.py list
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import joblib
+import sklearn
+import xgboost
+from sklearn.base import BaseEstimator
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder
+from xgboost import XGBModel
+
+REGISTRY_DIR = Path(__file__).parent / "models" / "registry"
+PIPELINE_FILE = "pipeline.joblib"
+MANIFEST_FILE = "manifest.json"
+
+# 5-fold CV R² and held-out test scores from the modelling notebooks
+NOTEBOOK_CV_R2 = {
+    "Agricultural": {
+        "Ridge-spline":  [0.56,  0.457, 0.55,  0.565, 0.519],
+        "RandomForest":  [0.575, 0.512, 0.585, 0.593, 0.531],
+        "XGB":           [0.596, 0.453, 0.573, 0.614, 0.558],
+        "SVR":           [0.568, 0.443, 0.560, 0.541, 0.551],
+        "Stacking":      [0.596, 0.479, 0.588, 0.620, 0.572],
+    },
+    "Wild": {
+        "Ridge-spline":  [0.497, 0.608, 0.627, 0.364, 0.601],
+        "RandomForest":  [0.476, 0.520, 0.564, 0.313, 0.452],
+        "XGB":           [0.417, 0.457, 0.495, 0.223, 0.274],
+        "SVR":           [0.354, 0.532, 0.611, 0.351, 0.547],
+        "Stacking":      [0.491, 0.588, 0.610, 0.368, 0.543],
+    },
+}
+NOTEBOOK_BEST = {"Agricultural": "Stacking", "Wild": "Ridge-spline"}
+NOTEBOOK_TEST = {
+    "Agricultural": {"label": "Default Stacking", "MSE": 0.02879, "R²": 0.527},
+    "Wild":         {"label": "Tuned Ridge-spline", "MSE": 0.03014, "R²": 0.516},
+}
+
+
+class ModelVersion(NamedTuple):
+    system: str
+    model: str
+    version: int
+    path: Path
+    manifest: dict
+
+    @property
+    def has_pipeline(self) -> bool:
+        return (self.path / PIPELINE_FILE).exists()
+
+
+# ───────── Writing ─────────
+def _walk_estimators(obj, seen: set[int] | None = None) -> Iterator[BaseEstimator]:
+    """Every estimator reachable from ``obj`` (fitted sub-estimators included), in a stable order."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+    if isinstance(obj, BaseEstimator):
+        yield obj
+        children = vars(obj).values()
+    elif isinstance(obj, (list, tuple)):
+        children = obj
+    elif isinstance(obj, dict):
+        children = obj.values()
+    else:
+        return
+    for child in children:
+        yield from _walk_estimators(child, seen)
+
+
+def _xgb_models(pipeline) -> list[XGBModel]:
+    """XGBoost wrappers in ``pipeline`` in walk order (unfitted templates included)."""
+    return [est for est in _walk_estimators(pipeline) if isinstance(est, XGBModel)]
+
+
+def feature_schema(pipeline) -> dict:
+    """Input columns of ``pipeline``, split into numeric and one-hot categorical (with categories)."""
+    schema = {"features": [str(c) for c in getattr(pipeline, "feature_names_in_", [])],
+              "numeric": [], "categorical": {}}
+    pre = pipeline.steps[0][1] if hasattr(pipeline, "steps") else None
+    if isinstance(pre, ColumnTransformer):
+        for _, trans, cols in pre.transformers_:
+            if isinstance(trans, str):
+                continue
+            if isinstance(trans, OneHotEncoder):
+                for col, cats in zip(cols, trans.categories_):
+                    schema["categorical"][col] = [str(c) for c in cats]
+            else:
+                schema["numeric"].extend(cols)
+    return schema
+
+
+def _next_version(directory: Path) -> int:
+    versions = [int(p.name) for p in directory.glob("*") if p.name.isdigit()] if directory.exists() else []
+    return max(versions, default=0) + 1
+
+
+def register(
+    system: str,
+    model: str,
+    pipeline=None,
+    cv_scores: list[float] | None = None,
+    test_metrics: dict[str, float] | None = None,
+    baseline: dict | None = None,
+    params: dict | None = None,
+    best: bool = False,
+    label: str = "",
+    root: Path = REGISTRY_DIR,
+) -> ModelVersion:
+    """
+    Store a new version of ``system``/``model`` and return it.
+
+    ``pipeline`` is optional (metrics-only versions); ``baseline`` is the
+    scoring profile :class:`risk_scoring.RiskScorer` perturbs, stored so
+    workers need not read the dataset; ``params`` the tuned
+    hyperparameters; ``label`` is its display name
+    (e.g. "Tuned Ridge-spline").  ``best`` makes this the version
+    :func:`best_version` serves.
+    """
+    directory = Path(root) / system / model
+    version = _next_version(directory)
+    path = directory / str(version)
+    tmp = directory / f".{version}.tmp"
+    tmp.mkdir(parents=True)
+    manifest = {
+        "system": system,
+        "model": model,
+        "version": version,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cv_r2": list(cv_scores or []),
+        "test": dict(test_metrics or {}),
+        "baseline": baseline,
+        "params": params or {},
+        "label": label or model,
+        "libraries": {"scikit-learn": sklearn.__version__, "xgboost": xgboost.__version__},
+    }
+    if pipeline is not None:
+        xgb = _xgb_models(pipeline)
+        fitted = [i for i, est in enumerate(xgb) if hasattr(est, "_Booster")]
+        detached = []
+        try:
+            # Boosters go to XGBoost's own format; the pickle keeps only the wrapper
+            for i in fitted:
+                xgb[i].save_model(tmp / f"xgb-{i}.ubj")
+                detached.append((xgb[i], xgb[i]._Booster))
+                del xgb[i]._Booster
+            joblib.dump(pipeline, tmp / PIPELINE_FILE)
+        finally:
+            for est, booster in detached:
+                est._Booster = booster
+        manifest["schema"] = feature_schema(pipeline)
+        manifest["boosters"] = fitted
+    (tmp / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, default=str, ensure_ascii=False))
+    tmp.rename(path)
+    if best:
+        promote(system, model, version, root)
+    return ModelVersion(system, model, version, path, manifest)
+
+
+def promote(system: str, model: str, version: int, root: Path = REGISTRY_DIR) -> None:
+    """Make ``system``/``model``/``version`` the one :func:`best_version` returns."""
+    pointer = Path(root) / system / "best.json"
+    pointer.write_text(json.dumps({"model": model, "version": int(version)}))
+
+
+# ───────── Reading ─────────
+def versions(system: str | None = None, model: str | None = None, root: Path = REGISTRY_DIR) -> list[ModelVersion]:
+    """Registered versions, oldest first, optionally filtered by system and model."""
+    found = []
+    for manifest_path in Path(root).glob(f"*/*/*/{MANIFEST_FILE}"):
+        if not manifest_path.parent.name.isdigit():  # registration in progress
+            continue
+        manifest = json.loads(manifest_path.read_text())
+        if (system is None or manifest["system"] == system) and (model is None or manifest["model"] == model):
+            found.append(ModelVersion(manifest["system"], manifest["model"], int(manifest["version"]),
+                                      manifest_path.parent, manifest))
+    return sorted(found, key=lambda v: (v.system, v.model, v.version))
+
+
+def latest(system: str, model: str, root: Path = REGISTRY_DIR) -> ModelVersion | None:
+    found = versions(system, model, root)
+    return found[-1] if found else None
+
+
+def best_version(system: str, root: Path = REGISTRY_DIR) -> ModelVersion | None:
+    """The promoted version for ``system``, or ``None`` if nothing was promoted."""
+    pointer = Path(root) / system / "best.json"
+    if not pointer.exists():
+        return None
+    ref = json.loads(pointer.read_text())
+    return next((v for v in versions(system, ref["model"], root) if v.version == ref["version"]), None)
+
+
+@lru_cache(maxsize=8)
+def _load(path: Path, boosters: tuple[int, ...], mmap: bool):
+    pipeline = joblib.load(path / PIPELINE_FILE, mmap_mode="r" if mmap else None)
+    xgb = _xgb_models(pipeline)
+    for i in boosters:
+        xgb[i].load_model(path / f"xgb-{i}.ubj")
+    return pipeline
+
+
+def load_pipeline(version: ModelVersion, mmap: bool = True):
+    """The fitted pipeline of ``version`` (process-wide; arrays memory-mapped by default)."""
+    if not version.has_pipeline:
+        raise FileNotFoundError(f"{version.system}/{version.model} v{version.version} has no stored pipeline")
+    return _load(version.path, tuple(version.manifest.get("boosters", ())), mmap)
+
+
+def cv_scores(system: str, root: Path = REGISTRY_DIR) -> dict[str, list[float]]:
+    """Per-fold CV R² of the latest version of each model for ``system``."""
+    found = {}
+    for v in versions(system, root=root):
+        if v.manifest.get("cv_r2"):
+            found[v.model] = v.manifest["cv_r2"]  # oldest first, so the latest wins
+    return found or dict(NOTEBOOK_CV_R2.get(system, {}))
+
+
+def test_scores(root: Path = REGISTRY_DIR) -> dict[str, dict[str, float]]:
+    """Held-out test metrics of each system's best model: metric → "<system> <label>" → value."""
+    rows = {}
+    for system, fallback in NOTEBOOK_TEST.items():
+        v = best_version(system, root)
+        if v is not None and v.manifest.get("test"):
+            label, metrics = v.manifest.get("label", v.model), v.manifest["test"]
+        else:
+            label, metrics = fallback["label"], {k: val for k, val in fallback.items() if k != "label"}
+        for metric, value in metrics.items():
+            rows.setdefault(metric, {})[f"{system} {label}"] = value
+    return rows
+
+
+# ───────── CLI ─────────
+def import_existing(root: Path = REGISTRY_DIR) -> list[ModelVersion]:
+    """Register the persisted best models and the notebooks' metrics as new versions."""
+    # Imported here: risk_scoring reads the registry at scorer start-up
+    from data_store import MERGED_CSV, MERGED_STORE, read_table
+    from risk_scoring import BEST_MODELS, SYSTEM_TYPES, baseline_profile
+
+    data = read_table(MERGED_STORE, MERGED_CSV)
+    added = []
+    for system, scores in NOTEBOOK_CV_R2.items():
+        for model, folds in scores.items():
+            is_best = model == NOTEBOOK_BEST[system]
+            pipeline = baseline = test = None
+            if is_best and BEST_MODELS[system].exists():
+                pipeline = joblib.load(BEST_MODELS[system])
+                columns = list(pipeline.feature_names_in_)
+                baseline = baseline_profile(data[data["system_type"] == SYSTEM_TYPES[system]], columns)
+            if is_best:
+                test = {k: v for k, v in NOTEBOOK_TEST[system].items() if k != "label"}
+            added.append(register(
+                system, model, pipeline, folds, test, baseline,
+                best=is_best, label=NOTEBOOK_TEST[system]["label"] if is_best else "", root=root,
+            ))
+    return added
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage the local model registry.")
+    parser.add_argument("command", choices=["import", "list"])
+    parser.add_argument("--root", type=Path, default=REGISTRY_DIR, help="registry directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        for v in import_existing(args.root):
+            print(f"Registered {v.system}/{v.model} v{v.version}" + (" (pipeline)" if v.has_pipeline else ""))
+        return
+    for v in versions(root=args.root):
+        marker = "*" if best_version(v.system, args.root) == v else " "
+        cv = v.manifest.get("cv_r2") or [float("nan")]
+        t0 = time.perf_counter()
+        load = ""
+        if v.has_pipeline:
+            load_pipeline(v)
+            load = f"  load {1000 * (time.perf_counter() - t0):.0f} ms"
+        print(f"{marker} {v.system:<13} {v.model:<13} v{v.version:<3} CV R² {sum(cv) / len(cv):.3f}{load}")
+
+
+if __name__ == "__main__":
+    main()
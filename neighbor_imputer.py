@@ -0,0 +1,128 @@
+"""
+Tree-based nearest-neighbour imputation for the monthly climate normals.
+
+Replaces ``KNNImputer`` on ``monthly_temp``/``monthly_precip``, which
+found neighbours by brute force over the two (mostly co-missing) value
+columns.  Here donors are surveys taken in the *same calendar month*
+near the row:
+
+- latitude/longitude become 3-D points on a sphere of radius
+  ``EARTH_RADIUS_KM``, so straight-line distance tracks great-circle
+  distance;
+- donors further than ``max_km`` (default ``MAX_DONOR_KM``) are
+  ignored, so a row never takes another season's or another region's
+  normals.
+
+One ``KDTree`` per imputed column and calendar month holds the rows
+where that column is known, so fitting is ``O(n log n)``, each query
+``O(log n)``, and a fitted imputer can be kept (it pickles with
+``joblib``) and reused on new rows.  Rows without coordinates or a date,
+or without a same-month donor within reach, are left NaN for the caller
+to fill (the ETL falls back to the row's annual normals).
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+EARTH_RADIUS_KM = 6371.0
+MAX_DONOR_KM = 300.0
+BATCH_ROWS = 50_000
+
+
+def neighbor_space(df: pd.DataFrame) -> np.ndarray:
+    """``(n, 3)`` points of ``Latitude``/``Longitude`` on the sphere; NaN rows stay NaN."""
+    lat = np.radians(pd.to_numeric(df["Latitude"], errors="coerce").to_numpy(dtype=np.float64))
+    lon = np.radians(pd.to_numeric(df["Longitude"], errors="coerce").to_numpy(dtype=np.float64))
+    return np.column_stack([
+        EARTH_RADIUS_KM * np.cos(lat) * np.cos(lon),
+        EARTH_RADIUS_KM * np.cos(lat) * np.sin(lon),
+        EARTH_RADIUS_KM * np.sin(lat),
+    ])
+
+
+def calendar_months(df: pd.DataFrame) -> np.ndarray:
+    """Calendar month (1–12) of each row's ``start_date``; NaN without one."""
+    return pd.to_datetime(df["start_date"], errors="coerce").dt.month.to_numpy(dtype=np.float64)
+
+
+def chord_km(arc_km: float) -> float:
+    """Straight-line length of a great-circle arc, the distance a ``neighbor_space`` tree measures."""
+    return 2 * EARTH_RADIUS_KM * np.sin(arc_km / (2 * EARTH_RADIUS_KM))
+
+
+class NeighborImputer:
+    """
+    Fill NaNs in ``columns`` with the mean of up to ``n_neighbors`` nearby same-month donors.
+
+    ``fit``/``transform`` take frames with ``Latitude``, ``Longitude``,
+    ``start_date`` and ``columns``; ``transform`` returns the filled
+    ``columns`` as an array, like the scikit-learn imputers.  Only donors
+    within ``max_km`` count; values with none stay NaN.
+    """
+
+    def __init__(
+        self,
+        columns: list[str],
+        n_neighbors: int = 5,
+        max_km: float = MAX_DONOR_KM,
+        batch_rows: int = BATCH_ROWS,
+        n_jobs: int = 1,
+    ):
+        self.columns = list(columns)
+        self.n_neighbors = n_neighbors
+        self.max_km = max_km
+        self.batch_rows = batch_rows
+        self.n_jobs = n_jobs
+
+    def fit(self, df: pd.DataFrame) -> "NeighborImputer":
+        space = neighbor_space(df)
+        months = calendar_months(df)
+        placed = np.isfinite(space).all(axis=1)
+        self.trees_, self.donors_ = {}, {}
+        for col in self.columns:
+            values = df[col].to_numpy(dtype=np.float64)
+            known = np.isfinite(values) & placed
+            for month in range(1, 13):
+                donors = known & (months == month)
+                if donors.any():
+                    self.trees_[col, month] = KDTree(space[donors])
+                    self.donors_[col, month] = values[donors]
+        return self
+
+    def _neighbor_means(self, col: str, month: int, points: np.ndarray) -> np.ndarray:
+        """Mean ``month`` donor value near each point, querying in batches (threads when ``n_jobs > 1``)."""
+        tree, donors = self.trees_[col, month], self.donors_[col, month]
+        k = min(self.n_neighbors, len(donors))
+        reach = chord_km(self.max_km)
+        batches = [points[i:i + self.batch_rows] for i in range(0, len(points), self.batch_rows)]
+
+        def query(batch: np.ndarray) -> np.ndarray:
+            dist, idx = tree.query(batch, k=k)
+            near = dist <= reach
+            with np.errstate(invalid="ignore"):
+                return (donors[idx] * near).sum(axis=1) / near.sum(axis=1)
+
+        if self.n_jobs == 1 or len(batches) == 1:
+            return np.concatenate([query(b) for b in batches])
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as pool:  # KDTree queries release the GIL
+            return np.concatenate(list(pool.map(query, batches)))
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        out = df[self.columns].to_numpy(dtype=np.float64, copy=True)
+        if not len(out):
+            return out
+        space = neighbor_space(df)
+        months = calendar_months(df)
+        placed = np.isfinite(space).all(axis=1)
+        for c, col in enumerate(self.columns):
+            missing = np.isnan(out[:, c]) & placed
+            for month in np.unique(months[missing & ~np.isnan(months)]).astype(int):
+                query = missing & (months == month)
+                if (col, month) in self.trees_:
+                    out[query, c] = self._neighbor_means(col, month, space[query])
+        return out
+
+    def fit_transform(self, df: pd.DataFrame) -> np.ndarray:
+        return self.fit(df).transform(df)
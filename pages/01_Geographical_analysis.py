@@ -2,7 +2,9 @@
 
 from pathlib import Path
 import streamlit as st
-import streamlit.components.v1 as components
+
+from common_utils import show_embed
+from figures import VIEWPORTS, dataset_available, filter_controls, map_figure
 
 # ───────── Page config & icon ─────────
 ICON_PATH = Path(__file__).parent / "images" / "plant_health_logo.ico"
@@ -98,12 +100,16 @@ st.markdown(
 col1, col2, col3 = st.columns([0.5, 2, 0.5])   # Wider center column
 
 with col2:
-    components.html(
-        (Path(__file__).parent.parent / "images" / "global_map.html").read_text(encoding="utf-8"),
-        height=750,       # Increased from 600 to 750 (or more if needed)
-        width=1100,       # Increased from 800 to 1100 (or adjust as fits your app)
-        scrolling=True
-    )
+    if dataset_available():
+        viewport = st.selectbox("Viewport", list(VIEWPORTS))
+        st.plotly_chart(map_figure(viewport, filter_controls()), use_container_width=True)
+    else:
+        show_embed(
+            Path(__file__).parent.parent / "images" / "global_map.html",
+            height=750,       # Increased from 600 to 750 (or more if needed)
+            width=1100,       # Increased from 800 to 1100 (or adjust as fits your app)
+            scrolling=True
+        )
     st.markdown(
         """
         <p style='
@@ -2,6 +2,8 @@ from pathlib import Path
 import streamlit as st
 import pandas as pd
 
+from hypothesis_tests import data_available, get_results, page_conclusions, page_tables
+
 # ───────── Page config & icon ─────────
 ICON_PATH = Path(__file__).parent / "images" / "plant_health_logo.ico"
 st.set_page_config(
@@ -81,6 +83,30 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# Refits of the same models on the cleaned dataset, shown next to (never instead of) the published results
+if data_available():
+    RESULTS = get_results()
+    TABLES, CONCLUSIONS = page_tables(RESULTS), page_conclusions(RESULTS)
+else:
+    TABLES, CONCLUSIONS = {}, {}
+
+
+def result_tabs():
+    return st.tabs(["Published analysis", "Recomputed from the current dataset"])
+
+
+def show_recomputed(hypothesis, *tables):
+    """Recomputed tables and the conclusion derived from them, or why they are missing."""
+    if not TABLES:
+        st.info("The cleaned dataset with the hypothesis-test columns is not available, so only the published analysis is shown.")
+        return
+    st.caption("The same models refitted on the dataset currently loaded. "
+               "These numbers can differ from the published analysis, and so can the conclusion.")
+    for title, key in tables:
+        st.markdown(f"**{title}**")
+        st.table(TABLES[key])
+    st.markdown(f"**Conclusion (recomputed):** {CONCLUSIONS[hypothesis]}")
+
 
 # ───────── Hypothesis 1 ─────────
 with st.expander("**Hypothesis 1: Weather, Anomaly & Historical Climate Effects**"):
@@ -93,34 +119,38 @@ with st.expander("**Hypothesis 1: Weather, Anomaly & Historical Climate Effects*
     - Computed precipitation metrics `rain_anomaly_daily`, `monthly_precip_mm_per_day`, `annual_precip_mm_per_day`  
     - Fitted linear & quadratic models for Wild vs. Agricultural; recorded R² and p-values
     """)
-    df_temp = pd.DataFrame({
-        "Metric": [
-            "Temperature Anomaly",
-            "Contemporary Temperature",
-            "Historical Annual Temperature"
-        ],
-        "Wild R²": [0.0687, 0.0740, 0.1153],
-        "Ag R²": [0.0071, 0.0698, 0.0359],
-        "Wild p-linear": ["4.3e-10", "1.6e-09", "9.6e-14"],
-        "Ag p-linear": ["1.3e-06", "4.5e-17", "7.2e-21"]
-    })
-    st.markdown("**Key Temperature Results**")
-    st.table(df_temp)
-    df_precip = pd.DataFrame({
-        "Metric": [
-            "Rainfall Anomaly",
-            "Contemporary Precipitation",
-            "Historical Monthly Precipitation",
-            "Annual Precipitation"
-        ],
-        "Wild R²": [0.0134, 0.0365, 0.0134, 0.0089],
-        "Ag R²": [0.0590, 0.0242, 0.0590, 0.0313],
-        "Wild p": ["6.6e-03", "2.0e-05", "6.7e-03", "2.8e-02"],
-        "Ag p": ["3.8e-06", "7.5e-07", "3.7e-06", "3.9e-08"]
-    })
-    st.markdown("**Key Precipitation Results**")
-    st.table(df_precip)
-    st.markdown("**Conclusion:** Hypothesis 1 is validated—each climate factor significantly influences disease, with wild systems generally more sensitive.")
+    published, recomputed = result_tabs()
+    with published:
+        df_temp = pd.DataFrame({
+            "Metric": [
+                "Temperature Anomaly",
+                "Contemporary Temperature",
+                "Historical Annual Temperature"
+            ],
+            "Wild R²": [0.0687, 0.0740, 0.1153],
+            "Ag R²": [0.0071, 0.0698, 0.0359],
+            "Wild p-linear": ["4.3e-10", "1.6e-09", "9.6e-14"],
+            "Ag p-linear": ["1.3e-06", "4.5e-17", "7.2e-21"]
+        })
+        st.markdown("**Key Temperature Results**")
+        st.table(df_temp)
+        df_precip = pd.DataFrame({
+            "Metric": [
+                "Rainfall Anomaly",
+                "Contemporary Precipitation",
+                "Historical Monthly Precipitation",
+                "Annual Precipitation"
+            ],
+            "Wild R²": [0.0134, 0.0365, 0.0134, 0.0089],
+            "Ag R²": [0.0590, 0.0242, 0.0590, 0.0313],
+            "Wild p": ["6.6e-03", "2.0e-05", "6.7e-03", "2.8e-02"],
+            "Ag p": ["3.8e-06", "7.5e-07", "3.7e-06", "3.9e-08"]
+        })
+        st.markdown("**Key Precipitation Results**")
+        st.table(df_precip)
+        st.markdown("**Conclusion:** Hypothesis 1 is validated—each climate factor significantly influences disease, with wild systems generally more sensitive.")
+    with recomputed:
+        show_recomputed("H1", ("Key Temperature Results", "h1_temperature"), ("Key Precipitation Results", "h1_precipitation"))
     st.markdown("#### Stakeholder Insights")
     st.markdown("""
     - **Researchers:** Use CV-validated metrics to refine predictive models across systems.  
@@ -134,23 +164,27 @@ with st.expander("**Hypothesis 2: System-Type Sensitivity**"):
         "**Wild plant–pathogen systems exhibit stronger climate–disease responses than agricultural systems.**"
     )
     st.markdown("**Validation Approach:** Compared R² for each metric between Wild vs. Ag.")
-    df_h2 = pd.DataFrame({
-        "Metric": [
-            "Annual Historical Temp",
-            "Temp Anomaly",
-            "Contemporary Temp",
-            "Annual Precipitation",
-            "Precipitation Anomaly",
-            "Contemporary Precipitation",
-            "Monthly Historical Precipitation"
-        ],
-        "Wild R²": [0.1153, 0.0687, 0.0740, 0.0089, 0.0134, 0.0365, 0.0134],
-        "Ag R²": [0.0359, 0.0071, 0.0698, 0.0313, 0.0590, 0.0242, 0.0590],
-        "Wild > Ag?": ["yes", "yes", "slightly", "no", "no", "yes", "no"]
-    })
-    st.markdown("**Wild vs. Ag R² Comparison**")
-    st.table(df_h2)
-    st.markdown("**Conclusion:** Wild > Ag for all temperature metrics; precipitation shows mixed sensitivity.")
+    published, recomputed = result_tabs()
+    with published:
+        df_h2 = pd.DataFrame({
+            "Metric": [
+                "Annual Historical Temp",
+                "Temp Anomaly",
+                "Contemporary Temp",
+                "Annual Precipitation",
+                "Precipitation Anomaly",
+                "Contemporary Precipitation",
+                "Monthly Historical Precipitation"
+            ],
+            "Wild R²": [0.1153, 0.0687, 0.0740, 0.0089, 0.0134, 0.0365, 0.0134],
+            "Ag R²": [0.0359, 0.0071, 0.0698, 0.0313, 0.0590, 0.0242, 0.0590],
+            "Wild > Ag?": ["yes", "yes", "slightly", "no", "no", "yes", "no"]
+        })
+        st.markdown("**Wild vs. Ag R² Comparison**")
+        st.table(df_h2)
+        st.markdown("**Conclusion:** Wild > Ag for all temperature metrics; precipitation shows mixed sensitivity.")
+    with recomputed:
+        show_recomputed("H2", ("Wild vs. Ag R² Comparison", "h2"))
     st.markdown("#### Stakeholder Insights")
     st.markdown("""
     - **Researchers:** Focus on wild-system data for understanding extreme-weather impacts.  
@@ -164,15 +198,19 @@ with st.expander("**Hypothesis 3: Thermal & Precipitation Mismatch**"):
         "**In wild systems, disease spikes at moderate deviations from historical norms; agriculture shows little mismatch.**"
     )
     st.markdown("**Validation Approach:** OLS with interaction `anomaly × historical` for each system.")
-    df_h3 = pd.DataFrame({
-        "Effect": ["Temp × Historical", "Rain × Historical"],
-        "Wild Coef.": [-0.0142, -0.0312],
-        "Ag Coef.": [-0.0031, -0.0069],
-        "p-value": ["< 0.001", "< 0.01"]
-    })
-    st.markdown("**Interaction Coefficients**")
-    st.table(df_h3)
-    st.markdown("**Conclusion:** Wild systems confirm a strong mismatch effect; agriculture is largely buffered.")
+    published, recomputed = result_tabs()
+    with published:
+        df_h3 = pd.DataFrame({
+            "Effect": ["Temp × Historical", "Rain × Historical"],
+            "Wild Coef.": [-0.0142, -0.0312],
+            "Ag Coef.": [-0.0031, -0.0069],
+            "p-value": ["< 0.001", "< 0.01"]
+        })
+        st.markdown("**Interaction Coefficients**")
+        st.table(df_h3)
+        st.markdown("**Conclusion:** Wild systems confirm a strong mismatch effect; agriculture is largely buffered.")
+    with recomputed:
+        show_recomputed("H3", ("Interaction Coefficients", "h3"))
     st.markdown("#### Stakeholder Insights")
     st.markdown("""
     - **Researchers:** Incorporate mismatch interactions in risk models for wild ecosystems.  
@@ -186,21 +224,25 @@ with st.expander("**Hypothesis 4: Geographic & Pathogen-Type Modulation**"):
         "**Pathogen identity and tolerance breadth shape climate–disease relationships.**"
     )
     st.markdown("**Validation Approach:** OLS with `anomaly × pathogen_group` and `anomaly × tolerance_class`.")
-    df_pgroup = pd.DataFrame({
-        "Pathogen Group": ["Eukaryotic parasite", "Pest", "Virus"],
-        "Interaction Coef.": [-0.0124, -0.0076, -0.0335],
-        "p-value": ["0.545", "0.812", "0.099"]
-    })
-    st.markdown("**Temp × Pathogen Group**")
-    st.table(df_pgroup)
-    df_tolerance = pd.DataFrame({
-        "Tolerance Class": ["Intermediate", "Narrow"],
-        "Interaction Coef.": [-0.0196, 0.0048],
-        "p-value": ["0.003", "0.848"]
-    })
-    st.markdown("**Tolerance Class Effect**")
-    st.table(df_tolerance)
-    st.markdown("**Conclusion:** Pathogen identity alone isn’t significant; tolerance breadth shows a weak effect.")
+    published, recomputed = result_tabs()
+    with published:
+        df_pgroup = pd.DataFrame({
+            "Pathogen Group": ["Eukaryotic parasite", "Pest", "Virus"],
+            "Interaction Coef.": [-0.0124, -0.0076, -0.0335],
+            "p-value": ["0.545", "0.812", "0.099"]
+        })
+        st.markdown("**Temp × Pathogen Group**")
+        st.table(df_pgroup)
+        df_tolerance = pd.DataFrame({
+            "Tolerance Class": ["Intermediate", "Narrow"],
+            "Interaction Coef.": [-0.0196, 0.0048],
+            "p-value": ["0.003", "0.848"]
+        })
+        st.markdown("**Tolerance Class Effect**")
+        st.table(df_tolerance)
+        st.markdown("**Conclusion:** Pathogen identity alone isn’t significant; tolerance breadth shows a weak effect.")
+    with recomputed:
+        show_recomputed("H4", ("|Anomaly| × Pathogen Group", "h4_pathogen"), ("|Anomaly| × Tolerance Class", "h4_tolerance"))
     st.markdown("#### Stakeholder Insights")
     st.markdown("""
     - **Researchers:** Explore regional pathogen profiles for tailored models.  
@@ -214,19 +256,23 @@ with st.expander("**Hypothesis 5: Transmission-Mode Sensitivity**"):
         "**Directly transmitted pathogens respond more strongly to precipitation anomalies than vector-borne ones.**"
     )
     st.markdown("**Validation Approach:** OLS with `abs_precip_anom × C(transmission_mode)`.")
-    df_h5 = pd.DataFrame({
-        "Term": [
-            "Intercept (Direct slope)",
-            "Vector-borne main effect",
-            "Direct slope",
-            "Slope difference (Vector vs Direct)"
-        ],
-        "Coefficient": [0.1171, -0.0414, 0.0505, -0.0150],
-        "p-value": ["< 0.001", "0.040", "< 0.001", "0.062"]
-    })
-    st.markdown("**Precipitation × Transmission Mode**")
-    st.table(df_h5)
-    st.markdown("**Conclusion:** Direct pathogens have steeper precipitation-response; vector-borne are somewhat buffered.")
+    published, recomputed = result_tabs()
+    with published:
+        df_h5 = pd.DataFrame({
+            "Term": [
+                "Intercept (Direct slope)",
+                "Vector-borne main effect",
+                "Direct slope",
+                "Slope difference (Vector vs Direct)"
+            ],
+            "Coefficient": [0.1171, -0.0414, 0.0505, -0.0150],
+            "p-value": ["< 0.001", "0.040", "< 0.001", "0.062"]
+        })
+        st.markdown("**Precipitation × Transmission Mode**")
+        st.table(df_h5)
+        st.markdown("**Conclusion:** Direct pathogens have steeper precipitation-response; vector-borne are somewhat buffered.")
+    with recomputed:
+        show_recomputed("H5", ("Precipitation × Transmission Mode", "h5"))
     st.markdown("#### Stakeholder Insights")
     st.markdown("""
     - **Researchers:** Factor in transmission mode when modeling moisture-driven disease.  
@@ -1,6 +1,8 @@
 from pathlib import Path
 import streamlit as st
-import streamlit.components.v1 as components
+
+from common_utils import show_embed
+from figures import CORRELATION_METHODS, correlation_figure, dataset_available, filter_controls
 
 # ───────── Page config & icon ─────────
 ICON_PATH = Path(__file__).parent / "images" / "corr_icon.ico"
@@ -59,8 +61,12 @@ st.markdown("""
 # ───────── Centered correlation heatmap ─────────
 col1, col2, col3 = st.columns([1,2,1])
 with col2:
-    HTML = Path(__file__).parent.parent / "images" / "corr.html"
-    components.html(HTML.read_text(encoding="utf-8"), height=700, width=700, scrolling=True)
+    if dataset_available():
+        method = st.radio("Correlation", list(CORRELATION_METHODS), horizontal=True)
+        st.plotly_chart(correlation_figure(method, filter_controls(groups=True)), use_container_width=True)
+    else:
+        HTML = Path(__file__).parent.parent / "images" / "corr.html"
+        show_embed(HTML, height=700, width=700, scrolling=True)
 
 # ───────── Centered caption ─────────
 col1, col2, col3 = st.columns([1,2,1])
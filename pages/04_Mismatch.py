@@ -1,6 +1,8 @@
 from pathlib import Path
 import streamlit as st
-import streamlit.components.v1 as components
+
+from common_utils import show_embed
+from figures import dataset_available, filter_controls, incidence_chart
 
 # ───────── Page config & icon ─────────
 st.set_page_config(
@@ -92,11 +94,13 @@ metric = st.selectbox("Metric", ["Temperature vs. Incidence", "Rainfall vs. Inci
 chosen_file = file_map[(system, metric)]
 html_path   = IMG_DIR / chosen_file
 
-if not html_path.exists():
+if dataset_available():
+    incidence_chart(system, metric, filter_controls())
+elif not html_path.exists():
     st.error(f"Missing `{chosen_file}` in `/images` folder.")
 else:
-    components.html(
-        html_path.read_text(encoding="utf-8"),
+    show_embed(
+        html_path,
         height=600,
         scrolling=True
     )
@@ -1,6 +1,8 @@
 from pathlib import Path
 import streamlit as st
-import streamlit.components.v1 as components
+
+from common_utils import show_embed
+from figures import dataset_available, filter_controls, violin_figure
 
 # ───────── Page config & icon ─────────
 st.set_page_config(
@@ -53,11 +55,13 @@ metric = st.selectbox("Climate Metric", list(violin_map.keys()))
 
 # ─── embed the corresponding HTML ────────────────────
 html_file = IMG_DIR / violin_map[metric]
-if not html_file.exists():
+if dataset_available():
+    st.plotly_chart(violin_figure(metric, filter_controls()), use_container_width=True)
+elif not html_file.exists():
     st.error(f"Missing `{html_file.name}` in `images/` folder.")
 else:
-    components.html(
-        html_file.read_text(encoding="utf-8"),
+    show_embed(
+        html_file,
         height=500,
         scrolling=True
     )
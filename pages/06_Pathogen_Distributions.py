@@ -2,7 +2,9 @@
 
 from pathlib import Path
 import streamlit as st
-import streamlit.components.v1 as components
+
+from common_utils import show_embed
+from figures import category_figure, dataset_available, distribution_figure, filter_controls
 
 st.set_page_config(
     page_title="Pathogen & Host Diversity",
@@ -49,14 +51,20 @@ st.markdown("""
 ROOT    = Path(__file__).parent.parent
 IMG_DIR = ROOT / "images"
 
+# ───────── live figures when the dataset is present, static exports otherwise ─────────
+filters = filter_controls() if dataset_available() else None
+
 # ───────── embed the overall distribution ─────────
 overall_html = IMG_DIR / "Pathogen_host_dist.html"
-if overall_html.exists():
-    components.html(
-        overall_html.read_text(encoding="utf-8"),
-        height=600,
-        scrolling=True
-    )
+if filters is not None or overall_html.exists():
+    if filters is not None:
+        st.plotly_chart(category_figure(filters), use_container_width=True)
+    else:
+        show_embed(
+            overall_html,
+            height=600,
+            scrolling=True
+        )
     st.markdown(
         "<div class='fig-caption'>"
         "<b>Figure:</b> Pathogen and host order counts by system. Each bar shows the number of disease surveys for each pathogen and host group in agricultural and natural plant systems."
@@ -87,12 +95,15 @@ dist_map = {
 
 choice = st.selectbox("Distribution Type", list(dist_map.keys()))
 detail_html = IMG_DIR / dist_map[choice]
-if detail_html.exists():
-    components.html(
-        detail_html.read_text(encoding="utf-8"),
-        height=600,
-        scrolling=True
-    )
+if filters is not None or detail_html.exists():
+    if filters is not None:
+        st.plotly_chart(distribution_figure(choice, filters), use_container_width=True)
+    else:
+        show_embed(
+            detail_html,
+            height=600,
+            scrolling=True
+        )
     # Optional: add an accessibility-friendly caption
     st.markdown(
         f"<div class='fig-caption'><b>Figure:</b> Pathogen and host order counts distributed by {choice.replace('Distributions','').strip()} metric across systems.</div>",
@@ -1,9 +1,11 @@
 import streamlit as st
-import streamlit.components.v1 as components
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from common_utils import show_embed
+from model_registry import cv_scores, test_scores as registry_test_scores
+
 # ───────── Page config & green theme CSS ─────────
 st.set_page_config(
     page_title="ClimaCrop Health",
@@ -98,36 +100,10 @@ IMG_DIR = ROOT / "images"
 EMBED_WIDTH  = 700
 EMBED_HEIGHT = 500
 
-# ───────── define hard-coded CV & Test data ─────────
-cv_data_ag = {
-    "Ridge-spline":  [0.56,  0.457, 0.55,  0.565, 0.519],
-    "RandomForest":  [0.575, 0.512, 0.585, 0.593, 0.531],
-    "XGB":           [0.596, 0.453, 0.573, 0.614, 0.558],
-    "SVR":           [0.568, 0.443, 0.560, 0.541, 0.551],
-    "Stacking":      [0.596, 0.479, 0.588, 0.620, 0.572],
-}
-cv_data_wd = {
-    "Ridge-spline":  [0.497, 0.608, 0.627, 0.364, 0.601],
-    "RandomForest":  [0.476, 0.520, 0.564, 0.313, 0.452],
-    "XGB":           [0.417, 0.457, 0.495, 0.223, 0.274],
-    "SVR":           [0.354, 0.532, 0.611, 0.351, 0.547],
-    "Stacking":      [0.491, 0.588, 0.610, 0.368, 0.543],
-}
-test_scores = {
-    "MSE": {
-        "Agricultural Default Stacking": 0.02879,
-        "Wild Tuned Ridge-spline":       0.03014,
-    },
-    "R²": {
-        "Agricultural Default Stacking": 0.527,
-        "Wild Tuned Ridge-spline":       0.516,
-    },
-}
-
-# ───────── helper to load HTML and fix encoding ─────────
-def load_and_fix(path: Path) -> str:
-    txt = path.read_text(encoding="utf-8")
-    return txt.replace("RÂ²", "R²").replace("$R^2$", "R²")
+# ───────── CV & test metrics from the model registry ─────────
+cv_data_ag = cv_scores("Agricultural")
+cv_data_wd = cv_scores("Wild")
+test_scores = pd.DataFrame(registry_test_scores())
 
 def insight_box(items: list[str], style: str = "ag"):
     """
@@ -163,8 +139,8 @@ with tab1:
         choice_ag = st.selectbox("Choose Agricultural model", models, key="r2_ag")
         html_r2_ag = IMG_DIR / f"r2_Agricultural_{choice_ag}.html"
         if html_r2_ag.exists():
-            components.html(
-                load_and_fix(html_r2_ag),
+            show_embed(
+                html_r2_ag,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -178,8 +154,8 @@ with tab1:
         st.subheader("Best Model: Actual vs Predicted (Train)")
         file_train_ag = IMG_DIR / "actual_vs_Agricultural_train.html"
         if file_train_ag.exists():
-            components.html(
-                load_and_fix(file_train_ag),
+            show_embed(
+                file_train_ag,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -191,8 +167,8 @@ with tab1:
         st.subheader("Best Model: Actual vs Predicted (Test)")
         file_test_ag = IMG_DIR / "actual_vs_Agricultural_test.html"
         if file_test_ag.exists():
-            components.html(
-                load_and_fix(file_test_ag),
+            show_embed(
+                file_test_ag,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -223,8 +199,8 @@ with tab1:
         choice_wd = st.selectbox("Choose Wild model", models, key="r2_wd")
         html_r2_wd = IMG_DIR / f"r2_Wild_{choice_wd}.html"
         if html_r2_wd.exists():
-            components.html(
-                load_and_fix(html_r2_wd),
+            show_embed(
+                html_r2_wd,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -238,8 +214,8 @@ with tab1:
         st.subheader("Best Model: Actual vs Predicted (Train)")
         file_train_wd = IMG_DIR / "actual_vs_Wild_train.html"
         if file_train_wd.exists():
-            components.html(
-                load_and_fix(file_train_wd),
+            show_embed(
+                file_train_wd,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -251,8 +227,8 @@ with tab1:
         st.subheader("Best Model: Actual vs Predicted (Test)")
         file_test_wd = IMG_DIR / "actual_vs_Wild_test.html"
         if file_test_wd.exists():
-            components.html(
-                load_and_fix(file_test_wd),
+            show_embed(
+                file_test_wd,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -297,11 +273,14 @@ with tab2:
         st.markdown("**Train (5-Fold CV) R² Table**")
         st.table(summary_ag)
 
+        st.markdown("**Held-out Test Scores (Best Model)**")
+        st.table(test_scores[test_scores.index.str.startswith("Agricultural")])
+
         st.markdown("**Train (5-Fold CV) R² Chart**")
         f_ag = IMG_DIR / "cv_summary_ag.html"
         if f_ag.exists():
-            components.html(
-                load_and_fix(f_ag),
+            show_embed(
+                f_ag,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -323,11 +302,14 @@ with tab2:
         st.markdown("**Train (5-Fold CV) R² Table**")
         st.table(summary_wd)
 
+        st.markdown("**Held-out Test Scores (Best Model)**")
+        st.table(test_scores[test_scores.index.str.startswith("Wild")])
+
         st.markdown("**Train (5-Fold CV) R² Chart**")
         f_wd = IMG_DIR / "cv_summary_wd.html"
         if f_wd.exists():
-            components.html(
-                load_and_fix(f_wd),
+            show_embed(
+                f_wd,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -354,8 +336,8 @@ with tab3:
     with ag_tab:
         f = IMG_DIR / "perm_importance_ag.html"
         if f.exists():
-            components.html(
-                load_and_fix(f),
+            show_embed(
+                f,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
@@ -374,8 +356,8 @@ with tab3:
     with wd_tab:
         f = IMG_DIR / "perm_importance_wd.html"
         if f.exists():
-            components.html(
-                load_and_fix(f),
+            show_embed(
+                f,
                 height=EMBED_HEIGHT,
                 width=EMBED_WIDTH,
                 scrolling=True
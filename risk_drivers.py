@@ -0,0 +1,439 @@
+"""
+Per-prediction driver explanations for the risk scores.
+
+Backs the "Driver Explanation" requirement: a prediction is split into a
+base value plus one additive contribution per model input, and the
+climate inputs are summed into the drivers shown to stakeholders
+("Temperature anomaly +2.7 °C raises incidence by 0.031").
+
+Attributions are computed on the encoded design matrix and summed over
+each input's encoded block (its spline bases or one-hot levels), with a
+method per estimator:
+
+- linear models (the Wild Ridge-spline, the stack's Ridge): exact,
+  ``coef · (x − background mean)``;
+- XGBoost: TreeSHAP, via the booster's ``pred_contribs``;
+- random forests: path attribution (TreeSHAP's ``approximate`` mode),
+  with each leaf's credits summed once so a row costs one ``apply`` per
+  tree;
+- RBF ``SVR``: Shapley values against the background mean.  The kernel
+  factorises over feature blocks, so a coalition costs one sum and one
+  exponential per support vector instead of a predict.  Inputs equal to
+  the reference take no part, so with up to ``EXACT_INPUTS`` others
+  (a scenario moves only the climate inputs) every coalition is
+  evaluated and the values are exact; beyond that they are sampled over
+  antithetic feature permutations;
+- ``StackingRegressor``: its members' attributions combined through the
+  final linear model's weights;
+- anything else: the permutation sampler over ``predict``.
+
+Contributions always sum to the model output minus the base value.  For
+scenario explanations the reference is the system's zero-anomaly
+baseline scenario: the base value is the baseline score, and each
+driver is the change it makes relative to that scenario (tree
+attributions, which have no reference of their own, are differenced
+against the baseline row's).  Scenario rows are encoded by patching the
+climate inputs into the baseline row's compiled encoding, without
+pandas, so a new explanation takes no longer than a ``score`` call.
+Explanations are cached per anomaly bucket (``BUCKET_C`` °C ×
+``BUCKET_MM`` mm/day).
+
+Usage:
+    python risk_drivers.py Agricultural 2.7 -1.3
+    # or: risk_drivers.explain("Agricultural", 2.7, -1.3).drivers
+"""
+import argparse
+import time
+from functools import lru_cache
+from math import factorial
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+import xgboost
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor, StackingRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.svm import SVR
+from sklearn.tree import DecisionTreeRegressor
+from xgboost import XGBModel
+
+from climate_features import RAW_COLUMNS, climate_features
+from feature_importance import encoded_blocks
+from risk_scoring import SYSTEM_TYPES, classify_zones, get_scorer
+
+N_PERMUTATIONS = 16
+# Inputs away from the reference up to which the SVR's Shapley values are exact (2**n kernel sums)
+EXACT_INPUTS = 8
+TOP_DRIVERS = 2
+BUCKET_C = 0.1
+BUCKET_MM = 0.1
+
+# Driver → (model inputs it covers, climate_features() key for its value, unit, value is an anomaly)
+CLIMATE_DRIVERS = {
+    "Temperature anomaly": (("contemp_temp", "temp_anomaly", "monthly_temp_x_temp_anomaly"), "temp_anomaly_C", "°C", True),
+    "Rainfall anomaly": (("contemp_precip", "rain_anomaly"), "rain_anomaly_daily", "mm/day", True),
+    "Monthly normal temperature": (("monthly_temp",), "monthly_temp_C", "°C", False),
+    "Monthly normal rainfall": (("monthly_precip",), "monthly_precip_mm_per_day", "mm/day", False),
+    "Annual mean temperature": (("annual_mean_temp",), "annual_mean_temp_C", "°C", False),
+    "Annual rainfall": (("annual_precip",), "annual_precip_mm_per_day", "mm/day", False),
+}
+
+
+class Driver(NamedTuple):
+    name: str
+    value: float
+    unit: str
+    contribution: float  # change in predicted incidence
+    anomaly: bool = True  # value is a signed departure, not an absolute normal
+
+    def __str__(self) -> str:
+        direction = "raises" if self.contribution >= 0 else "lowers"
+        value = f"{self.value:+.1f} {self.unit}" if self.anomaly else f"({self.value:.1f} {self.unit})"
+        return f"{self.name} {value} {direction} incidence by {abs(self.contribution):.3f}"
+
+
+class Explanation(NamedTuple):
+    incidence: float
+    zone: str
+    base_value: float
+    drivers: tuple[Driver, ...]
+
+
+# Encoded rows (n, p) → base values (n,) and per-input contributions (n, inputs)
+Attributor = Callable[[np.ndarray], tuple[np.ndarray, np.ndarray]]
+
+
+# ───────── Attribution per estimator ─────────
+def _dense(a) -> np.ndarray:
+    return a.toarray() if sparse.issparse(a) else np.asarray(a, dtype=np.float64)
+
+
+def _is_linear(est) -> bool:
+    return getattr(est, "coef_", None) is not None
+
+
+def _permutations(n_inputs: int, n_permutations: int) -> np.ndarray:
+    """Antithetic input orderings (each drawn with its reverse), seeded for reproducibility."""
+    rng = np.random.default_rng(0)
+    half = [rng.permutation(n_inputs) for _ in range(max(1, n_permutations // 2))]
+    return np.array(half + [p[::-1] for p in half])
+
+
+def _shapley(perms: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Shapley estimates from ``values[p, k]``, the output with the first ``k`` inputs of ``perms[p]`` on.
+
+    Each permutation telescopes, so the estimates sum exactly to
+    ``value(all) − value(none)``.
+    """
+    phi = np.zeros(perms.shape[1])
+    np.add.at(phi, perms, np.diff(values, axis=1))
+    return phi / len(perms)
+
+
+@lru_cache(maxsize=None)
+def _coalitions(n_inputs: int) -> np.ndarray:
+    """``(2**n, n)`` 0/1 membership of every coalition; row ``m`` holds the bits of ``m``."""
+    return (np.arange(2 ** n_inputs)[:, None] >> np.arange(n_inputs) & 1).astype(np.float64)
+
+
+def _exact_shapley(values: np.ndarray) -> np.ndarray:
+    """Exact Shapley values from ``values[m]``, the output with the inputs in coalition ``m`` (bitmask) on."""
+    n = int(values.size).bit_length() - 1
+    masks = np.arange(values.size)
+    size = _coalitions(n).sum(axis=1).astype(int)
+    # |S|! (n − |S| − 1)! / n! for coalitions S without the input
+    weight = np.array([factorial(k) * factorial(n - k - 1) / factorial(n) for k in range(n)])
+    phi = np.empty(n)
+    for j in range(n):
+        without = masks[(masks & (1 << j)) == 0]
+        phi[j] = weight[size[without]] @ (values[without | (1 << j)] - values[without])
+    return phi
+
+
+def _linear(est, reference: np.ndarray, groups: sparse.csr_matrix) -> Attributor:
+    coef = np.ravel(_dense(est.coef_))
+    base = float(reference @ coef + np.ravel(est.intercept_)[0])
+    groups = _dense(groups)  # a dense product beats scipy's on a few rows
+
+    def attribute(X):
+        return np.full(len(X), base), (X - reference) * coef @ groups
+    return attribute
+
+
+def _xgboost(est: XGBModel, groups: sparse.csr_matrix, is_sparse: bool) -> Attributor:
+    booster = est.get_booster()
+    groups = _dense(groups)
+
+    def attribute(X):
+        # Same input format as predict: XGBoost reads absent sparse entries as missing
+        data = xgboost.DMatrix(sparse.csr_matrix(X) if is_sparse else X, missing=est.missing)
+        contribs = booster.predict(data, pred_contribs=True).astype(np.float64)
+        return contribs[:, -1], contribs[:, :-1] @ groups
+    return attribute
+
+
+def _trees(est, groups: sparse.csr_matrix) -> Attributor:
+    """
+    Each split's change in node value, credited to its feature and averaged over trees.
+
+    A leaf's credits are fixed, so they are summed down every tree once
+    here; explaining a row is then one ``apply`` per tree plus a lookup.
+    """
+    trees = list(getattr(est, "estimators_", [est]))
+    input_of = np.asarray(groups.argmax(axis=1)).ravel()  # encoded column → input
+    tables, leaf_rows, roots, offset = [], [], [], 0
+    for tree in trees:
+        t = tree.tree_
+        value = t.value[:, 0, 0]
+        credit = np.zeros((t.node_count, groups.shape[1]))
+        level = np.array([0])
+        while level.size:
+            level = level[t.children_left[level] >= 0]
+            for children in (t.children_left[level], t.children_right[level]):
+                credit[children] = credit[level]
+                credit[children, input_of[t.feature[level]]] += value[children] - value[level]
+            level = np.concatenate([t.children_left[level], t.children_right[level]])
+        leaves = np.flatnonzero(t.children_left < 0)
+        rows = np.full(t.node_count, -1)
+        rows[leaves] = offset + np.arange(len(leaves))
+        tables.append(credit[leaves])
+        leaf_rows.append(rows)
+        roots.append(value[0])
+        offset += len(leaves)
+    table = np.concatenate(tables)
+    base = float(np.mean(roots))
+
+    def attribute(X):
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        leaves = np.stack([rows[tree.tree_.apply(X32)] for tree, rows in zip(trees, leaf_rows)])
+        return np.full(len(X), base), table[leaves].mean(axis=0)
+    return attribute
+
+
+def _rbf_svr(est: SVR, reference: np.ndarray, groups: sparse.csr_matrix, n_permutations: int) -> Attributor:
+    sv = _dense(est.support_vectors_)
+    coef = np.ravel(_dense(est.dual_coef_))
+    gamma, intercept = est._gamma, float(est.intercept_[0])
+    input_of = np.asarray(groups.argmax(axis=1)).ravel()  # encoded column → input
+    n_inputs = groups.shape[1]
+    sv_t = np.ascontiguousarray(sv.T)
+    sv_sq = np.asarray(groups.T @ (sv_t ** 2))  # (inputs, n_sv)
+
+    def log_kernel(x):
+        """−γ‖x_b − sv_b‖² per input block b: (inputs, n_sv); they sum to the log RBF kernel."""
+        nz = np.flatnonzero(x)  # encoded rows are mostly one-hot zeros
+        cross = np.zeros_like(sv_sq)
+        np.add.at(cross, input_of[nz], x[nz, None] * sv_t[nz])
+        x_sq = np.bincount(input_of[nz], x[nz] ** 2, minlength=n_inputs)
+        return -gamma * np.maximum(x_sq[:, None] + sv_sq - 2 * cross, 0.0)
+
+    ref_log = log_kernel(reference)
+    ref_total = ref_log.sum(axis=0)
+    base = float(np.exp(ref_total) @ coef + intercept)
+    perms = _permutations(n_inputs, n_permutations)
+
+    def attribute(X):
+        phi = np.zeros((len(X), n_inputs))
+        logs = np.empty((len(perms), n_inputs + 1, len(coef)))
+        logs[:, 0] = ref_total
+        for i, x in enumerate(X):
+            delta = log_kernel(x) - ref_log
+            # Inputs equal to the reference are null players: they take no credit and shift no one else's
+            active = np.flatnonzero(np.abs(delta).max(axis=1) > 0)
+            if len(active) <= EXACT_INPUTS:
+                coalitions = _coalitions(len(active))
+                phi[i, active] = _exact_shapley(np.exp(ref_total + coalitions @ delta[active]) @ coef)
+                continue
+            # Log kernel as each permutation switches its inputs on one by one
+            for k in range(n_inputs):
+                np.add(logs[:, k], delta[perms[:, k]], out=logs[:, k + 1])
+            phi[i] = _shapley(perms, np.exp(logs) @ coef)
+        return np.full(len(X), base), phi
+    return attribute
+
+
+def _sampled(est, reference: np.ndarray, groups: sparse.csr_matrix, is_sparse: bool, n_permutations: int) -> Attributor:
+    members = _dense(groups.T) > 0  # (inputs, p)
+
+    def predict(X):
+        return np.asarray(est.predict(sparse.csr_matrix(X) if is_sparse else X), dtype=np.float64)
+
+    base = float(predict(reference[None, :])[0])
+    perms = _permutations(groups.shape[1], n_permutations)
+    # Row k of permutation p switches on its first k inputs
+    masks = (np.argsort(perms, axis=1)[:, None, :] < np.arange(groups.shape[1] + 1)[None, :, None])
+    switched = (masks.reshape(-1, groups.shape[1]).astype(np.float64) @ members) > 0
+
+    def attribute(X):
+        phi = np.empty((len(X), groups.shape[1]))
+        for i, x in enumerate(X):
+            values = predict(np.where(switched, x, reference)).reshape(len(perms), -1)
+            phi[i] = _shapley(perms, values)
+        return np.full(len(X), base), phi
+    return attribute
+
+
+def _stacking(est: StackingRegressor, reference, groups, is_sparse, n_permutations) -> Attributor:
+    members = [attributor(e, reference, groups, is_sparse, n_permutations) for e in est.estimators_]
+    weights = np.ravel(_dense(est.final_estimator_.coef_))
+    intercept = float(np.ravel(est.final_estimator_.intercept_)[0])
+
+    def attribute(X):
+        parts = [member(X) for member in members]
+        base = intercept + sum(w * b for w, (b, _) in zip(weights, parts))
+        return base, sum(w * phi for w, (_, phi) in zip(weights, parts))
+    return attribute
+
+
+def attributor(est, reference: np.ndarray, groups: sparse.csr_matrix, is_sparse: bool,
+               n_permutations: int = N_PERMUTATIONS) -> Attributor:
+    """
+    Attribution function for a fitted estimator on encoded rows.
+
+    ``reference`` is the encoded background mean, ``groups`` the
+    ``(encoded columns, inputs)`` 0/1 block matrix and ``is_sparse``
+    whether the estimator was fitted on sparse input.
+    """
+    if isinstance(est, Pipeline) and len(est.steps) == 1:
+        est = est[-1]
+    if isinstance(est, StackingRegressor) and not est.passthrough and _is_linear(est.final_estimator_):
+        return _stacking(est, reference, groups, is_sparse, n_permutations)
+    if isinstance(est, XGBModel):
+        return _xgboost(est, groups, is_sparse)
+    if isinstance(est, (RandomForestRegressor, ExtraTreesRegressor, DecisionTreeRegressor)):
+        return _trees(est, groups)
+    if isinstance(est, SVR) and est.kernel == "rbf":
+        return _rbf_svr(est, reference, groups, n_permutations)
+    if _is_linear(est):
+        return _linear(est, reference, groups)
+    return _sampled(est, reference, groups, is_sparse, n_permutations)
+
+
+# ───────── Explainer ─────────
+class DriverExplainer:
+    """Additive per-input attributions for a ``ColumnTransformer`` → estimator pipeline."""
+
+    def __init__(self, model, background: pd.DataFrame, n_permutations: int = N_PERMUTATIONS):
+        steps = getattr(model, "steps", None)
+        blocks = encoded_blocks(steps[0][1]) if steps and len(steps) == 2 and isinstance(steps[0][1], ColumnTransformer) else None
+        if blocks is None:
+            raise TypeError("expected a Pipeline of a column-wise ColumnTransformer and one estimator")
+        self.model = model
+        self.inputs = list(blocks)
+        encoded = model[0].transform(background[list(model.feature_names_in_)])
+        is_sparse = sparse.issparse(encoded)
+        reference = np.asarray(encoded.mean(axis=0), dtype=np.float64).ravel()
+        rows = np.concatenate([blocks[c] for c in self.inputs])
+        cols = np.concatenate([np.full(len(blocks[c]), i) for i, c in enumerate(self.inputs)])
+        groups = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(reference), len(self.inputs)))
+        self._attribute = attributor(model[-1], reference, groups, is_sparse, n_permutations)
+
+    def attribute(self, encoded: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """``(base, contributions)`` for dense encoded rows; contributions follow ``self.inputs``."""
+        return self._attribute(np.atleast_2d(np.asarray(encoded, dtype=np.float64)))
+
+    def explain_frame(self, X: pd.DataFrame) -> pd.DataFrame:
+        """``base`` plus one contribution column per model input for each row of ``X``."""
+        base, phi = self.attribute(_dense(self.model[0].transform(X[list(self.model.feature_names_in_)])))
+        out = pd.DataFrame(phi, index=X.index, columns=self.inputs)
+        out.insert(0, "base", base)
+        return out
+
+
+def climate_drivers(contributions: dict[str, float], row: dict, top: int = TOP_DRIVERS) -> tuple[Driver, ...]:
+    """The ``top`` climate drivers by absolute contribution, valued in °C / mm/day from the raw ``row``."""
+    values = climate_features(*(row.get(c, np.nan) for c in RAW_COLUMNS))
+    drivers = [
+        Driver(name, float(values[key][0]), unit, float(sum(contributions.get(c, 0.0) for c in cols)), anomaly)
+        for name, (cols, key, unit, anomaly) in CLIMATE_DRIVERS.items()
+        if any(c in contributions for c in cols)
+    ]
+    return tuple(sorted(drivers, key=lambda d: -abs(d.contribution))[:top])
+
+
+def _encode(scorer, row: pd.DataFrame) -> np.ndarray:
+    encoded = scorer.encode_row(row)
+    return _dense(scorer.model[0].transform(row)) if encoded is None else encoded
+
+
+@lru_cache(maxsize=None)
+def _baseline_inputs(system: str) -> tuple[np.ndarray, np.ndarray]:
+    """Raw numeric inputs and category codes of the baseline row, for the compiled encoder."""
+    encoder = get_scorer(system).compiled.encoder
+    row = get_scorer(system).scenario_row(0.0, 0.0)
+    return encoder.numeric_values(row), encoder.codes(row)
+
+
+def _encode_scenario(system: str, temp_anomaly_C: float, rain_anomaly_daily: float) -> tuple[np.ndarray, dict]:
+    """Dense encoded scenario row and its climate values, through the compiled encoder when there is one."""
+    scorer = get_scorer(system)
+    features = scorer.scenario_features(temp_anomaly_C, rain_anomaly_daily)
+    if scorer.compiled is None:
+        return _encode(scorer, scorer.scenario_row(temp_anomaly_C, rain_anomaly_daily)), features
+    # Only climate inputs differ from the baseline row: patch them into its cached values, skipping pandas
+    encoder = scorer.compiled.encoder
+    values, codes = _baseline_inputs(system)
+    values = values.copy()
+    for i, col in enumerate(encoder.numeric_inputs):
+        if col in features:
+            values[0, i] = features[col]
+    return encoder.batch(values, codes).dense(0, 1, np.float64), features
+
+
+@lru_cache(maxsize=None)
+def get_explainer(system: str) -> DriverExplainer:
+    """Process-wide explainer for the served model of "Agricultural" or "Wild", against its zero-anomaly baseline."""
+    scorer = get_scorer(system)
+    return DriverExplainer(scorer.model, scorer.scenario_row(0.0, 0.0))
+
+
+@lru_cache(maxsize=None)
+def _baseline_attribution(system: str) -> tuple[float, np.ndarray]:
+    """Output and per-input attributions of the zero-anomaly baseline scenario."""
+    scorer = get_scorer(system)
+    base, phi = get_explainer(system).attribute(_encode(scorer, scorer.scenario_row(0.0, 0.0)))
+    return float(base[0] + phi[0].sum()), phi[0]
+
+
+@lru_cache(maxsize=4096)
+def _explain_bucket(system: str, temp_bucket: int, rain_bucket: int, top: int) -> Explanation:
+    temp_anomaly_C, rain_anomaly_daily = temp_bucket * BUCKET_C, rain_bucket * BUCKET_MM
+    explainer = get_explainer(system)
+    encoded, features = _encode_scenario(system, temp_anomaly_C, rain_anomaly_daily)
+    base, phi = explainer.attribute(encoded)
+    # Attributions are additive, so the score needs no separate predict
+    incidence = float(np.clip(base[0] + phi[0].sum(), 0.0, 1.0))
+    # Relative to the zero-anomaly baseline (a no-op for reference-based attributions)
+    baseline, baseline_phi = _baseline_attribution(system)
+    raw = {c: features[c] for c in RAW_COLUMNS}
+    drivers = climate_drivers(dict(zip(explainer.inputs, phi[0] - baseline_phi)), raw, top)
+    return Explanation(incidence, str(classify_zones(incidence, system)), baseline, drivers)
+
+
+def explain(system: str, temp_anomaly_C: float, rain_anomaly_daily: float, top: int = TOP_DRIVERS) -> Explanation:
+    """Risk score and top climate drivers for a scenario, at the nearest anomaly bucket."""
+    return _explain_bucket(system, round(temp_anomaly_C / BUCKET_C), round(rain_anomaly_daily / BUCKET_MM), top)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Explain a scenario's risk score.")
+    parser.add_argument("system", choices=list(SYSTEM_TYPES))
+    parser.add_argument("temp_anomaly_C", type=float)
+    parser.add_argument("rain_anomaly_daily", type=float)
+    parser.add_argument("--top", type=int, default=TOP_DRIVERS)
+    args = parser.parse_args(argv)
+
+    explain(args.system, 0.0, 0.0)  # warm up: explainer, baseline attributions and encoding
+    t0 = time.perf_counter()
+    result = explain(args.system, args.temp_anomaly_C, args.rain_anomaly_daily, args.top)
+    print(f"{args.system}: incidence {result.incidence:.3f} ({result.zone}), zero-anomaly baseline {result.base_value:.3f}"
+          f"  [{1000 * (time.perf_counter() - t0):.1f} ms]")
+    for driver in result.drivers:
+        print(f"  - {driver}")
+
+
+if __name__ == "__main__":
+    main()
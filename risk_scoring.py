@@ -0,0 +1,455 @@
+"""
+Disease-risk scoring engine behind the dashboard's "Predict" controls.
+
+The best model per system (Agricultural: default Stacking, Wild: tuned
+Ridge-spline — see the Model Insights page) is loaded once per process
+and kept warm.  A request supplies temperature and rainfall anomalies;
+everything else comes from a per-system baseline survey (a real
+representative survey, see :func:`baseline_profile`), and the climate
+features are derived with :mod:`climate_features`.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property, lru_cache
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
+from scipy.spatial.distance import cdist
+from sklearn.compose import ColumnTransformer
+
+from climate_features import FEATURES, RAW_COLUMNS, climate_features, scenario_inputs
+from compiled_model import load_compiled
+from data_store import MERGED_CSV, MERGED_STORE, read_table
+from model_registry import ModelVersion, _walk_estimators, best_version, load_pipeline
+
+MODELS_DIR = Path(__file__).parent / "models"
+# The notebooks' best models, served when the registry has none; written by
+# ``python train_models.py --models Stacking Ridge-spline --export``
+BEST_MODELS = {
+    "Agricultural": MODELS_DIR / "agricultural_stacking.joblib",
+    "Wild":         MODELS_DIR / "wild_ridge_spline.joblib",
+}
+# Dashboard system name → ``system_type`` value in the cleaned dataset
+SYSTEM_TYPES = {"Agricultural": "Ag", "Wild": "Natural"}
+SCORE_CACHE_SIZE = 4096
+# Where and when a survey was taken, kept in every baseline profile
+SURVEY_KEYS = ["Latitude", "Longitude", "start_date"]
+NORMALS = ["monthly_temp", "monthly_precip"]
+# Scenario inputs feature_table reads besides the model's own inputs
+SCENARIO_COLUMNS = ["temp_anomaly_C", "rain_anomaly_daily", "month"]
+
+
+class RiskScore(NamedTuple):
+    incidence: float
+    zone: str
+
+
+def classify_zones(incidence, system: str | None = None) -> np.ndarray:
+    """Low/Moderate/High zone of each incidence value with ``system``'s thresholds (see :mod:`risk_zoning`)."""
+    # risk_zoning builds on the scorer, so import it at call time
+    from risk_zoning import classify
+    return classify(incidence, system)
+
+
+def _is_numeric(s: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(s) and not isinstance(s.dtype, pd.CategoricalDtype)
+
+
+def baseline_profile(df: pd.DataFrame, columns: list[str], candidates: np.ndarray | None = None) -> dict:
+    """
+    Typical survey for ``df``: its medoid on the numeric ``columns``.
+
+    The medoid is the complete survey with the smallest summed distance to
+    all others over the standardised numeric columns, so its location,
+    host and normals belong together.  Only ``candidates`` (a boolean
+    mask) may be chosen; by default the surveys that the scenario engine
+    can move to the most calendar months (see
+    :func:`scenario_engine.normals_coverage`).  Returns ``columns`` plus
+    the survey's ``SURVEY_KEYS`` (``start_date`` as an ISO date).
+    """
+    numeric = [c for c in columns if _is_numeric(df[c])]
+    X = df[numeric].to_numpy(dtype=np.float64)
+    scale = np.nanstd(X, axis=0)
+    X = (X - np.nanmean(X, axis=0)) / np.where(scale > 0, scale, 1.0)
+    complete = np.isfinite(X).all(axis=1) & df[columns].notna().all(axis=1).to_numpy()
+    if candidates is None and set(SURVEY_KEYS) <= set(df.columns):
+        # scenario_engine builds on the scorer, so import it at call time
+        from scenario_engine import normals_coverage
+        coverage = normals_coverage(df["Latitude"], df["Longitude"], df["start_date"])
+        candidates = coverage == coverage[complete].max(initial=0)
+    pool = np.flatnonzero(complete if candidates is None else complete & candidates)
+    if not pool.size:
+        raise ValueError("no complete survey to take as the baseline")
+    others = X[complete]
+    totals = np.concatenate([cdist(X[pool[i:i + 1024]], others).sum(axis=1) for i in range(0, len(pool), 1024)])
+    row = df.iloc[pool[totals.argmin()]]
+
+    profile = {}
+    for col in dict.fromkeys([*columns, *SURVEY_KEYS]):
+        if col not in df.columns:
+            continue
+        if col == "start_date":
+            date = pd.to_datetime(row[col], errors="coerce")
+            profile[col] = None if pd.isna(date) else date.date().isoformat()
+        elif _is_numeric(df[col]):
+            profile[col] = float(row[col])
+        else:
+            profile[col] = str(row[col])
+    return profile
+
+
+def _single_threaded(model) -> None:
+    """Force ``n_jobs=1`` everywhere; thread-pool start-up dominates one-row predicts."""
+    # Fitted sub-estimators (a stack's estimators_) are clones that get_params does not reach
+    for est in _walk_estimators(model):
+        if "n_jobs" in est.get_params(deep=False):
+            est.set_params(n_jobs=1)
+
+
+class RiskScorer:
+    """
+    A loaded model plus the baseline row it perturbs for scenario requests.
+
+    ``compiled`` (see :mod:`compiled_model`), when given, serves every
+    prediction; ``model`` stays the reference pipeline for explanations.
+    ``version`` is the registry version the model was loaded from, if any,
+    and ``system`` ("Agricultural" / "Wild") selects the zone thresholds.
+    With a compiled graph and a version, ``model`` may be ``None``: the
+    pipeline is then loaded from the registry on first access.
+    """
+
+    def __init__(self, model, baseline: dict, compiled=None, version: ModelVersion | None = None,
+                 system: str | None = None):
+        if model is None and (compiled is None or version is None):
+            raise ValueError("a scorer without a pipeline needs a compiled graph and its registry version")
+        self._model = model
+        self.system = version.system if system is None and version is not None else system
+        self.compiled = compiled
+        self.version = version
+        self.feature_names = list((compiled if model is None else model).feature_names_in_)
+        self.baseline = baseline
+        self._template = pd.DataFrame([{c: baseline.get(c, np.nan) for c in self.feature_names}])
+        self._derived = [c for c in self.feature_names if c in FEATURES or c.startswith("contemp_")]
+        # Per-instance memo: a method-level lru_cache would pin every scorer and share one cache
+        self.score = lru_cache(maxsize=SCORE_CACHE_SIZE)(self._score)
+        self.score(0.0, 0.0)  # warm up lazy estimator state
+
+    @property
+    def model(self):
+        """The reference scikit-learn pipeline, loaded (memory-mapped) on first use when only compiled."""
+        if self._model is None:
+            self._model = load_pipeline(self.version)
+            _single_threaded(self._model)
+        return self._model
+
+    @cached_property
+    def _fast_path(self):
+        # Built on first use: with a compiled graph only explanations need it
+        return self._build_fast_path()
+
+    def _build_fast_path(self):
+        """
+        Precompute the transformed baseline row for ``ColumnTransformer`` pipelines.
+
+        Only transformers that read a climate column change between scenario
+        requests, so the categorical encoders run once here instead of on
+        every request.  Returns ``None`` for any other model layout.
+        """
+        steps = getattr(self.model, "steps", None)
+        if not steps or len(steps) < 2 or not isinstance(steps[0][1], ColumnTransformer):
+            return None
+        ct = steps[0][1]
+        base = ct.transform(self._template)
+        # Sparse output must stay sparse: XGBoost reads absent entries as missing
+        is_sparse = sparse.issparse(base)
+        base = base.toarray() if is_sparse else np.asarray(base, dtype=np.float64)
+        varying = [
+            (trans, list(cols), ct.output_indices_[name])
+            for name, trans, cols in ct.transformers_
+            if name in ct.output_indices_ and not isinstance(trans, str) and set(cols) & set(self._derived)
+        ]
+        return base, varying, self.model[1:], is_sparse
+
+    def encode_row(self, row: pd.DataFrame) -> np.ndarray | None:
+        """Dense encoded form of a scenario row (only climate columns re-encoded); ``None`` off the fast path."""
+        if self._fast_path is None:
+            return None
+        base, varying, _, _ = self._fast_path
+        Xt = base.copy()
+        for trans, cols, out in varying:
+            part = trans.transform(row[cols])
+            Xt[:, out] = part.toarray() if sparse.issparse(part) else part
+        return Xt
+
+    def _predict_row(self, row: pd.DataFrame) -> float:
+        if self.compiled is not None or self._fast_path is None:
+            return float(self.predict(row)[0])
+        _, _, rest, is_sparse = self._fast_path
+        Xt = self.encode_row(row)
+        if is_sparse:
+            Xt = sparse.csr_matrix(Xt)
+        return float(np.clip(rest.predict(Xt)[0], 0.0, 1.0))
+
+    @classmethod
+    def from_registry(cls, version: ModelVersion) -> "RiskScorer":
+        """Scorer for a registered version: compiled graph (else memory-mapped pipeline), stored baseline."""
+        compiled = load_compiled(version)
+        model = None
+        if compiled is None:
+            model = load_pipeline(version)
+            _single_threaded(model)
+        return cls(model, version.manifest["baseline"], compiled, version)
+
+    @classmethod
+    def from_path(cls, model_path: Path, system_type: str, data: pd.DataFrame | None = None) -> "RiskScorer":
+        """Load a persisted pipeline and derive its baseline from the cleaned dataset."""
+        model = joblib.load(model_path)
+        _single_threaded(model)
+        columns = list(model.feature_names_in_)
+        if data is None:
+            data = read_table(MERGED_STORE, MERGED_CSV, columns=sorted(set(columns) | {"system_type", *SURVEY_KEYS}))
+        system = next((s for s, t in SYSTEM_TYPES.items() if t == system_type), None)
+        return cls(model, baseline_profile(data[data["system_type"] == system_type], columns), system=system)
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        """Predicted incidence for a full feature table, clipped to [0, 1]."""
+        model = self.model if self.compiled is None else self.compiled
+        return np.clip(model.predict(X[self.feature_names]), 0.0, 1.0)
+
+    @property
+    def input_columns(self) -> set[str]:
+        """Columns :meth:`feature_table` reads; derived climate features among them are recomputed."""
+        return set(self.feature_names) | set(RAW_COLUMNS) | set(FEATURES) | set(SURVEY_KEYS) | set(SCENARIO_COLUMNS)
+
+    def row_normals(self, rows: pd.DataFrame) -> np.ndarray:
+        """
+        ``(n, 2)`` monthly temperature / precipitation normals at each row's place and month.
+
+        The month is ``month``, else that of ``start_date``; location and
+        month default to the baseline survey's.  Normals come from
+        :func:`scenario_engine.month_normals` and are NaN where it has none.
+        """
+        # scenario_engine builds on the scorer, so import it at call time
+        from scenario_engine import month_normals
+
+        n = len(rows)
+        lat, lon = (np.broadcast_to(rows[c].to_numpy(dtype=np.float64) if c in rows.columns
+                                    else self.baseline.get(c, np.nan), (n,)) for c in ("Latitude", "Longitude"))
+        if "month" in rows.columns:
+            months = pd.to_numeric(rows["month"], errors="coerce").to_numpy(dtype=np.float64)
+        else:
+            dates = rows["start_date"] if "start_date" in rows.columns else self.baseline.get("start_date")
+            months = np.broadcast_to(pd.to_datetime(pd.Series(dates), errors="coerce").dt.month
+                                     .to_numpy(dtype=np.float64), (n,))
+        bad = ~np.isnan(months) & ~np.isin(months, np.arange(1, 13))
+        if bad.any():
+            raise ValueError(f"month must be 1-12, got {np.unique(months[bad]).tolist()}")
+        out = np.full((n, len(NORMALS)), np.nan)
+        for month in np.unique(months[~np.isnan(months)]):
+            sel = months == month
+            out[sel] = month_normals(lat[sel], lon[sel], int(month))
+        return out
+
+    def feature_table(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Build the model's feature table for arbitrary scenario rows.
+
+        Columns present in ``rows`` are used as-is; missing model inputs come
+        from the baseline.  Missing monthly normals are looked up for each
+        row's place and month (:meth:`row_normals`) when ``rows`` has any of
+        ``month``, ``start_date``, ``Latitude`` or ``Longitude``, else taken
+        from the baseline.  If ``contemp_temp``/``contemp_precip`` are absent
+        they are implied from ``temp_anomaly_C``/``rain_anomaly_daily`` and
+        the normals, then all derived climate features are recomputed.
+        """
+        n = len(rows)
+        columns = {}
+        missing = [c for c in NORMALS if c not in rows.columns]
+        if missing and set(rows.columns) & {"month", *SURVEY_KEYS}:
+            normals = self.row_normals(rows)
+            columns = {c: normals[:, NORMALS.index(c)] for c in missing}
+
+        def col(name):
+            if name in columns:
+                return columns[name]
+            return rows[name].to_numpy(dtype=np.float64) if name in rows.columns else self.baseline.get(name, np.nan)
+
+        if "contemp_temp" in rows.columns and "contemp_precip" in rows.columns:
+            contemp_temp, contemp_precip = col("contemp_temp"), col("contemp_precip")
+        else:
+            contemp_temp, contemp_precip = scenario_inputs(
+                col("monthly_temp"), col("monthly_precip"),
+                col("temp_anomaly_C") if "temp_anomaly_C" in rows.columns else 0.0,
+                col("rain_anomaly_daily") if "rain_anomaly_daily" in rows.columns else 0.0,
+            )
+        features = climate_features(
+            contemp_temp, col("monthly_temp"), col("annual_mean_temp"),
+            contemp_precip, col("monthly_precip"), col("annual_precip"),
+        )
+        features["contemp_temp"] = np.broadcast_to(contemp_temp, (n,))
+        features["contemp_precip"] = np.broadcast_to(contemp_precip, (n,))
+        data = {}
+        for name in self.feature_names:
+            if name in self._derived:
+                data[name] = np.broadcast_to(features[name], (n,))
+            elif name in columns:
+                data[name] = columns[name]
+            elif name in rows.columns:
+                data[name] = rows[name].to_numpy()
+            else:
+                data[name] = np.full(n, self.baseline.get(name, np.nan), dtype=object if isinstance(self.baseline.get(name), str) else None)
+        return pd.DataFrame(data, index=rows.index)
+
+    def score_frame(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Score scenario rows in one vectorised predict; returns ``incidence`` and ``zone``.
+
+        Rows whose climate features are incomplete (e.g. no normals for
+        their place and month) are not predicted: they score NaN, zone ``None``.
+        """
+        table = self.feature_table(rows)
+        complete = np.isfinite(table[self._derived].to_numpy(dtype=np.float64)).all(axis=1)
+        incidence = np.full(len(table), np.nan)
+        if complete.any():
+            incidence[complete] = self.predict(table[complete])
+        return pd.DataFrame({"incidence": incidence, "zone": classify_zones(incidence, self.system)}, index=rows.index)
+
+    def scenario_features(self, temp_anomaly_C: float, rain_anomaly_daily: float) -> dict[str, float]:
+        """Raw climate columns and derived features of the baseline survey under the given anomalies (°C, mm/day)."""
+        b = self.baseline
+        contemp_temp, contemp_precip = scenario_inputs(
+            b["monthly_temp"], b["monthly_precip"], temp_anomaly_C, rain_anomaly_daily
+        )
+        raw = (contemp_temp, b["monthly_temp"], b.get("annual_mean_temp", np.nan),
+               contemp_precip, b["monthly_precip"], b.get("annual_precip", np.nan))
+        features = {**dict(zip(RAW_COLUMNS, raw)), **climate_features(*raw)}
+        return {c: float(np.ravel(v)[0]) for c, v in features.items()}
+
+    def scenario_row(self, temp_anomaly_C: float, rain_anomaly_daily: float) -> pd.DataFrame:
+        """The baseline survey's one-row feature table under the given anomalies (°C, mm/day)."""
+        features = self.scenario_features(temp_anomaly_C, rain_anomaly_daily)
+        row = self._template.copy()
+        for col in self._derived:
+            row[col] = features[col]
+        return row
+
+    def _score(self, temp_anomaly_C: float, rain_anomaly_daily: float) -> RiskScore:
+        """Score the baseline survey under the given anomalies (°C, mm/day); memoised as ``score``."""
+        incidence = self._predict_row(self.scenario_row(temp_anomaly_C, rain_anomaly_daily))
+        return RiskScore(incidence, str(classify_zones(incidence, self.system)))
+
+
+@lru_cache(maxsize=None)
+def get_scorer(system: str) -> RiskScorer:
+    """
+    Process-wide, lazily loaded scorer for "Agricultural" or "Wild".
+
+    Serves the registry's promoted version when it has a pipeline and
+    baseline (through its compiled graph if ``python compiled_model.py
+    compile`` has run), else the persisted model under ``models/``.
+    """
+    if system not in BEST_MODELS:
+        raise KeyError(f"Unknown system {system!r}; expected one of {list(BEST_MODELS)}")
+    version = best_version(system)
+    if version is not None and version.has_pipeline and version.manifest.get("baseline"):
+        return RiskScorer.from_registry(version)
+    path = BEST_MODELS[system]
+    if not path.exists():
+        raise FileNotFoundError(f"No persisted model at {path}")
+    return RiskScorer.from_path(path, SYSTEM_TYPES[system])
+
+
+# ───────── Batch scoring ─────────
+def _iter_chunks(source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks from a DataFrame, Arrow table or Parquet/CSV path."""
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_size):
+            yield source.iloc[start:start + chunk_size]
+    elif isinstance(source, pa.Table):
+        for batch in source.to_batches(max_chunksize=chunk_size):
+            yield batch.to_pandas()
+    else:
+        path = Path(source)
+        if path.suffix == ".parquet":
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def _score_chunk(system: str, chunk: pd.DataFrame, keep: tuple[str, ...] = ()) -> pd.DataFrame:
+    scorer = get_scorer(system)
+    unknown = set(chunk.columns) - scorer.input_columns - {"incidence", "zone"} - set(keep)
+    if unknown:
+        raise ValueError(f"Unknown input column(s) {sorted(unknown)}; pass them in keep= to carry them through")
+    scores = scorer.score_frame(chunk.drop(columns=list(keep), errors="ignore"))
+    # Input columns named like the outputs (e.g. a labelled table's ``incidence``) are replaced
+    return chunk.drop(columns=scores.columns, errors="ignore").join(scores)
+
+
+def score_batch(
+    source,
+    system: str,
+    chunk_size: int = 50_000,
+    n_jobs: int = 1,
+    keep: tuple[str, ...] = (),
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream scored chunks for a large table of scenario rows.
+
+    ``source`` is a DataFrame, a ``pyarrow.Table`` or a path to a Parquet or
+    CSV file; only ``chunk_size`` rows per worker are held in memory.  Each
+    yielded chunk is the input rows plus ``incidence`` and ``zone`` (replacing
+    any input columns of those names), in input order.  Input columns must
+    be ones :meth:`RiskScorer.feature_table` reads, or be listed in ``keep``
+    to be carried through unscored; anything else raises ``ValueError``.
+    With ``n_jobs > 1`` chunks are scored on a process pool whose workers
+    each load the model once; ``n_jobs=-1`` uses every CPU.
+    """
+    if system not in BEST_MODELS:
+        raise KeyError(f"Unknown system {system!r}; expected one of {list(BEST_MODELS)}")
+    if n_jobs == 0:
+        raise ValueError("n_jobs must be a positive worker count or negative (-1 = every CPU), got 0")
+    if n_jobs < 0:
+        n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return _score_chunks(_iter_chunks(source, chunk_size), system, n_jobs, tuple(keep))
+
+
+def _score_chunks(chunks: Iterator[pd.DataFrame], system: str, n_jobs: int, keep: tuple[str, ...]) -> Iterator[pd.DataFrame]:
+    if n_jobs == 1:
+        for chunk in chunks:
+            yield _score_chunk(system, chunk, keep)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=get_scorer, initargs=(system,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_score_chunk, system, chunk, keep))
+            # Bound in-flight work so the reader never runs far ahead of scoring
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def score_to_parquet(source, system: str, dest: Path, **kwargs) -> int:
+    """Score ``source`` with :func:`score_batch` straight into a Parquet file; returns row count."""
+    writer, rows = None, 0
+    try:
+        for chunk in score_batch(source, system, **kwargs):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(dest, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
@@ -0,0 +1,236 @@
+"""
+Precomputed global risk surface with microsecond point lookups.
+
+``python risk_surface.py`` scores a regular lat/lon grid for every
+system × calendar month × scenario offset with the best models from
+:mod:`risk_scoring` and writes the result to a memory-mapped ``.npy``
+array (axes: system, month, temperature offset, rainfall offset, lat,
+lon) plus a JSON sidecar describing the grid.  :class:`RiskSurface`
+then answers "what is my risk?" by nearest-cell or bilinear lookup,
+without loading or running a model.
+
+Cell inputs come from the surveys inside each cell: the cell's median
+WorldClim normals for that month when surveyed, else its annual
+normals as a flat seasonal profile.  Cells without surveys are NaN —
+the models are not extrapolated over unsampled land or ocean.
+"""
+import argparse
+import json
+import math
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_store import MERGED_CSV, MERGED_STORE, PROCESSED_DIR, read_table
+from risk_scoring import BEST_MODELS, classify_zones, score_batch
+
+SURFACE_PATH = PROCESSED_DIR / "risk_surface.npy"
+RESOLUTION_DEG = 2.0
+MONTHS = list(range(1, 13))
+TEMP_OFFSETS = [-2.0, 0.0, 2.0, 4.0]  # °C
+RAIN_OFFSETS = [-2.0, 0.0, 2.0]       # mm/day
+
+INPUT_COLUMNS = ["Latitude", "Longitude", "start_date", "location",
+                 "monthly_temp", "monthly_precip", "annual_mean_temp", "annual_precip"]
+
+
+def _meta_path(path: Path) -> Path:
+    return Path(path).with_suffix(".json")
+
+
+def cell_inputs(df: pd.DataFrame, resolution: float = RESOLUTION_DEG) -> pd.DataFrame:
+    """One row per surveyed cell × month with the climate normals the models need."""
+    df = df.assign(
+        lat_idx=np.floor((df["Latitude"] + 90.0) / resolution).astype(int),
+        lon_idx=np.floor((df["Longitude"] + 180.0) / resolution).astype(int),
+        month=df["start_date"].dt.month,
+    ).dropna(subset=["month"])
+    cells = df.groupby(["lat_idx", "lon_idx"]).agg(
+        annual_mean_temp=("annual_mean_temp", "median"),
+        annual_precip=("annual_precip", "median"),
+        location=("location", lambda s: s.mode().iloc[0]),
+    )
+    monthly = df.groupby(["lat_idx", "lon_idx", "month"])[["monthly_temp", "monthly_precip"]].median()
+
+    full = pd.MultiIndex.from_tuples(
+        [(i, j, m) for i, j in cells.index for m in MONTHS], names=["lat_idx", "lon_idx", "month"]
+    )
+    out = monthly.reindex(full).join(cells, on=["lat_idx", "lon_idx"]).reset_index()
+    # Unsurveyed months: annual normals (tenths °C, mm/year) as a flat profile
+    out["monthly_temp"] = out["monthly_temp"].fillna(out["annual_mean_temp"])
+    out["monthly_precip"] = out["monthly_precip"].fillna(out["annual_precip"] / 12.0)
+    out["Latitude"] = (out["lat_idx"] + 0.5) * resolution - 90.0
+    out["Longitude"] = (out["lon_idx"] + 0.5) * resolution - 180.0
+    return out
+
+
+def build_surface(
+    path: Path = SURFACE_PATH,
+    resolution: float = RESOLUTION_DEG,
+    temp_offsets: list[float] = TEMP_OFFSETS,
+    rain_offsets: list[float] = RAIN_OFFSETS,
+    data: pd.DataFrame | None = None,
+    **batch_kwargs,
+) -> Path:
+    """Score every surveyed cell and write the surface to ``path`` (+ JSON sidecar)."""
+    if data is None:
+        data = read_table(MERGED_STORE, MERGED_CSV, INPUT_COLUMNS)
+    cells = cell_inputs(data, resolution)
+    scenarios = pd.DataFrame(
+        [(ti, ri, t, r) for ti, t in enumerate(temp_offsets) for ri, r in enumerate(rain_offsets)],
+        columns=["temp_idx", "rain_idx", "temp_anomaly_C", "rain_anomaly_daily"],
+    )
+    rows = cells.merge(scenarios, how="cross")
+
+    systems = list(BEST_MODELS)
+    n_lat, n_lon = int(round(180 / resolution)), int(round(360 / resolution))
+    shape = (len(systems), len(MONTHS), len(temp_offsets), len(rain_offsets), n_lat, n_lon)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".tmp.npy")
+    grid = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=shape)
+    grid[:] = np.nan
+    for s, system in enumerate(systems):
+        for chunk in score_batch(rows, system, keep=("lat_idx", "lon_idx", "temp_idx", "rain_idx"), **batch_kwargs):
+            grid[s, chunk["month"] - 1, chunk["temp_idx"], chunk["rain_idx"],
+                 chunk["lat_idx"], chunk["lon_idx"]] = chunk["incidence"]
+    grid.flush()
+    del grid
+    tmp.replace(path)
+    _meta_path(path).write_text(json.dumps({
+        "systems": systems,
+        "months": MONTHS,
+        "temp_offsets": list(temp_offsets),
+        "rain_offsets": list(rain_offsets),
+        "resolution": resolution,
+        "cells": int(len(cells) // len(MONTHS)),
+    }, indent=2))
+    return path
+
+
+class RiskSurface:
+    """Read-only view of a precomputed surface; lookups never touch the models."""
+
+    def __init__(self, path: Path = SURFACE_PATH):
+        path = Path(path)
+        meta = json.loads(_meta_path(path).read_text())
+        self.grid = np.load(path, mmap_mode="r")
+        self.systems = {name: i for i, name in enumerate(meta["systems"])}
+        self.resolution = float(meta["resolution"])
+        self.temp_offsets = tuple(meta["temp_offsets"])
+        self.rain_offsets = tuple(meta["rain_offsets"])
+        self.n_lat, self.n_lon = self.grid.shape[-2:]
+
+    @staticmethod
+    def _nearest(offsets: tuple[float, ...], value: float) -> int:
+        return min(range(len(offsets)), key=lambda k: abs(offsets[k] - value))
+
+    def nearest_scenario(self, temp_anomaly_C: float, rain_anomaly_daily: float) -> tuple[float, float]:
+        """The precomputed ``(temperature, rainfall)`` offsets a lookup for these anomalies actually reads."""
+        return (self.temp_offsets[self._nearest(self.temp_offsets, temp_anomaly_C)],
+                self.rain_offsets[self._nearest(self.rain_offsets, rain_anomaly_daily)])
+
+    def _plane(self, system: str, month: int, temp_anomaly_C: float, rain_anomaly_daily: float) -> np.ndarray:
+        """The lat × lon slice for the nearest precomputed scenario."""
+        t = self._nearest(self.temp_offsets, temp_anomaly_C)
+        r = self._nearest(self.rain_offsets, rain_anomaly_daily)
+        return self.grid[self.systems[system], int(month) - 1, t, r]
+
+    def _lookup_scalar(self, plane: np.ndarray, lat: float, lon: float, method: str) -> float:
+        """Plain-arithmetic path for one point: at most four memmap item reads."""
+        fi, fj = (lat + 90.0) / self.resolution, (lon + 180.0) / self.resolution
+        if method == "nearest":
+            i = min(max(int(fi), 0), self.n_lat - 1)
+            j = min(max(int(fj), 0), self.n_lon - 1)
+            return float(plane[i, j])
+        fi, fj = fi - 0.5, fj - 0.5
+        i0 = min(max(math.floor(fi), 0), self.n_lat - 2)
+        j0 = min(max(math.floor(fj), 0), self.n_lon - 2)
+        wi, wj = min(max(fi - i0, 0.0), 1.0), min(max(fj - j0, 0.0), 1.0)
+        total = weight = 0.0
+        for di, dj, w in ((0, 0, (1 - wi) * (1 - wj)), (0, 1, (1 - wi) * wj),
+                          (1, 0, wi * (1 - wj)), (1, 1, wi * wj)):
+            v = float(plane[i0 + di, j0 + dj])
+            if v == v:  # not NaN
+                total += v * w
+                weight += w
+        return total / weight if weight > 0 else math.nan
+
+    def lookup(
+        self,
+        system: str,
+        lat,
+        lon,
+        month: int,
+        temp_anomaly_C: float = 0.0,
+        rain_anomaly_daily: float = 0.0,
+        method: str = "nearest",
+    ):
+        """
+        Predicted incidence at ``lat``/``lon`` (scalars or arrays; NaN if unsurveyed).
+
+        Anomalies snap to the nearest precomputed offset (clamped to the
+        offset range; see :meth:`nearest_scenario`).  ``"bilinear"``
+        interpolates between the four surrounding cell centres, ignoring
+        NaN neighbours.
+        """
+        plane = self._plane(system, month, temp_anomaly_C, rain_anomaly_daily)
+        if np.isscalar(lat) and np.isscalar(lon) and method in ("nearest", "bilinear"):
+            return self._lookup_scalar(plane, float(lat), float(lon), method)
+        fi = (np.asarray(lat, dtype=np.float64) + 90.0) / self.resolution
+        fj = (np.asarray(lon, dtype=np.float64) + 180.0) / self.resolution
+        if method == "nearest":
+            i = np.clip(fi.astype(np.int64), 0, self.n_lat - 1)
+            j = np.clip(fj.astype(np.int64), 0, self.n_lon - 1)
+            out = plane[i, j].astype(np.float64)
+        elif method == "bilinear":
+            fi, fj = fi - 0.5, fj - 0.5
+            i0 = np.clip(np.floor(fi).astype(np.int64), 0, self.n_lat - 2)
+            j0 = np.clip(np.floor(fj).astype(np.int64), 0, self.n_lon - 2)
+            wi, wj = np.clip(fi - i0, 0.0, 1.0), np.clip(fj - j0, 0.0, 1.0)
+            total = weight = 0.0
+            for di, dj, w in ((0, 0, (1 - wi) * (1 - wj)), (0, 1, (1 - wi) * wj),
+                              (1, 0, wi * (1 - wj)), (1, 1, wi * wj)):
+                v = plane[i0 + di, j0 + dj].astype(np.float64)
+                valid = ~np.isnan(v)
+                total = total + np.where(valid, v * w, 0.0)
+                weight = weight + np.where(valid, w, 0.0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out = np.where(weight > 0, total / weight, np.nan)
+        else:
+            raise ValueError(f"Unknown method {method!r}; expected 'nearest' or 'bilinear'")
+        return float(out) if out.ndim == 0 else out
+
+    def zone(self, system: str, *args, **kwargs):
+        """Low/Moderate/High zone for :meth:`lookup`'s incidence, with ``system``'s thresholds."""
+        incidence = self.lookup(system, *args, **kwargs)
+        zones = classify_zones(incidence, system)
+        return str(zones) if np.ndim(incidence) == 0 else zones
+
+
+@lru_cache(maxsize=None)
+def load_surface(path: Path = SURFACE_PATH) -> RiskSurface:
+    """Process-wide surface; raises ``FileNotFoundError`` until ``risk_surface.py`` has run."""
+    if not Path(path).exists():
+        raise FileNotFoundError(f"No risk surface at {path}; run `python risk_surface.py`")
+    return RiskSurface(path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Precompute the gridded disease-risk surface.")
+    parser.add_argument("--out", type=Path, default=SURFACE_PATH, help="output .npy path")
+    parser.add_argument("--resolution", type=float, default=RESOLUTION_DEG, help="cell size in degrees")
+    parser.add_argument("--temp-offsets", type=float, nargs="+", default=TEMP_OFFSETS, help="°C anomalies")
+    parser.add_argument("--rain-offsets", type=float, nargs="+", default=RAIN_OFFSETS, help="mm/day anomalies")
+    parser.add_argument("--n-jobs", type=int, default=1, help="scoring worker processes")
+    args = parser.parse_args(argv)
+
+    path = build_surface(args.out, args.resolution, args.temp_offsets, args.rain_offsets, n_jobs=args.n_jobs)
+    meta = json.loads(_meta_path(path).read_text())
+    print(f"Saved risk surface to: {path} ({meta['cells']} surveyed cells)", np.load(path, mmap_mode="r").shape)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Low/Moderate/High risk zoning with per-system thresholds and region rollups.
+
+Incidence is zoned with the 01 notebook's right-closed ``pd.cut`` bins
+(``ZONE_BINS``: Low ≤ 0.2 < Moderate ≤ 0.5 < High) unless a system is
+given its own thresholds, as one ``searchsorted`` into small integer zone
+codes.  Rollups count zones per region with a single ``np.bincount`` over
+``region × zone`` keys, where each row's integer region key is computed
+once per level:
+
+- any categorical column, e.g. ``location`` (the study district), is
+  factorised;
+- ``"tile:<zoom>"`` groups rows by quadtree tile of
+  :mod:`spatial_index` (labelled ``zoom/x/y``).
+
+A :class:`ZoningService` zones every survey of one system under a
+:class:`~scenario_engine.Scenario`, with predictions from the memoised
+scenario engine, and caches each rollup per (level, scenario,
+thresholds, model version), so repeated requests are dictionary lookups.
+
+Usage:
+    python risk_zoning.py Agricultural --level location
+    python risk_zoning.py Wild --level tile:4 --temp 3 --month 6 --thresholds 0.15 0.4
+"""
+import argparse
+import time
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from etl_pipeline import ZONE_BINS, ZONE_LABELS
+from risk_scoring import SYSTEM_TYPES
+from scenario_engine import Scenario, ScenarioEngine
+from spatial_index import tile_codes, tile_xy
+
+DEFAULT_THRESHOLDS = tuple(ZONE_BINS[1:-1])
+# Upper bounds of Low and Moderate per system; edit to re-zone a system
+ZONE_THRESHOLDS = {"Agricultural": DEFAULT_THRESHOLDS, "Wild": DEFAULT_THRESHOLDS}
+ROLLUP_CACHE_SIZE = 256
+
+
+class RegionKeys(NamedTuple):
+    codes: np.ndarray   # per row: region index, -1 when the row has no region
+    labels: pd.Index    # per region index
+
+
+def thresholds_for(system: str | None, thresholds=None) -> tuple[float, ...]:
+    """Validated zone thresholds: ``thresholds`` if given, else the system's configured ones."""
+    t = tuple(float(x) for x in (ZONE_THRESHOLDS.get(system, DEFAULT_THRESHOLDS) if thresholds is None else thresholds))
+    if len(t) != len(ZONE_LABELS) - 1 or any(a >= b for a, b in zip(t, t[1:])):
+        raise ValueError(f"expected {len(ZONE_LABELS) - 1} increasing thresholds, got {t}")
+    return t
+
+
+def zone_codes(incidence, thresholds=DEFAULT_THRESHOLDS) -> np.ndarray:
+    """Zone index (into ``ZONE_LABELS``) of each incidence value; -1 for NaN."""
+    incidence = np.asarray(incidence, dtype=np.float64)
+    codes = np.searchsorted(np.asarray(thresholds), incidence, side="left")
+    return np.where(np.isnan(incidence), -1, codes).astype(np.int8)
+
+
+def classify(incidence, system: str | None, thresholds=None) -> np.ndarray:
+    """Zone labels of ``incidence`` with ``system``'s thresholds (``None`` for NaN)."""
+    codes = zone_codes(incidence, thresholds_for(system, thresholds))
+    return np.asarray(ZONE_LABELS + [None], dtype=object)[codes]
+
+
+def region_keys(rows: pd.DataFrame, level: str) -> RegionKeys:
+    """Integer region key of every row at ``level``: a column name or ``"tile:<zoom>"``."""
+    if level.startswith("tile:"):
+        zoom = int(level.split(":", 1)[1])
+        lat, lon = rows["Latitude"].to_numpy(dtype=np.float64), rows["Longitude"].to_numpy(dtype=np.float64)
+        placed = np.isfinite(lat) & np.isfinite(lon)
+        x, y = tile_xy(np.where(placed, lat, 0.0), np.where(placed, lon, 0.0), zoom)
+        x, y = x[placed], y[placed]
+        # Hash factorisation is O(n); np.unique would sort every row
+        codes, uniques = pd.factorize(tile_codes(x, y), sort=True)
+        first = np.empty(len(uniques), dtype=np.int64)
+        first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+        keys = np.full(len(rows), -1, dtype=np.int64)
+        keys[placed] = codes
+        return RegionKeys(keys, pd.Index([f"{zoom}/{i}/{j}" for i, j in zip(x[first], y[first])], name="tile"))
+    codes, uniques = pd.factorize(rows[level], sort=True)
+    return RegionKeys(codes.astype(np.int64), pd.Index(uniques, name=level))
+
+
+def rollup(incidence: np.ndarray, zones: np.ndarray, keys: RegionKeys) -> pd.DataFrame:
+    """Per region: row count, count per zone, mean incidence and the zone it falls in."""
+    n_regions, n_zones = len(keys.labels), len(ZONE_LABELS)
+    keep = (keys.codes >= 0) & (zones >= 0)
+    region = keys.codes[keep]
+    counts = np.bincount(region * n_zones + zones[keep], minlength=n_regions * n_zones).reshape(n_regions, n_zones)
+    n = counts.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(region, weights=incidence[keep], minlength=n_regions) / n
+    out = pd.DataFrame(counts, index=keys.labels, columns=ZONE_LABELS)
+    out.insert(0, "n", n)
+    out["mean_incidence"] = mean
+    return out
+
+
+class ZoningService:
+    """Cached zone rollups of one system's surveys under scenarios."""
+
+    def __init__(self, system: str, engine: ScenarioEngine | None = None):
+        self.system = system
+        self.engine = ScenarioEngine.from_surveys(system) if engine is None else engine
+        self._keys = lru_cache(maxsize=None)(lambda level: region_keys(self.engine.rows, level))
+        self._rollup = lru_cache(maxsize=ROLLUP_CACHE_SIZE)(self._zone_rollup)
+
+    def zones(self, scenario: Scenario = Scenario(), thresholds=None) -> pd.DataFrame:
+        """Predicted ``incidence`` and ``zone`` of every survey under ``scenario``."""
+        incidence = self.engine.incidence(scenario)
+        return pd.DataFrame({"incidence": incidence, "zone": classify(incidence, self.system, thresholds)},
+                            index=self.engine.rows.index)
+
+    def rollup(self, level: str = "location", scenario: Scenario = Scenario(), thresholds=None) -> pd.DataFrame:
+        """Zone counts per region at ``level`` under ``scenario`` (cached; do not modify)."""
+        thresholds = thresholds_for(self.system, thresholds)
+        return self._rollup(level, scenario, thresholds, self.engine.model_key(scenario.system))
+
+    def _zone_rollup(self, level: str, scenario: Scenario, thresholds: tuple, key) -> pd.DataFrame:
+        incidence = self.engine.incidence(scenario)
+        table = rollup(incidence, zone_codes(incidence, thresholds), self._keys(level))
+        table["zone"] = classify(table["mean_incidence"].to_numpy(), self.system, thresholds)
+        return table
+
+
+@lru_cache(maxsize=None)
+def get_service(system: str) -> ZoningService:
+    """Process-wide zoning service over every survey of "Agricultural" or "Wild"."""
+    if system not in SYSTEM_TYPES:
+        raise KeyError(f"Unknown system {system!r}; expected one of {list(SYSTEM_TYPES)}")
+    return ZoningService(system)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Risk-zone counts per region for one system's surveys.")
+    parser.add_argument("system", choices=list(SYSTEM_TYPES))
+    parser.add_argument("--level", default="location", help='column to group by, or "tile:<zoom>"')
+    parser.add_argument("--temp", type=float, default=0.0, help="temperature offset in °C")
+    parser.add_argument("--rain", type=float, default=0.0, help="rainfall offset in mm/day")
+    parser.add_argument("--month", type=int, choices=range(1, 13), help="move every survey to this month")
+    parser.add_argument("--thresholds", nargs=2, type=float, metavar=("LOW_MAX", "MODERATE_MAX"))
+    parser.add_argument("--top", type=int, default=15, help="regions to print, most High-zone surveys first")
+    args = parser.parse_args(argv)
+
+    service = get_service(args.system)
+    scenario = Scenario(args.temp, args.rain, args.month)
+    t0 = time.perf_counter()
+    table = service.rollup(args.level, scenario, args.thresholds)
+    elapsed = time.perf_counter() - t0
+    print(table.sort_values(["High", "Moderate", "n"], ascending=False).head(args.top).round(3).to_string())
+    print(f"{len(table)} regions, {int(table['n'].sum())} surveys in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
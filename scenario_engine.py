@@ -0,0 +1,332 @@
+"""
+Scenario sweeps behind the "What if June is +3 °C?" sliders.
+
+A :class:`ScenarioEngine` holds a baseline feature table for one system
+(by default the scorer's baseline survey, a real survey with its own
+date and location — see :func:`risk_scoring.baseline_profile` — or
+every survey with :meth:`ScenarioEngine.from_surveys`) and scores
+:class:`Scenario` perturbations of it:
+
+- temperature / rainfall offsets are added to each row's contemporaneous
+  climate, i.e. to its anomalies;
+- ``month`` moves every row to that calendar month (the row keeps its
+  anomalies), with the month's normals at the row's location from the
+  WorldClim ``tavg``/``prec`` grids of :mod:`climate_join` when they are
+  installed, else the mean of the nearest surveys *in that calendar
+  month* within ``MAX_DONOR_KM``.  Rows with neither score NaN (see
+  :meth:`ScenarioEngine.missing_normals`);
+- ``system`` scores the same rows with the other system's model.
+
+Categorical encodings and the baseline predictions are computed once per
+model.  A scenario then recomputes only the climate features its
+perturbations touch, on the rows they change, and re-scores only those
+rows (through the compiled graph of :mod:`compiled_model` when the
+served version has one).  Results are memoised per (scenario, model
+version), and :meth:`ScenarioEngine.sweep` scores a whole temperature ×
+rainfall grid in one vectorised batch.
+
+Usage:
+    python scenario_engine.py Agricultural --month 6
+    python scenario_engine.py Wild --surveys --temp -5 5 11 --rain -3 3 7
+"""
+import argparse
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from climate_features import DAYS_PER_MONTH, climate_features
+from climate_join import GRIDS_DIR, ClimateGrid
+from data_store import MERGED_CSV, MERGED_STORE, read_table
+from neighbor_imputer import MAX_DONOR_KM, NeighborImputer
+from risk_scoring import SURVEY_KEYS, SYSTEM_TYPES, RiskScorer, classify_zones, get_scorer
+
+# Rows per predict call when scoring a sweep
+BATCH_ROWS = 50_000
+MEMO_SIZE = 1024
+SWEEP_CACHE_SIZE = 32
+NORMALS = ["monthly_temp", "monthly_precip"]
+# WorldClim grid behind each normal (tenths °C, mm/month: the same raw units)
+NORMAL_GRIDS = {"monthly_temp": "tavg", "monthly_precip": "prec"}
+# Same-month surveys averaged for a location without grids (within MAX_DONOR_KM)
+DONORS = 5
+
+# Model inputs each raw climate column feeds (raw units, see climate_features)
+TEMP_COLUMNS = ("contemp_temp", "monthly_temp", "contemp_temp_C", "monthly_temp_C", "temp_anomaly_C",
+                "abs_temp_anom", "temp_anomaly", "monthly_temp_x_temp_anomaly")
+RAIN_COLUMNS = ("contemp_precip", "monthly_precip", "monthly_precip_mm_per_day", "rain_anomaly_daily",
+                "abs_precip_anom", "rain_anomaly")
+
+
+class Scenario(NamedTuple):
+    temp_offset_C: float = 0.0
+    rain_offset_daily: float = 0.0   # mm/day
+    month: int | None = None         # move every row to this calendar month
+    system: str | None = None        # score with this system's model instead
+
+
+class Sweep(NamedTuple):
+    temp_offsets_C: np.ndarray
+    rain_offsets_daily: np.ndarray
+    incidence: np.ndarray            # (temperature, rainfall, row)
+
+    def at(self, temp_offset_C: float, rain_offset_daily: float) -> np.ndarray:
+        """Per-row incidence at the grid point nearest the given offsets."""
+        i = int(np.abs(self.temp_offsets_C - temp_offset_C).argmin())
+        j = int(np.abs(self.rain_offsets_daily - rain_offset_daily).argmin())
+        return self.incidence[i, j]
+
+    def mean(self) -> pd.DataFrame:
+        """Mean incidence over rows: temperature offsets down, rainfall offsets across."""
+        return pd.DataFrame(self.incidence.mean(axis=2), index=pd.Index(self.temp_offsets_C, name="temp_offset_C"),
+                            columns=pd.Index(self.rain_offsets_daily, name="rain_offset_daily"))
+
+
+@lru_cache(maxsize=1)
+def normal_grids() -> list[ClimateGrid] | None:
+    """The WorldClim monthly-normal grids (temperature, precipitation), or ``None`` if not installed."""
+    paths = [GRIDS_DIR / f"{NORMAL_GRIDS[c]}.npy" for c in NORMALS]
+    return [ClimateGrid(p) for p in paths] if all(p.exists() for p in paths) else None
+
+
+@lru_cache(maxsize=1)
+def _donors() -> NeighborImputer:
+    """Same-month donor trees over every cleaned survey with its normals known."""
+    data = read_table(MERGED_STORE, MERGED_CSV, columns=["Latitude", "Longitude", "start_date"] + NORMALS)
+    return NeighborImputer(NORMALS, n_neighbors=DONORS, max_km=MAX_DONOR_KM).fit(data)
+
+
+def survey_normals(lat: np.ndarray, lon: np.ndarray, month: int) -> np.ndarray:
+    """Mean normals of the ``DONORS`` nearest ``month`` surveys within ``MAX_DONOR_KM`` (NaN if none)."""
+    frame = pd.DataFrame({"Latitude": lat, "Longitude": lon,
+                          "start_date": pd.Timestamp(2000, month, 1), **{c: np.nan for c in NORMALS}})
+    return _donors().transform(frame)
+
+
+def month_normals(lat: np.ndarray, lon: np.ndarray, month: int) -> np.ndarray:
+    """
+    ``(n, 2)`` monthly temperature / precipitation normals (raw units) at each point in ``month``.
+
+    Read from the WorldClim grids when installed; points they miss (or
+    every point without them) use :func:`survey_normals`.  NaN where
+    neither has a value.
+    """
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    grids = normal_grids()
+    if grids is None:
+        return survey_normals(lat, lon, month)
+    layer = np.full(len(lat), month - 1)
+    out = np.column_stack([grid.sample(lat, lon, layer) for grid in grids])
+    missing = np.isnan(out).any(axis=1)
+    if missing.any():
+        out[missing] = survey_normals(lat[missing], lon[missing], month)
+    return out
+
+
+def normals_coverage(lat, lon, start_date) -> np.ndarray:
+    """Calendar months each survey can be scored in: its own plus those with normals at its location."""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    months = pd.to_datetime(pd.Series(start_date), errors="coerce").dt.month.to_numpy(dtype=np.float64)
+    coverage = np.zeros(len(lat), dtype=np.int64)
+    for month in range(1, 13):
+        coverage += (months == month) | np.isfinite(month_normals(lat, lon, month)).all(axis=1)
+    return coverage
+
+
+def _differs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return ~((a == b) | (np.isnan(a) & np.isnan(b)))
+
+
+class _ModelState:
+    """One model's view of the baseline table: its inputs, cached encoding and baseline scores."""
+
+    def __init__(self, scorer: RiskScorer, rows: pd.DataFrame):
+        self.scorer = scorer
+        self.key = (scorer.version.system, scorer.version.model, scorer.version.version) \
+            if scorer.version is not None else id(scorer)
+        self.table = scorer.feature_table(rows)
+        climate = set(TEMP_COLUMNS) | set(RAIN_COLUMNS)
+        self.climate = [c for c in scorer.feature_names if c in climate]
+        compiled = scorer.compiled
+        if compiled is not None and set(self.climate) <= set(compiled.encoder.numeric_inputs):
+            self.values = compiled.encoder.numeric_values(self.table)
+            self.codes = compiled.encoder.codes(self.table)
+            self.positions = {c: compiled.encoder.numeric_inputs.index(c) for c in self.climate}
+        else:
+            self.values = None
+        raw = ("contemp_temp", "monthly_temp", "annual_mean_temp", "contemp_precip", "monthly_precip", "annual_precip")
+        self.raw = {c: self.table[c].to_numpy(dtype=np.float64) if c in self.table.columns
+                    else np.full(len(self.table), scorer.baseline.get(c, np.nan)) for c in raw}
+        self.incidence = self.predict(np.arange(len(self.table)), {})
+        self.incidence.flags.writeable = False
+
+    def predict(self, rows: np.ndarray, columns: dict[str, np.ndarray], repeats: int = 1) -> np.ndarray:
+        """Incidence of ``rows`` (tiled ``repeats`` times) with ``columns`` overriding their climate inputs."""
+        n = len(rows) * repeats
+        out = np.empty(n)
+        for start in range(0, n, BATCH_ROWS):
+            part = np.arange(start, min(start + BATCH_ROWS, n))
+            src = rows[part % len(rows)]
+            if self.values is not None:
+                values = self.values[src]
+                for col, v in columns.items():
+                    values[:, self.positions[col]] = v[part]
+                batch = self.scorer.compiled.encoder.batch(values, self.codes[src])
+                out[part] = self.scorer.compiled.graph.predict(batch)
+            else:
+                X = self.table.iloc[src].assign(**{col: v[part] for col, v in columns.items()})
+                out[part] = self.scorer.predict(X)
+        return np.clip(out, 0.0, 1.0)
+
+
+class ScenarioEngine:
+    """Memoised scenario scoring over a fixed baseline table for one system."""
+
+    def __init__(self, system: str, rows: pd.DataFrame | None = None):
+        self.system = system
+        # Default: the scorer's baseline survey at its own place, date and normals, with zero anomalies
+        baseline = get_scorer(system).baseline
+        self.rows = pd.DataFrame([{c: baseline.get(c) for c in [*SURVEY_KEYS, *NORMALS]}]) if rows is None else rows
+        for col in ("Latitude", "Longitude"):
+            if col not in self.rows.columns:
+                self.rows = self.rows.assign(**{col: get_scorer(system).baseline.get(col, np.nan)})
+        dates = self.rows["start_date"] if "start_date" in self.rows.columns else pd.Series(pd.NaT, index=self.rows.index)
+        self.months = pd.to_datetime(dates, errors="coerce").dt.month.to_numpy(dtype=np.float64)
+        self._month_normals = lru_cache(maxsize=12)(self._normals)
+        self._incidence = lru_cache(maxsize=MEMO_SIZE)(self._score_scenario)
+        self._sweep = lru_cache(maxsize=SWEEP_CACHE_SIZE)(self._score_sweep)
+        self._states: dict = {}
+
+    @classmethod
+    def from_surveys(cls, system: str) -> "ScenarioEngine":
+        """Engine over every cleaned survey of ``system``."""
+        data = read_table(MERGED_STORE, MERGED_CSV)
+        return cls(system, data[data["system_type"] == SYSTEM_TYPES[system]].reset_index(drop=True))
+
+    def _state(self, system: str) -> _ModelState:
+        scorer = get_scorer(system)
+        state = next((s for s in self._states.values() if s.scorer is scorer), None)
+        if state is None:
+            state = _ModelState(scorer, self.rows)
+            self._states[state.key] = state
+        return state
+
+    def model_key(self, system: str | None = None):
+        """Registry version (or scorer identity) scoring ``system``, the part of every memo key besides the scenario."""
+        return self._state(system or self.system).key
+
+    def _normals(self, month: int) -> np.ndarray:
+        return month_normals(self.rows["Latitude"].to_numpy(dtype=np.float64),
+                             self.rows["Longitude"].to_numpy(dtype=np.float64), month)
+
+    def missing_normals(self, month: int | None) -> np.ndarray:
+        """Rows that cannot be moved to ``month`` for lack of normals there; they score NaN."""
+        if month is None:
+            return np.zeros(len(self.rows), dtype=bool)
+        return (self.months != month) & np.isnan(self._month_normals(month)).any(axis=1)
+
+    def _climate(self, state: _ModelState, month: int | None) -> dict[str, np.ndarray]:
+        """Raw climate inputs of every row, moved to ``month`` (keeping anomalies) if given."""
+        raw = dict(state.raw)
+        if month is not None:
+            normals = self._month_normals(month)
+            moved = (self.months != month) & ~self.missing_normals(month)
+            mt = np.where(moved, normals[:, 0], raw["monthly_temp"])
+            mp = np.where(moved, normals[:, 1], raw["monthly_precip"])
+            raw["contemp_temp"] = raw["contemp_temp"] + (mt - raw["monthly_temp"]) / 10.0
+            raw["contemp_precip"] = raw["contemp_precip"] + (mp - raw["monthly_precip"]) / DAYS_PER_MONTH
+            raw["monthly_temp"], raw["monthly_precip"] = mt, mp
+        return raw
+
+    def _updates(self, state: _ModelState, raw: dict[str, np.ndarray], temp: bool, rain: bool) -> dict[str, np.ndarray]:
+        """New values of the model's climate inputs that ``temp``/``rain`` perturbations touch."""
+        features = climate_features(raw["contemp_temp"], raw["monthly_temp"], raw["annual_mean_temp"],
+                                    raw["contemp_precip"], raw["monthly_precip"], raw["annual_precip"])
+        features.update(raw)
+        touched = (TEMP_COLUMNS if temp else ()) + (RAIN_COLUMNS if rain else ())
+        return {c: features[c] for c in state.climate if c in touched}
+
+    def incidence(self, scenario: Scenario = Scenario()) -> np.ndarray:
+        """Per-row incidence under ``scenario`` (read-only; memoised per scenario and model version)."""
+        state = self._state(scenario.system or self.system)
+        return self._incidence(Scenario(float(scenario.temp_offset_C), float(scenario.rain_offset_daily),
+                                        scenario.month, None), state.key)
+
+    def _score_scenario(self, scenario: Scenario, key) -> np.ndarray:
+        state = self._states[key]
+        raw = self._climate(state, scenario.month)
+        raw["contemp_temp"] = raw["contemp_temp"] + scenario.temp_offset_C
+        raw["contemp_precip"] = raw["contemp_precip"] + scenario.rain_offset_daily
+        base = state.raw
+        temp = _differs(raw["contemp_temp"], base["contemp_temp"]) | _differs(raw["monthly_temp"], base["monthly_temp"])
+        rain = _differs(raw["contemp_precip"], base["contemp_precip"]) | _differs(raw["monthly_precip"], base["monthly_precip"])
+        changed = np.flatnonzero(temp | rain)
+        out = state.incidence.copy()
+        if changed.size:
+            raw = {c: v[changed] for c, v in raw.items()}
+            out[changed] = state.predict(changed, self._updates(state, raw, temp.any(), rain.any()))
+        out[self.missing_normals(scenario.month)] = np.nan
+        out.flags.writeable = False
+        return out
+
+    def score(self, scenario: Scenario = Scenario()) -> pd.DataFrame:
+        """``incidence`` and ``zone`` for every baseline row under ``scenario``."""
+        incidence = self.incidence(scenario)
+        zones = classify_zones(incidence, scenario.system or self.system)
+        return pd.DataFrame({"incidence": incidence, "zone": zones}, index=self.rows.index)
+
+    def sweep(self, temp_offsets_C, rain_offsets_daily, month: int | None = None, system: str | None = None) -> Sweep:
+        """Score every temperature × rainfall offset pair for every row in one vectorised batch."""
+        state = self._state(system or self.system)
+        temps = np.asarray(temp_offsets_C, dtype=np.float64)
+        rains = np.asarray(rain_offsets_daily, dtype=np.float64)
+        return self._sweep(tuple(temps), tuple(rains), month, state.key)
+
+    def _score_sweep(self, temps: tuple, rains: tuple, month: int | None, key) -> Sweep:
+        state = self._states[key]
+        raw = self._climate(state, month)
+        t, r = np.asarray(temps), np.asarray(rains)
+        shape = (len(t), len(r), len(self.rows))
+        raw = {c: np.broadcast_to(v, shape) for c, v in raw.items()}
+        raw["contemp_temp"] = raw["contemp_temp"] + t[:, None, None]
+        raw["contemp_precip"] = raw["contemp_precip"] + r[None, :, None]
+        raw = {c: np.ascontiguousarray(v).ravel() for c, v in raw.items()}
+        rows = np.arange(len(self.rows))
+        incidence = state.predict(rows, self._updates(state, raw, True, True), repeats=len(t) * len(r))
+        incidence = incidence.reshape(shape)
+        incidence[..., self.missing_normals(month)] = np.nan
+        incidence.flags.writeable = False
+        return Sweep(t, r, incidence)
+
+
+@lru_cache(maxsize=None)
+def get_engine(system: str) -> ScenarioEngine:
+    """Process-wide engine over the baseline survey of "Agricultural" or "Wild"."""
+    return ScenarioEngine(system)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Mean incidence over a temperature × rainfall offset grid.")
+    parser.add_argument("system", choices=list(SYSTEM_TYPES))
+    parser.add_argument("--surveys", action="store_true", help="sweep every survey, not the baseline survey")
+    parser.add_argument("--month", type=int, choices=range(1, 13), help="move every row to this month")
+    parser.add_argument("--temp", nargs=3, type=float, default=[-5.0, 5.0, 11], metavar=("LO", "HI", "N"),
+                        help="temperature offsets in °C")
+    parser.add_argument("--rain", nargs=3, type=float, default=[-3.0, 3.0, 7], metavar=("LO", "HI", "N"),
+                        help="rainfall offsets in mm/day")
+    args = parser.parse_args(argv)
+
+    engine = ScenarioEngine.from_surveys(args.system) if args.surveys else get_engine(args.system)
+    sweep = engine.sweep(np.linspace(*args.temp[:2], int(args.temp[2])),
+                         np.linspace(*args.rain[:2], int(args.rain[2])), month=args.month)
+    missing = int(engine.missing_normals(args.month).sum())
+    if missing:
+        print(f"{missing} of {len(engine.rows)} rows have no month-{args.month} normals within "
+              f"{MAX_DONOR_KM:.0f} km and are left out")
+    incidence = sweep.incidence[..., ~engine.missing_normals(args.month)]
+    print(Sweep(sweep.temp_offsets_C, sweep.rain_offsets_daily, incidence).mean().round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
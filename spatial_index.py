@@ -0,0 +1,120 @@
+"""
+Quadtree index over survey coordinates for viewport queries and clustering.
+
+Each point gets a Morton (Z-order) code of its tile at ``MAX_ZOOM`` on an
+equirectangular ``2**zoom × 2**zoom`` grid, and the points are stored
+sorted by that code.  Every quadtree tile at any coarser zoom is then a
+contiguous slice of the sorted arrays, so
+
+- a viewport query is a handful of ``searchsorted`` calls over the tiles
+  covering the bounding box, followed by an exact filter, and
+- aggregating to zoom ``z`` is grouping consecutive points whose codes
+  share a prefix (``code >> 2 * (MAX_ZOOM - z)``).
+
+Bounding boxes are ``(west, south, east, north)`` in degrees and must
+not cross the antimeridian.
+"""
+import numpy as np
+
+MAX_ZOOM = 16
+# Upper bound on tiles scanned per viewport query
+MAX_QUERY_TILES = 64
+
+BBox = tuple[float, float, float, float]
+WORLD: BBox = (-180.0, -90.0, 180.0, 90.0)
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Insert a zero bit between each of the low 16 bits of ``v``."""
+    v = np.asarray(v, dtype=np.uint64) & np.uint64(0xFFFF)
+    for shift, mask in ((8, 0x00FF00FF), (4, 0x0F0F0F0F), (2, 0x33333333), (1, 0x55555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def tile_xy(lat, lon, zoom: int) -> tuple[np.ndarray, np.ndarray]:
+    """Integer tile column/row of each point at ``zoom``."""
+    n = 1 << zoom
+    x = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * n)
+    y = np.floor((np.asarray(lat, dtype=np.float64) + 90.0) / 180.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_codes(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Morton code interleaving tile column and row bits."""
+    return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+
+def _shift(zoom: int) -> np.uint64:
+    return np.uint64(2 * (MAX_ZOOM - zoom))
+
+
+class SpatialIndex:
+    """Points sorted along a Z-order curve; positions refer to that sorted order."""
+
+    def __init__(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        codes = tile_codes(*tile_xy(lat, lon, MAX_ZOOM))
+        self.order = np.argsort(codes, kind="stable")  # position → original row
+        self.codes = codes[self.order]
+        self.lat = lat[self.order]
+        self.lon = lon[self.order]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _query_zoom(self, bbox: BBox) -> int:
+        """Finest zoom whose tiles covering ``bbox`` number at most ``MAX_QUERY_TILES``."""
+        west, south, east, north = bbox
+        for zoom in range(MAX_ZOOM, -1, -1):
+            x, y = tile_xy([south, north], [west, east], zoom)
+            if (x[1] - x[0] + 1) * (y[1] - y[0] + 1) <= MAX_QUERY_TILES:
+                return zoom
+        return 0
+
+    def query(self, bbox: BBox = WORLD) -> np.ndarray:
+        """Sorted positions of the points inside ``bbox`` (edges inclusive)."""
+        west, south, east, north = bbox
+        zoom = self._query_zoom(bbox)
+        (x0, x1), (y0, y1) = tile_xy([south, north], [west, east], zoom)
+        xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        prefixes = np.sort(tile_codes(xs.ravel(), ys.ravel()))
+        shift = _shift(zoom)
+        starts = np.searchsorted(self.codes, prefixes << shift, side="left")
+        stops = np.searchsorted(self.codes, (prefixes + np.uint64(1)) << shift, side="left")
+        pos = np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)] or [np.empty(0, np.int64)])
+        inside = (
+            (self.lon[pos] >= west) & (self.lon[pos] <= east)
+            & (self.lat[pos] >= south) & (self.lat[pos] <= north)
+        )
+        return pos[inside]
+
+    def cluster_count(self, positions: np.ndarray, zoom: int) -> int:
+        """Number of zoom-``zoom`` tiles occupied by ``positions``."""
+        if not len(positions):
+            return 0
+        keys = self.codes[positions] >> _shift(zoom)
+        return int(np.count_nonzero(np.diff(keys))) + 1
+
+    def clusters(self, positions: np.ndarray, zoom: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Group sorted ``positions`` by their zoom-``zoom`` tile.
+
+        Returns ``(starts, counts)`` into ``positions``, ready for
+        ``np.add.reduceat``.
+        """
+        keys = self.codes[positions] >> _shift(zoom)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return starts, np.diff(np.r_[starts, len(positions)])
+
+    def zoom_for(self, positions: np.ndarray, max_clusters: int) -> int:
+        """Finest zoom at which ``positions`` fall into at most ``max_clusters`` tiles."""
+        lo, hi = 0, MAX_ZOOM  # occupied-tile count only grows with zoom
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.cluster_count(positions, mid) <= max_clusters:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
@@ -1,5 +1,20 @@
+import calendar
+import math
+
 import streamlit as st
 
+import numpy as np
+
+from climate_features import DAYS_PER_MONTH
+from risk_drivers import explain
+from risk_scoring import classify_zones
+from risk_surface import load_surface
+from scenario_engine import MAX_DONOR_KM, get_engine
+
+# Slider lattices; the engine scores the whole grid once per system and month
+TEMP_STEPS = np.arange(-5.0, 5.01, 0.5)
+RAIN_STEPS = np.arange(-100.0, 100.1, 10.0)
+
 st.set_page_config(page_title="Test Dashboard", layout="wide")
 st.title("🌱 Test Plant Health Dashboard")
 
@@ -7,8 +22,56 @@ st.markdown("""
 This is a simple test to confirm Streamlit is working correctly.
 """)
 
-temp = st.slider("Temperature Anomaly (°C)", -5.0, 5.0, 0.0)
-rain = st.slider("Rainfall Anomaly (mm)", -100.0, 100.0, 0.0)
+system = st.selectbox("System", ["Agricultural", "Wild"])
+temp = st.slider("Temperature Anomaly (°C)", -5.0, 5.0, 0.0, step=0.5)
+rain = st.slider("Rainfall Anomaly (mm)", -100.0, 100.0, 0.0, step=10.0)
+
+at_location = st.checkbox("At a specific location (precomputed risk surface)")
+if at_location:
+    lat = st.number_input("Latitude", -90.0, 90.0, 45.0)
+    lon = st.number_input("Longitude", -180.0, 180.0, 6.0)
+    month = st.selectbox("Month", range(1, 13), format_func=lambda m: calendar.month_name[m])
+else:
+    month = st.selectbox("Month", [None, *range(1, 13)],
+                         format_func=lambda m: "Baseline survey month" if m is None else calendar.month_name[m])
 
 if st.button("Predict"):
-    st.success(f"Simulated prediction: Temp = {temp}, Rain = {rain}")
\ No newline at end of file
+    # Slider rainfall is a monthly total; the models use mm/day anomalies
+    rain_daily = rain / DAYS_PER_MONTH
+    if at_location:
+        try:
+            surface = load_surface()
+            incidence = surface.lookup(system, lat, lon, month, temp, rain_daily, method="bilinear")
+        except FileNotFoundError as e:
+            st.error(f"Risk surface not available: {e}")
+        else:
+            # The surface holds a few precomputed offsets; say which one answered
+            scored_temp, scored_rain = surface.nearest_scenario(temp, rain_daily)
+            if not (math.isclose(scored_temp, temp) and math.isclose(scored_rain, rain_daily, abs_tol=1e-9)):
+                st.info(f"The surface is precomputed for temperature anomalies of "
+                        f"{', '.join(f'{t:+g}' for t in surface.temp_offsets)} °C and rainfall anomalies of "
+                        f"{', '.join(f'{r * DAYS_PER_MONTH:+.0f}' for r in surface.rain_offsets)} mm. "
+                        f"Showing the nearest scenario: {scored_temp:+g} °C, "
+                        f"{scored_rain * DAYS_PER_MONTH:+.0f} mm.")
+            if math.isnan(incidence):
+                st.warning("No surveys near this location, so the surface has no estimate here.")
+            else:
+                st.success(f"Predicted incidence: {incidence:.1%} — {classify_zones(incidence, system)} risk")
+    else:
+        try:
+            engine = get_engine(system)
+        except FileNotFoundError as e:
+            st.error(f"Model not available: {e}")
+        else:
+            sweep = engine.sweep(TEMP_STEPS, RAIN_STEPS / DAYS_PER_MONTH, month=month)
+            incidence = float(sweep.at(temp, rain_daily)[0])
+            if engine.missing_normals(month)[0]:
+                st.warning(f"No {calendar.month_name[month]} climate normals for the baseline location "
+                           f"(no climate grids and no {calendar.month_name[month]} surveys within "
+                           f"{MAX_DONOR_KM:.0f} km), so this month cannot be scored.")
+            else:
+                st.success(f"Predicted incidence: {incidence:.1%} — {classify_zones(incidence, system)} risk")
+                # Drivers are attributed on the baseline survey in its own month, against zero anomalies
+                st.markdown("**Top climate drivers**" + ("" if month is None else " (in the baseline survey month)"))
+                for driver in explain(system, temp, rain_daily).drivers:
+                    st.markdown(f"- {driver}")
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+import risk_scoring
+import scenario_engine
+from climate_features import DAYS_PER_MONTH, KELVIN, climate_features
+from neighbor_imputer import NeighborImputer
+
+NUMERIC = ["contemp_temp", "monthly_temp", "annual_mean_temp", "contemp_precip", "monthly_precip",
+           "annual_precip", "temp_anomaly", "rain_anomaly"]
+FEATURE_NAMES = NUMERIC + ["Host_order"]
+# Four sites within ~60 km of each other, each surveyed in every calendar month of 2001
+SITES = [(40.0, -90.0), (40.3, -90.2), (39.8, -89.7), (40.2, -89.9)]
+
+
+def seasonal_surveys(seed: int = 0) -> pd.DataFrame:
+    """Synthetic cleaned surveys with seasonal normals (raw units) and derived climate features."""
+    rng = np.random.default_rng(seed)
+    rows = [(lat, lon, month, site) for site, (lat, lon) in enumerate(SITES) for month in range(1, 13)]
+    lat, lon, month, site = (np.array(v) for v in zip(*rows))
+    season = np.cos(2 * np.pi * (month - 7) / 12)
+    df = pd.DataFrame({
+        "system_type": "Ag",
+        "Host_order": np.where(site % 2, "Poales", "Rosales"),
+        "Latitude": lat,
+        "Longitude": lon,
+        "start_date": pd.to_datetime({"year": 2001, "month": month, "day": 1}),
+        "monthly_temp": 120.0 + 100.0 * season + 5.0 * site,
+        "monthly_precip": 80.0 - 40.0 * season + 3.0 * site,
+        "annual_mean_temp": 120.0 + 5.0 * site,
+        "annual_precip": 960.0 + 36.0 * site,
+    })
+    df["contemp_temp"] = df["monthly_temp"] / 10.0 + KELVIN + rng.normal(0.0, 1.5, len(df))
+    df["contemp_precip"] = df["monthly_precip"] / DAYS_PER_MONTH + rng.normal(0.0, 0.5, len(df))
+    features = climate_features(*(df[c] for c in ("contemp_temp", "monthly_temp", "annual_mean_temp",
+                                                  "contemp_precip", "monthly_precip", "annual_precip")))
+    df["temp_anomaly"], df["rain_anomaly"] = features["temp_anomaly"], features["rain_anomaly"]
+    df["incidence"] = np.clip(0.2 + 0.001 * df["monthly_temp"] - 0.02 * features["temp_anomaly_C"]
+                              + rng.normal(0.0, 0.02, len(df)), 0.0, 1.0)
+    return df
+
+
+def fit_pipeline(df: pd.DataFrame) -> Pipeline:
+    pipeline = Pipeline([
+        ("prep", ColumnTransformer([("num", StandardScaler(), NUMERIC),
+                                    ("cat", OneHotEncoder(handle_unknown="ignore"), ["Host_order"])])),
+        ("model", Ridge(alpha=1.0)),
+    ])
+    return pipeline.fit(df[FEATURE_NAMES], df["incidence"])
+
+
+def serve(monkeypatch, surveys: pd.DataFrame, model=None) -> risk_scoring.RiskScorer:
+    """
+    Serve a scorer for ``surveys`` as "Agricultural" with no grids or registry.
+
+    Month normals come from same-month donors among ``surveys`` themselves.
+    """
+    monkeypatch.setattr(scenario_engine, "normal_grids", lambda: None)
+    donors = NeighborImputer(scenario_engine.NORMALS, n_neighbors=scenario_engine.DONORS).fit(surveys)
+    monkeypatch.setattr(scenario_engine, "_donors", lambda: donors)
+    model = model or fit_pipeline(surveys)
+    scorer = risk_scoring.RiskScorer(model, risk_scoring.baseline_profile(surveys, FEATURE_NAMES), system="Agricultural")
+    for module in (risk_scoring, scenario_engine):
+        monkeypatch.setattr(module, "get_scorer", lambda system: scorer)
+    return scorer
+
+
+@pytest.fixture
+def surveys() -> pd.DataFrame:
+    return seasonal_surveys()
+
+
+@pytest.fixture
+def scorer(monkeypatch, surveys) -> risk_scoring.RiskScorer:
+    return serve(monkeypatch, surveys)
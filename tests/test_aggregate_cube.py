@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate_cube import MEASURES, PATHOGEN_COLUMN, AggregateCube
+
+PERCENTILES = [0, 1, 5, 25, 50, 75, 95, 99, 100]
+
+
+def _surveys(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # Clustered, skewed values leave long runs of empty fine bins between occupied ones
+    values = {m: np.concatenate([rng.normal(0, 1, n - n // 4), rng.exponential(5, n // 4) + 20]) for m in MEASURES}
+    return pd.DataFrame({
+        "system_type": rng.choice(["Ag", "Natural"], n),
+        PATHOGEN_COLUMN: rng.choice(["Fungus", "Virus"], n),
+        "Host_order": "Poales",
+        "Latitude": rng.uniform(-60, 60, n),
+        "start_date": pd.Timestamp("2000-06-01"),
+        **values,
+    })
+
+
+@pytest.mark.parametrize("n", [3, 7, 40, 2000])
+def test_quantiles_match_np_percentile_within_a_fine_bin(n):
+    df = _surveys(n, seed=n)
+    cube = AggregateCube.build(df)
+    everything = np.ones(len(cube.count), dtype=bool)
+    by = ("system_type", PATHOGEN_COLUMN)
+    for column in MEASURES:
+        width = np.diff(cube.fine_edges[cube.measure(column)]).max()
+        fine = cube.histograms(column, by, everything, fine=True)
+        for key, m in cube.moments(column, by, everything).iterrows():
+            if m["n"] == 0:
+                continue
+            values = df.loc[(df["system_type"] == key[0]) & (df[PATHOGEN_COLUMN] == key[1]), column]
+            expected = np.percentile(values, PERCENTILES)
+            got = cube.quantiles(column, fine[key], PERCENTILES, m["min"], m["max"])
+            np.testing.assert_allclose(got, expected, rtol=0, atol=width)
+
+
+def test_quantiles_of_empty_slice_are_nan():
+    cube = AggregateCube.build(_surveys(20, seed=0))
+    column = MEASURES[0]
+    empty = np.zeros(cube.fine.shape[-1], dtype=np.int64)
+    assert np.isnan(cube.quantiles(column, empty, [25, 50, 75], 0.0, 1.0)).all()
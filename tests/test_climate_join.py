@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_join import ClimateGrid, join_climate, load_grids, window_stats, write_grid
+
+ERA5_MONTHS = 6  # 2000-01 .. 2000-06
+
+
+def _grids(tmp_path):
+    shape = (2, 2)
+    write_grid("bio01", np.full(shape, 150.0), 0.0, 0.0, 1.0, grids_dir=tmp_path)
+    write_grid("bio12", np.full(shape, 900.0), 0.0, 0.0, 1.0, grids_dir=tmp_path)
+    for name in ("tavg", "prec"):
+        normals = np.broadcast_to(np.arange(12.0)[:, None, None], (12, *shape))
+        write_grid(name, normals, 0.0, 0.0, 1.0, grids_dir=tmp_path)
+    # Layer k holds 280 + k (K) and k (mm/day): window means are easy to read off
+    series = np.broadcast_to(np.arange(ERA5_MONTHS, dtype=np.float64)[:, None, None], (ERA5_MONTHS, *shape))
+    write_grid("temperature_2m", 280.0 + series, 0.0, 0.0, 1.0, time0="2000-01", grids_dir=tmp_path)
+    write_grid("total_precipitation", series, 0.0, 0.0, 1.0, time0="2000-01", grids_dir=tmp_path)
+    return load_grids(tmp_path)
+
+
+def _surveys(starts, spans) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Obs": np.arange(len(starts)),
+        "Latitude": 0.5,
+        "Longitude": 0.5,
+        "Start Date (yyyymm)": starts,
+        "Span (months)": spans,
+    })
+
+
+def test_windows_inside_era5_are_averaged(tmp_path):
+    out = join_climate(_surveys([200002], [3]), _grids(tmp_path))
+    assert out["temperature_2m"].iat[0] == pytest.approx(282.0)
+    assert out["total_precipitation_max"].iat[0] == pytest.approx(3.0)
+
+
+def test_windows_past_era5_are_nan_not_partial_means(tmp_path):
+    # 2000-05 .. 2000-07 has two of its three months in the grid; 2000-08 has none
+    out = join_climate(_surveys([200005, 200008], [3, 1]), _grids(tmp_path))
+    for column in ("temperature_2m", "temperature_2m_min", "temperature_2m_max", "degree_days", "total_precipitation"):
+        assert out[column].isna().all(), column
+    # Calendar-month normals wrap around the year, so they are always complete
+    assert out["tavg"].notna().all()
+
+
+def test_partial_windows_aggregate_the_months_present(tmp_path):
+    _grids(tmp_path)
+    grid = ClimateGrid(tmp_path / "temperature_2m.npy")
+    first, span = np.array([4, 0]), np.array([3, 2])
+    strict = window_stats(grid, np.full(2, 0.5), np.full(2, 0.5), first, span)
+    loose = window_stats(grid, np.full(2, 0.5), np.full(2, 0.5), first, span, partial=True)
+    np.testing.assert_array_equal(strict["count"], [2, 2])
+    assert np.isnan(strict["mean"][0]) and strict["mean"][1] == pytest.approx(280.5)
+    np.testing.assert_allclose(loose["mean"], [284.5, 280.5])
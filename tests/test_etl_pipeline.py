@@ -0,0 +1,47 @@
+import pytest
+
+import etl_pipeline
+from etl_pipeline import STAGES, stage_keys
+
+NAMES = ["merge"] + [s.name for s in STAGES]
+
+
+@pytest.fixture
+def sources(tmp_path):
+    survey, climate = tmp_path / "survey.csv", tmp_path / "climate.csv"
+    survey.write_text("Obs,Incidence\n1,0.2\n")
+    climate.write_text("obs,bio01\n1,150\n")
+    return survey, climate
+
+
+def _changed(before, after) -> list[str]:
+    return [name for (name, a), (_, b) in zip(before, after) if a != b]
+
+
+def test_keys_are_stable(sources):
+    assert stage_keys(*sources) == stage_keys(*sources)
+    assert [name for name, _ in stage_keys(*sources)] == NAMES
+
+
+def test_source_edit_invalidates_every_stage(sources):
+    before = stage_keys(*sources)
+    sources[1].write_text("obs,bio01\n1,151\n")
+    assert _changed(before, stage_keys(*sources)) == NAMES
+
+
+def test_rename_map_edit_invalidates_the_merge(sources, monkeypatch):
+    before = stage_keys(*sources)
+    monkeypatch.setitem(etl_pipeline.CLIMATE_RENAMES, "bio05", "max_temp_warmest_month")
+    assert _changed(before, stage_keys(*sources)) == NAMES
+
+
+def test_impute_constant_edit_invalidates_impute_onwards(sources, monkeypatch):
+    before = stage_keys(*sources)
+    monkeypatch.setattr(etl_pipeline, "MONTHLY_COLUMNS", ["monthly_temp"])
+    assert _changed(before, stage_keys(*sources)) == NAMES[NAMES.index("impute"):]
+
+
+def test_override_invalidates_its_stage_onwards(sources):
+    before = stage_keys(*sources)
+    after = stage_keys(*sources, overrides={"trim_quantiles": {"lower": 0.01}})
+    assert _changed(before, after) == NAMES[NAMES.index("trim_quantiles"):]
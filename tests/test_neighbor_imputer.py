@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from neighbor_imputer import MAX_DONOR_KM, NeighborImputer, chord_km, neighbor_space
+
+COLUMNS = ["monthly_temp", "monthly_precip"]
+
+
+def _surveys(lat, lon, month, temp, precip=np.nan) -> pd.DataFrame:
+    n = len(lat)
+    return pd.DataFrame({
+        "Latitude": lat,
+        "Longitude": lon,
+        "start_date": [pd.Timestamp(2000, m, 1) for m in np.broadcast_to(month, (n,))],
+        "monthly_temp": np.broadcast_to(temp, (n,)).astype(np.float64),
+        "monthly_precip": np.broadcast_to(precip, (n,)).astype(np.float64),
+    })
+
+
+@pytest.fixture
+def donors() -> pd.DataFrame:
+    # Three January and three July surveys around (10°N, 10°E), with very different normals
+    lat, lon = [10.0, 10.1, 9.9], [10.0, 10.1, 9.9]
+    return pd.concat([_surveys(lat, lon, 1, [10.0, 20.0, 30.0], 4.0),
+                      _surveys(lat, lon, 7, 250.0, 90.0)], ignore_index=True)
+
+
+def test_fills_from_same_month_donors_only(donors):
+    imputer = NeighborImputer(COLUMNS, n_neighbors=5).fit(donors)
+    out = imputer.transform(_surveys([10.5, 10.5], [10.0, 10.0], [1, 7], np.nan))
+    np.testing.assert_allclose(out, [[20.0, 4.0], [250.0, 90.0]])
+
+
+def test_averages_the_nearest_donors(donors):
+    imputer = NeighborImputer(COLUMNS, n_neighbors=1).fit(donors)
+    out = imputer.transform(_surveys([10.12], [10.12], 1, np.nan))
+    np.testing.assert_allclose(out, [[20.0, 4.0]])
+
+
+def test_leaves_nan_without_a_donor_in_reach(donors):
+    imputer = NeighborImputer(COLUMNS).fit(donors)
+    # 20° of latitude away, a month nobody surveyed, and no coordinates at all
+    rows = _surveys([30.0, 10.0, np.nan], [10.0, 10.0, 10.0], [1, 3, 1], np.nan)
+    assert np.isnan(imputer.transform(rows)).all()
+    # A tighter reach excludes donors the default one accepts
+    near = _surveys([11.0], [10.0], 1, np.nan)
+    assert np.isfinite(imputer.transform(near)).all()
+    assert np.isnan(NeighborImputer(COLUMNS, max_km=50.0).fit(donors).transform(near)).all()
+
+
+def test_keeps_known_values_and_matches_across_batches(donors):
+    rng = np.random.default_rng(0)
+    rows = _surveys(rng.uniform(9, 11, 200), rng.uniform(9, 11, 200), rng.choice([1, 7], 200), np.nan)
+    rows.loc[::10, "monthly_temp"] = -1.0
+    single = NeighborImputer(COLUMNS).fit(donors).transform(rows)
+    batched = NeighborImputer(COLUMNS, batch_rows=16, n_jobs=4).fit(donors).transform(rows)
+    np.testing.assert_array_equal(single, batched)
+    assert (single[::10, 0] == -1.0).all()
+
+
+def test_chord_reach_matches_great_circle_distance():
+    # One degree of latitude is ~111.2 km along the surface
+    a, b = neighbor_space(pd.DataFrame({"Latitude": [0.0, 1.0], "Longitude": [0.0, 0.0]}))
+    assert np.linalg.norm(a - b) == pytest.approx(chord_km(111.195), rel=1e-6)
+    assert chord_km(MAX_DONOR_KM) < MAX_DONOR_KM
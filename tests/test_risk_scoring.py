@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_scoring import score_batch
+from scenario_engine import month_normals
+
+
+def _score(rows: pd.DataFrame, **kwargs) -> pd.DataFrame:
+    return pd.concat(score_batch(rows, "Agricultural", **kwargs))
+
+
+def test_month_changes_the_score(scorer):
+    rows = pd.DataFrame({"month": [1, 3, 7, 9], "temp_anomaly_C": 1.0})
+    incidence = _score(rows)["incidence"].to_numpy()
+    assert np.isfinite(incidence).all()
+    assert len(np.unique(incidence)) == len(rows)
+
+
+def test_month_takes_that_months_normals_at_the_row(scorer):
+    lat, lon = scorer.baseline["Latitude"], scorer.baseline["Longitude"]
+    by_month = _score(pd.DataFrame({"month": [1, 7], "Latitude": lat, "Longitude": lon}))
+    normals = np.vstack([month_normals([lat], [lon], m) for m in (1, 7)])
+    explicit = _score(pd.DataFrame({"monthly_temp": normals[:, 0], "monthly_precip": normals[:, 1]}))
+    np.testing.assert_allclose(by_month["incidence"], explicit["incidence"])
+    # start_date stands in for month
+    by_date = _score(pd.DataFrame({"start_date": ["2010-01-15", "2010-07-15"], "Latitude": lat, "Longitude": lon}))
+    np.testing.assert_allclose(by_date["incidence"], by_month["incidence"])
+
+
+def test_rows_without_normals_score_nan(scorer):
+    out = _score(pd.DataFrame({"month": [6, 6], "Latitude": [40.0, -30.0], "Longitude": [-90.0, 140.0]}))
+    assert np.isfinite(out["incidence"].iat[0]) and out["zone"].iat[0] is not None
+    assert np.isnan(out["incidence"].iat[1]) and out["zone"].iat[1] is None
+
+
+def test_bad_months_and_unknown_columns_raise(scorer):
+    with pytest.raises(ValueError, match="month must be 1-12"):
+        _score(pd.DataFrame({"month": [6, 13]}))
+    with pytest.raises(ValueError, match="Unknown input column"):
+        _score(pd.DataFrame({"month": [6], "site_name": ["A"]}))
+    out = _score(pd.DataFrame({"month": [6], "site_name": ["A"]}), keep=("site_name",))
+    assert list(out.columns) == ["month", "site_name", "incidence", "zone"]
+
+
+def test_invalid_arguments_raise_before_iterating(scorer):
+    with pytest.raises(ValueError, match="n_jobs"):
+        score_batch(pd.DataFrame({"month": [6]}), "Agricultural", n_jobs=0)
+    with pytest.raises(KeyError):
+        score_batch(pd.DataFrame({"month": [6]}), "Orchard")
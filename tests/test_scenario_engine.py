@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import FEATURE_NAMES, SITES, serve
+from risk_scoring import baseline_profile
+from scenario_engine import Scenario, ScenarioEngine, normals_coverage
+
+
+def _with_remote_cluster(surveys: pd.DataFrame, n: int = 30) -> pd.DataFrame:
+    """Add ``n`` identical, perfectly average surveys taken in March far from every other site."""
+    remote = surveys.iloc[[0] * n].reset_index(drop=True)
+    remote["Latitude"], remote["Longitude"] = -30.0, 140.0
+    remote["start_date"] = pd.to_datetime(["2001-03-01"] * n)
+    numeric = surveys[FEATURE_NAMES].select_dtypes("number").columns
+    remote[numeric] = surveys[numeric].mean().to_numpy()
+    return pd.concat([surveys, remote], ignore_index=True)
+
+
+def test_coverage_counts_months_with_normals(monkeypatch, surveys):
+    data = _with_remote_cluster(surveys)
+    serve(monkeypatch, data)
+    coverage = normals_coverage(data["Latitude"], data["Longitude"], data["start_date"])
+    assert (coverage[:len(surveys)] == 12).all()
+    assert (coverage[len(surveys):] == 1).all()
+
+
+def test_baseline_is_a_real_survey_the_engine_can_move(monkeypatch, surveys):
+    data = _with_remote_cluster(surveys)
+    # Unconstrained, the medoid is the remote average survey ...
+    medoid = baseline_profile(data, FEATURE_NAMES, candidates=np.ones(len(data), dtype=bool))
+    assert (medoid["Latitude"], medoid["Longitude"]) == (-30.0, 140.0)
+    # ... but by default it must come from the surveys with normals in the most months
+    baseline = serve(monkeypatch, data).baseline
+    assert (baseline["Latitude"], baseline["Longitude"]) in SITES
+    row = data[(data["Latitude"] == baseline["Latitude"]) & (data["Longitude"] == baseline["Longitude"])
+               & (data["start_date"] == pd.Timestamp(baseline["start_date"]))]
+    assert len(row) == 1
+    assert baseline["Host_order"] == row["Host_order"].iat[0]
+    numeric = [c for c in FEATURE_NAMES if c != "Host_order"]
+    np.testing.assert_allclose([baseline[c] for c in numeric], row[numeric].to_numpy(dtype=np.float64)[0])
+
+
+def test_default_engine_scores_the_baseline_in_every_month(monkeypatch, surveys):
+    scorer = serve(monkeypatch, surveys)
+    engine = ScenarioEngine("Agricultural")
+    assert len(engine.rows) == 1
+    assert engine.incidence(Scenario())[0] == pytest.approx(scorer.score(0.0, 0.0).incidence)
+    by_month = np.array([engine.incidence(Scenario(month=m))[0] for m in range(1, 13)])
+    assert not any(engine.missing_normals(m).any() for m in range(1, 13))
+    assert np.isfinite(by_month).all()
+    assert len(np.unique(by_month.round(12))) > 1
+    # A sweep over the same month agrees with the single scenario
+    sweep = engine.sweep([0.0, 2.0], [0.0], month=1)
+    assert sweep.at(0.0, 0.0)[0] == pytest.approx(by_month[0])
@@ -0,0 +1,344 @@
+"""
+Training harness: every system × model × parameter set × CV fold as one job.
+
+Replaces the notebooks' serial GridSearchCV loops.  For each system the
+training split is cut into ``N_FOLDS`` folds once; each fold's
+preprocessor (scaling/splines + one-hot) is fitted once and its
+transformed matrices are written to a cache directory, from which every
+model and parameter set reads them memory-mapped.  Evaluations are
+scheduled on a single process pool.
+
+Grids are pruned by successive halving: each round scores the surviving
+configurations on a growing share of every fold's training rows (the
+last round on all of them) and keeps the best ``1 / factor``.  The
+survivor per system × model is refitted on the full training split,
+scored on the held-out test split and registered in
+:mod:`model_registry`.  A system's best mean CV R² is promoted only if
+it beats the version currently served (``--promote`` promotes it
+regardless, e.g. after the dataset changed), so training a subset such
+as ``--models XGB SVR`` never silently replaces a better model.
+``--export`` also writes the refitted notebook models (Stacking,
+Ridge-spline) to the ``risk_scoring.BEST_MODELS`` files, which
+``python model_registry.py import`` and the scorer's no-registry fallback
+read.
+
+Usage:
+    python train_models.py                          # all systems and models
+    python train_models.py --models XGB SVR --n-jobs 4
+    python train_models.py --no-halving --no-register
+    python train_models.py --models Stacking Ridge-spline --export
+"""
+import argparse
+import math
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor, StackingRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import KFold, ParameterGrid, train_test_split
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import OneHotEncoder, SplineTransformer, StandardScaler
+from sklearn.svm import SVR
+from xgboost import XGBRegressor
+
+from data_store import MERGED_CSV, MERGED_STORE, read_table
+from model_registry import NOTEBOOK_BEST, REGISTRY_DIR, ModelVersion, best_version, register
+from risk_scoring import BEST_MODELS, SURVEY_KEYS, SYSTEM_TYPES, baseline_profile
+
+NUMERIC_FEATURES = [
+    "monthly_temp", "contemp_temp", "contemp_precip", "monthly_precip",
+    "annual_mean_temp", "annual_precip", "temp_anomaly", "rain_anomaly",
+    "monthly_temp_x_temp_anomaly", "Longitude", "Latitude", "duration_mo",
+]
+CATEGORICAL_FEATURES = [
+    "Detection_method", "Antagonist_species", "Host_type", "location",
+    "Host.species", "Host_family", "Host_order", "Transmission_mode",
+]
+TARGET = "incidence"
+
+N_FOLDS = 5
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+HALVING_FACTOR = 3
+# Fewest training rows any halving round fits on
+MIN_ROWS = 100
+
+
+def preprocessor(kind: str) -> ColumnTransformer:
+    """``"scale"``: standardised numerics; ``"spline"``: standardised then B-spline expanded."""
+    numeric = make_pipeline(StandardScaler(), SplineTransformer()) if kind == "spline" else StandardScaler()
+    return ColumnTransformer([
+        ("num", numeric, NUMERIC_FEATURES),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
+    ])
+
+
+def _stacking(final_alpha: float = 1.0) -> StackingRegressor:
+    return StackingRegressor(
+        estimators=[
+            ("ridge", Ridge()),
+            ("rf", RandomForestRegressor(random_state=0, n_jobs=1)),
+            ("xgb", XGBRegressor(max_depth=4, n_estimators=200, n_jobs=1)),
+            ("svr", SVR()),
+        ],
+        final_estimator=Ridge(alpha=final_alpha),
+    )
+
+
+class Family(NamedTuple):
+    preprocessing: str                    # preprocessor() kind
+    build: Callable[..., BaseEstimator]   # params -> unfitted estimator
+    grid: dict[str, list]
+
+
+# Estimators are single-threaded: parallelism comes from the process pool
+FAMILIES = {
+    "Ridge-spline": Family("spline", Ridge, {"alpha": [0.1, 1.0, 10.0, 100.0]}),
+    "RandomForest": Family("scale", partial(RandomForestRegressor, random_state=0, n_jobs=1), {
+        "n_estimators": [100, 300], "max_depth": [None, 10, 20], "min_samples_leaf": [1, 5],
+    }),
+    "XGB": Family("scale", partial(XGBRegressor, n_jobs=1), {
+        "n_estimators": [200, 400], "max_depth": [3, 4, 6], "learning_rate": [0.05, 0.1],
+    }),
+    "SVR": Family("scale", SVR, {"C": [0.3, 1.0, 3.0], "epsilon": [0.05, 0.1]}),
+    "Stacking": Family("scale", _stacking, {"final_alpha": [0.1, 1.0, 10.0]}),
+}
+
+
+class Task(NamedTuple):
+    system: str
+    model: str
+    params: dict
+    fold: int
+    fraction: float
+    path: Path  # cached fold matrices
+
+
+class SearchResult(NamedTuple):
+    params: dict
+    cv_scores: list[float]
+    evaluated: int  # configurations tried in the first round
+
+
+# ───────── Data & folds ─────────
+def load_training_data(systems: list[str]) -> dict[str, tuple[pd.DataFrame, pd.Series, pd.DataFrame, pd.Series]]:
+    """``system → (X_train, y_train, X_test, y_test)`` with the notebooks' split."""
+    columns = NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TARGET, "system_type"]
+    data = read_table(MERGED_STORE, MERGED_CSV, columns)
+    data[CATEGORICAL_FEATURES] = data[CATEGORICAL_FEATURES].astype(object)
+    splits = {}
+    for system in systems:
+        subset = data[data["system_type"] == SYSTEM_TYPES[system]].dropna(subset=[TARGET])
+        X, y = subset[NUMERIC_FEATURES + CATEGORICAL_FEATURES], subset[TARGET]
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+        splits[system] = (X_train, y_train, X_test, y_test)
+    return splits
+
+
+def cache_folds(X: pd.DataFrame, y: pd.Series, kinds: set[str], cache_dir: Path, system: str) -> dict[tuple[str, int], Path]:
+    """Fit each preprocessor once per fold and store the transformed fold; ``(kind, fold) → path``."""
+    rng = np.random.default_rng(RANDOM_STATE)
+    paths = {}
+    folds = KFold(N_FOLDS, shuffle=True, random_state=RANDOM_STATE).split(X)
+    for fold, (train, valid) in enumerate(folds):
+        order = rng.permutation(len(train))  # halving rounds take prefixes of this
+        for kind in kinds:
+            pre = preprocessor(kind).fit(X.iloc[train])
+            path = cache_dir / f"{system}-{kind}-{fold}.joblib"
+            joblib.dump({
+                "X_train": pre.transform(X.iloc[train]), "y_train": y.to_numpy()[train],
+                "X_valid": pre.transform(X.iloc[valid]), "y_valid": y.to_numpy()[valid],
+                "order": order,
+            }, path)
+            paths[(kind, fold)] = path
+    return paths
+
+
+# ───────── Workers ─────────
+@lru_cache(maxsize=32)
+def _fold(path: Path) -> dict:
+    return joblib.load(path, mmap_mode="r")
+
+
+def evaluate(task: Task) -> float:
+    """Validation R² of one configuration on one fold's (sub-sampled) training rows."""
+    fold = _fold(task.path)
+    n = len(fold["order"])
+    rows = np.sort(fold["order"][:min(n, max(MIN_ROWS, math.ceil(task.fraction * n)))])
+    model = FAMILIES[task.model].build(**task.params)
+    model.fit(fold["X_train"][rows], fold["y_train"][rows])
+    return float(r2_score(fold["y_valid"], model.predict(fold["X_valid"])))
+
+
+def refit(model: str, params: dict, X: pd.DataFrame, y: pd.Series) -> Pipeline:
+    family = FAMILIES[model]
+    return Pipeline([("pre", preprocessor(family.preprocessing)), ("model", family.build(**params))]).fit(X, y)
+
+
+def _refit_task(args: tuple) -> Pipeline:
+    return refit(*args)
+
+
+# ───────── Scheduling ─────────
+def halving_schedule(n_candidates: int, factor: int = HALVING_FACTOR) -> list[float]:
+    """Training-row fraction per round: ``factor**-k, …, 1/factor, 1`` until one candidate is left."""
+    rounds = 0
+    while factor ** (rounds + 1) <= n_candidates:
+        rounds += 1
+    return [float(factor) ** (r - rounds) for r in range(rounds + 1)]
+
+
+def _map(pool: ProcessPoolExecutor | None, fn: Callable, items: list) -> list:
+    return list(pool.map(fn, items)) if pool is not None else [fn(item) for item in items]
+
+
+def search(
+    splits: dict,
+    models: list[str],
+    cache_dir: Path,
+    pool: ProcessPoolExecutor | None = None,
+    factor: int | None = HALVING_FACTOR,
+) -> dict[tuple[str, str], SearchResult]:
+    """
+    Successive-halving grid search for every system × model at once.
+
+    Each round's evaluations, across all groups, go to the pool as one
+    batch; ``factor=None`` disables halving (every configuration on all
+    rows, i.e. a plain grid search).
+    """
+    paths = {}
+    kinds = {FAMILIES[m].preprocessing for m in models}
+    for system, (X_train, y_train, _, _) in splits.items():
+        for (kind, fold), path in cache_folds(X_train, y_train, kinds, cache_dir, system).items():
+            paths[(system, kind, fold)] = path
+
+    groups = {(s, m): list(ParameterGrid(FAMILIES[m].grid)) for s in splits for m in models}
+    schedules = {g: halving_schedule(len(c), factor) if factor else [1.0] for g, c in groups.items()}
+    alive = {g: list(range(len(c))) for g, c in groups.items()}
+    scores: dict[tuple, list[float]] = {}  # (system, model, candidate) -> latest round's fold scores
+    for r in range(max(len(s) for s in schedules.values())):
+        keys, tasks = [], []
+        for (s, m), schedule in schedules.items():
+            if r >= len(schedule):
+                continue
+            for c in alive[(s, m)]:
+                for fold in range(N_FOLDS):
+                    keys.append((s, m, c))
+                    tasks.append(Task(s, m, groups[(s, m)][c], fold, schedule[r],
+                                      paths[(s, FAMILIES[m].preprocessing, fold)]))
+        for key, task, score in zip(keys, tasks, _map(pool, evaluate, tasks)):
+            scores.setdefault(key, [np.nan] * N_FOLDS)[task.fold] = score
+        for g, schedule in schedules.items():
+            if r < len(schedule) - 1:
+                ranked = sorted(alive[g], key=lambda c: -np.mean(scores[(*g, c)]))
+                alive[g] = ranked[:math.ceil(len(ranked) / factor)]
+
+    results = {}
+    for g, candidates in groups.items():
+        winner = max(alive[g], key=lambda c: np.mean(scores[(*g, c)]))
+        results[g] = SearchResult(candidates[winner], scores[(*g, winner)], len(candidates))
+    return results
+
+
+def should_promote(cv_scores: list[float], current: ModelVersion | None) -> bool:
+    """Whether a model with ``cv_scores`` beats the ``current`` promoted version on mean CV R²."""
+    current_cv = (current.manifest.get("cv_r2") or []) if current is not None else []
+    return not current_cv or float(np.mean(cv_scores)) > float(np.mean(current_cv))
+
+
+def train(
+    systems: list[str],
+    models: list[str],
+    n_jobs: int = 1,
+    factor: int | None = HALVING_FACTOR,
+    register_results: bool = True,
+    root: Path = REGISTRY_DIR,
+    export: bool = False,
+    force_promote: bool = False,
+) -> list[tuple[str, str, SearchResult, dict, ModelVersion | None]]:
+    """
+    Search, refit and (optionally) register; returns ``(system, model, result, test metrics, version)``.
+
+    Each system's best model is promoted if its mean CV R² beats the
+    served version's (see :func:`should_promote`), or always with
+    ``force_promote``.  ``export`` writes each system's refitted ``NOTEBOOK_BEST`` model, if
+    trained, to its ``BEST_MODELS`` path.
+    """
+    splits = load_training_data(systems)
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        with tempfile.TemporaryDirectory(prefix="train-folds-") as tmp:
+            results = search(splits, models, Path(tmp), pool, factor)
+        keys = list(results)
+        fits = _map(pool, _refit_task, [(m, results[(s, m)].params, *splits[s][:2]) for s, m in keys])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    profiles = {}
+    if register_results:
+        data = read_table(MERGED_STORE, MERGED_CSV,
+                          list(dict.fromkeys(NUMERIC_FEATURES + CATEGORICAL_FEATURES + SURVEY_KEYS + ["system_type"])))
+        profiles = {s: baseline_profile(data[data["system_type"] == SYSTEM_TYPES[s]], NUMERIC_FEATURES + CATEGORICAL_FEATURES)
+                    for s in systems}
+    best = {s: max((m for t, m in keys if t == s), key=lambda m: np.mean(results[(s, m)].cv_scores)) for s in systems}
+    promoted = {s: force_promote or should_promote(results[(s, best[s])].cv_scores, best_version(s, root))
+                for s in systems}
+    out = []
+    for (system, model), pipeline in zip(keys, fits):
+        _, _, X_test, y_test = splits[system]
+        pred = pipeline.predict(X_test)
+        test = {"MSE": float(mean_squared_error(y_test, pred)), "R²": float(r2_score(y_test, pred))}
+        result = results[(system, model)]
+        version = None
+        if register_results:
+            label = f"Tuned {model}" if result.evaluated > 1 else model
+            version = register(system, model, pipeline, result.cv_scores, test, profiles[system],
+                               params=result.params, best=model == best[system] and promoted[system],
+                               label=label, root=root)
+        if export and model == NOTEBOOK_BEST[system]:
+            BEST_MODELS[system].parent.mkdir(parents=True, exist_ok=True)
+            joblib.dump(pipeline, BEST_MODELS[system])
+        out.append((system, model, result, test, version))
+    return out
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Cross-validate, tune and register the incidence models.")
+    parser.add_argument("--systems", nargs="+", default=list(SYSTEM_TYPES), choices=list(SYSTEM_TYPES))
+    parser.add_argument("--models", nargs="+", default=list(FAMILIES), choices=list(FAMILIES))
+    parser.add_argument("--n-jobs", type=int, default=1, help="worker processes")
+    parser.add_argument("--factor", type=int, default=HALVING_FACTOR, help="successive-halving reduction factor")
+    parser.add_argument("--no-halving", action="store_true", help="evaluate every configuration on all rows")
+    parser.add_argument("--no-register", action="store_true", help="do not write to the model registry")
+    parser.add_argument("--root", type=Path, default=REGISTRY_DIR, help="registry directory")
+    parser.add_argument("--promote", action="store_true",
+                        help="promote each system's best model even if the served one has a higher CV R²")
+    parser.add_argument("--export", action="store_true",
+                        help="write the refitted Stacking / Ridge-spline pipelines to models/")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    rows = train(args.systems, args.models, args.n_jobs, None if args.no_halving else args.factor,
+                 not args.no_register, args.root, args.export, args.promote)
+    for system, model, result, test, version in rows:
+        tag = f"  -> v{version.version}" if version else ""
+        if version is not None and best_version(system, args.root) == version:
+            tag += " (promoted)"
+        print(f"{system:<13} {model:<13} CV R² {np.mean(result.cv_scores):.3f} ± {np.std(result.cv_scores):.3f}"
+              f"  test R² {test['R²']:.3f}  {result.params}{tag}")
+    print(f"Trained {len(rows)} model(s) in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()